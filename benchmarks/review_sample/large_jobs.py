@@ -0,0 +1,169 @@
+"""
+Background job runner (review benchmark sample: large)
+"""
+
+import heapq
+import logging
+import pickle
+import subprocess
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    def __init__(self, func: Callable, args=(), kwargs={}, priority: int = 0, retries: int = 0,
+                 depends_on: List[str] = []):
+        self.id = str(uuid.uuid4())
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.retries = retries
+        self.depends_on = depends_on
+        self.state = PENDING
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.created = time.time()
+
+    def __lt__(self, other):
+        return self.priority < other.priority
+
+
+class JobQueue:
+    def __init__(self):
+        self._heap: List[Job] = []
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+
+    def push(self, job: Job):
+        with self._lock:
+            heapq.heappush(self._heap, job)
+            self._ready.notify()
+
+    def pop(self, timeout: Optional[float] = None) -> Optional[Job]:
+        with self._lock:
+            if not self._heap:
+                self._ready.wait(timeout)
+            if not self._heap:
+                return None
+            return heapq.heappop(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class JobRunner:
+    def __init__(self, workers: int = 4, state_file: Optional[str] = None):
+        self.queue = JobQueue()
+        self.jobs: Dict[str, Job] = {}
+        self.workers = workers
+        self.state_file = state_file
+        self._threads: List[threading.Thread] = []
+        self._stop = False
+        self.listeners: List[Callable[[Job], None]] = []
+
+    def submit(self, func: Callable, *args, priority: int = 0, retries: int = 0,
+               depends_on: List[str] = [], **kwargs) -> str:
+        job = Job(func, args, kwargs, priority, retries, depends_on)
+        self.jobs[job.id] = job
+        self.queue.push(job)
+        return job.id
+
+    def submit_shell(self, command: str, **options) -> str:
+        def run():
+            return subprocess.check_output(command, shell=True).decode()
+        return self.submit(run, **options)
+
+    def start(self):
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop = True
+        for thread in self._threads:
+            thread.join()
+
+    def _dependencies_done(self, job: Job) -> bool:
+        for dependency in job.depends_on:
+            if self.jobs[dependency].state != DONE:
+                return False
+        return True
+
+    def _work(self):
+        while not self._stop:
+            job = self.queue.pop(timeout=0.5)
+            if job is None:
+                continue
+            if not self._dependencies_done(job):
+                self.queue.push(job)
+                continue
+            self._run(job)
+
+    def _run(self, job: Job):
+        job.state = RUNNING
+        job.attempts += 1
+        try:
+            job.result = job.func(*job.args, **job.kwargs)
+            job.state = DONE
+        except Exception as e:
+            log.error("job %s failed: %s", job.id, e)
+            if job.attempts <= job.retries:
+                time.sleep(2 ** job.attempts)
+                job.state = PENDING
+                self.queue.push(job)
+                return
+            job.state = FAILED
+            job.error = str(e)
+        for listener in self.listeners:
+            listener(job)
+        self.save()
+
+    def wait(self, job_id: str, timeout: float = 60) -> Any:
+        started = time.time()
+        while self.jobs[job_id].state not in (DONE, FAILED):
+            if time.time() - started > timeout:
+                raise TimeoutError(job_id)
+            time.sleep(0.01)
+        job = self.jobs[job_id]
+        if job.state == FAILED:
+            raise RuntimeError(job.error)
+        return job.result
+
+    def stats(self) -> Dict[str, int]:
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in self.jobs.values():
+            counts[job.state] += 1
+        counts["queued"] = len(self.queue)
+        return counts
+
+    def save(self):
+        if not self.state_file:
+            return
+        finished = {job_id: (job.state, job.result, job.error) for job_id, job in self.jobs.items()
+                    if job.state in (DONE, FAILED)}
+        with open(self.state_file, "wb") as f:
+            pickle.dump(finished, f)
+
+    def load(self):
+        if not self.state_file:
+            return {}
+        with open(self.state_file, "rb") as f:
+            return pickle.load(f)
+
+    def cleanup(self, older_than: float = 3600):
+        now = time.time()
+        for job_id, job in self.jobs.items():
+            if job.state in (DONE, FAILED) and now - job.created > older_than:
+                del self.jobs[job_id]
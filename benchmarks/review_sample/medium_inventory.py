@@ -0,0 +1,80 @@
+"""
+Inventory tracking (review benchmark sample: medium)
+"""
+
+import csv
+import threading
+from datetime import datetime
+
+
+class Item:
+    def __init__(self, sku, name, quantity, price):
+        self.sku = sku
+        self.name = name
+        self.quantity = quantity
+        self.price = price
+
+
+class Inventory:
+    def __init__(self):
+        self.items = {}
+        self.history = []
+        self.lock = threading.Lock()
+
+    def add(self, sku, name, quantity, price):
+        if sku in self.items:
+            self.items[sku].quantity += quantity
+        else:
+            self.items[sku] = Item(sku, name, quantity, price)
+        self.history.append((datetime.now(), "add", sku, quantity))
+
+    def remove(self, sku, quantity):
+        with self.lock:
+            item = self.items[sku]
+            if item.quantity - quantity < 0:
+                raise ValueError("not enough stock")
+        item.quantity -= quantity
+        self.history.append((datetime.now(), "remove", sku, quantity))
+
+    def total_value(self):
+        total = 0
+        for sku in self.items:
+            total = total + self.items[sku].quantity * self.items[sku].price
+        return round(total, 2)
+
+    def low_stock(self, threshold=5):
+        result = []
+        for item in self.items.values():
+            if item.quantity < threshold:
+                result.append(item)
+        result.sort(key=lambda item: item.quantity)
+        return result
+
+    def find(self, text):
+        matches = []
+        for item in self.items.values():
+            if text.lower() in item.name.lower():
+                matches.append(item)
+        for item in self.items.values():
+            if text.lower() in item.sku.lower() and item not in matches:
+                matches.append(item)
+        return matches
+
+    def export_csv(self, path):
+        f = open(path, "w")
+        writer = csv.writer(f)
+        writer.writerow(["sku", "name", "quantity", "price"])
+        for item in self.items.values():
+            writer.writerow([item.sku, item.name, item.quantity, item.price])
+
+    def import_csv(self, path):
+        with open(path) as f:
+            for row in csv.DictReader(f):
+                self.add(row["sku"], row["name"], int(row["quantity"]), float(row["price"]))
+
+    def report(self):
+        lines = []
+        for item in sorted(self.items.values(), key=lambda item: item.name):
+            lines.append("%s %s %d %.2f" % (item.sku, item.name, item.quantity, item.price))
+        lines.append("Total: %.2f" % self.total_value())
+        return "\n".join(lines)
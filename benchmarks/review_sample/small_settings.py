@@ -0,0 +1,24 @@
+"""
+Settings loader (review benchmark sample: small)
+"""
+
+import json
+import os
+
+DEFAULTS = {"timeout": 30, "retries": 3, "debug": False}
+
+
+def load_settings(path):
+    settings = DEFAULTS
+    if os.path.exists(path):
+        with open(path) as f:
+            settings.update(json.load(f))
+    for key in DEFAULTS:
+        value = os.environ.get("APP_" + key.upper())
+        if value:
+            settings[key] = value
+    return settings
+
+
+def timeout_seconds(settings):
+    return int(settings["timeout"]) * 1000
@@ -10,15 +10,60 @@ __author__ = "AI Instruction Team"
 __email__ = "support@example.com"
 
 from .basic_demo import ClaudeClient
+from .async_client import AsyncClaudeClient
 from .advanced_demo import AdvancedClaudeDemo
 from .interactive_demo import ClaudeDeveloperAssistant
 from .real_world_demo import RealWorldClaudeDemo
 from .rd_analytics_demo import RDAnalyticsAssistant
+from .client_pool import ClientPool, get_shared_client
+from .rate_limiter import RateLimiter, configure_rate_limiter
+from .retry import RetryPolicy, configure_retry_policy
+from .response_cache import ResponseCache
+from .batches import BatchHandle, BatchSubmitter
+from .repo_review import ReviewStore
+from .sandbox import SandboxLimits
+from .hedging import HedgePolicy
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, configure_circuit_breakers
+from .bulkhead import BulkheadFullError, configure_bulkheads, traffic_class
+from .deadline import DeadlineExceeded, deadline_scope, is_partial
+from .scheduler import PriorityScheduler, QueueFullError, configure_scheduler
+from .model_router import ModelRouter, configure_router
+from .token_budget import ContextWindowExceeded, TokenCounter, configure_token_counter
 
 __all__ = [
     "ClaudeClient",
+    "AsyncClaudeClient",
     "AdvancedClaudeDemo", 
     "ClaudeDeveloperAssistant",
     "RealWorldClaudeDemo",
-    "RDAnalyticsAssistant"
+    "RDAnalyticsAssistant",
+    "ClientPool",
+    "get_shared_client",
+    "RateLimiter",
+    "configure_rate_limiter",
+    "RetryPolicy",
+    "configure_retry_policy",
+    "ResponseCache",
+    "BatchHandle",
+    "BatchSubmitter",
+    "ReviewStore",
+    "SandboxLimits",
+    "ContextWindowExceeded",
+    "TokenCounter",
+    "configure_token_counter",
+    "ModelRouter",
+    "configure_router",
+    "HedgePolicy",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "configure_circuit_breakers",
+    "BulkheadFullError",
+    "configure_bulkheads",
+    "traffic_class",
+    "PriorityScheduler",
+    "QueueFullError",
+    "configure_scheduler",
+    "DeadlineExceeded",
+    "deadline_scope",
+    "is_partial"
 ]
@@ -3,61 +3,500 @@ Advanced Claude API Demonstrations
 Showcasing sophisticated use cases similar to DataCamp's tutorial
 """
 
-import anthropic
+import contextvars
 import os
+import hashlib
 import json
-from typing import List, Dict, Any, Optional
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from typing import List, Dict, Any, Optional, Sequence, Union
 from pathlib import Path
 
+from .batches import BatchSubmitter
+from .bulkhead import BATCH, traffic_class
+from .client_pool import get_shared_client
+from .code_chunker import CodeChunk, chunk_python_source, map_reduce
+from .deadline import expired, note_cut_short, remaining, with_deadline
+from .diff_review import FINDINGS_TOOL, DiffHunk, diff_hunks, map_findings, pack_hunks
+from .messaging import create_message, stream_message
+from .model_router import get_shared_router
+from .prompt_cache import MIN_CACHEABLE_TOKENS, build_cached_content
+from .rate_limiter import estimate_tokens
+from .repo_review import ReviewStore, changed_files, file_hash, find_python_files
+from .sandbox import MODULE_NAME, SandboxLimits, build_test_module, drop_tests, failing_tests, run_tests
+from .speedup import format_measurements, verify_optimization
+from .token_budget import output_budget
+
+# Usage of the review running in this context; the pass threads share the same dict
+_review_usage: "contextvars.ContextVar[Optional[Dict[str, int]]]" = contextvars.ContextVar("review_usage", default=None)
+
+
+def _batch_context() -> contextvars.Context:
+    """Copy of the caller's context in the BATCH traffic class, for bulk work handed to worker threads"""
+    with traffic_class(BATCH):
+        return contextvars.copy_context()
+
+
 class AdvancedClaudeDemo:
     def __init__(self, api_key: Optional[str] = None):
         """Initialize with Claude client"""
-        self.client = anthropic.Anthropic(
-            api_key=api_key or os.getenv("ANTHROPIC_API_KEY")
-        )
-    
-    def code_review_and_refactor(self, file_path: str) -> Dict[str, str]:
+        self.client = get_shared_client(api_key)
+        self._usage_lock = threading.Lock()
+
+    # Passes run by code_review_and_refactor, in the order results are returned
+    REVIEW_PASSES = {
+        "review": "Review the code above for best practices, potential bugs, and areas of improvement.",
+        "refactor": "Refactor the code above to improve readability, maintainability, and performance. Provide the complete refactored code.",
+        "document": "Add comprehensive documentation, docstrings, and inline comments to the code above.",
+        "security": "Analyze the code above for potential security vulnerabilities and suggest fixes."
+    }
+    REVIEW_MODEL = "claude-3-5-sonnet-20241022"
+    # Tool the single-call review must answer with
+    REVIEW_TOOL_NAME = "submit_review"
+    # Passes whose result is rewritten code: for a file reviewed in parts they are joined, not merged
+    CODE_PASSES = ("refactor", "document")
+    # Files larger than this are reviewed and explained in parts
+    CHUNK_TOKENS = 50_000
+    # Diff hunks sent in one review_diff request
+    DIFF_REQUEST_TOKENS = 8_000
+
+    @with_deadline
+    def code_review_and_refactor(self, file_path: str, passes: Optional[Sequence[str]] = None,
+                                 single_call: bool = False) -> Dict[str, str]:
         """
         Perform comprehensive code review and refactoring
         Similar to the DataCamp tutorial's approach
+
+        By default each pass is its own request. The passes run concurrently,
+        so a file takes about as long as its slowest pass. The code is sent
+        first as a cached prefix; when it is large enough to be cached, the
+        other passes wait until the first one starts answering (the cache
+        entry exists from then on) so they read the prefix from the cache
+        instead of each writing it again.
+
+        With ``single_call`` the code is sent once and every pass is answered
+        in one tool call whose input is checked against the review schema.
+        Sections that are missing or invalid (for example because the answer
+        hit max_tokens) are run again as separate passes.
+
+        Files larger than CHUNK_TOKENS are split on class and function
+        boundaries and each pass runs over the parts in parallel; analysis
+        passes are then merged into one report, while CODE_PASSES results
+        are joined in source order. ``single_call`` does not apply to them.
+
+        Token usage of the latest review in the calling thread or task is
+        kept in ``last_review_usage``.
+
+        Args:
+            file_path: Python file to analyze
+            passes: Names from REVIEW_PASSES to run (all of them by default)
+            single_call: Answer all passes with one request
+
+        Returns:
+            Each pass's result, or an "Error: ..." string for a failed pass,
+            in REVIEW_PASSES order
         """
         try:
             # Read the file
             with open(file_path, 'r', encoding='utf-8') as f:
                 code_content = f.read()
-            
-            # Define different analysis tasks
-            tasks = {
-                "review": "Review this code for best practices, potential bugs, and areas of improvement:",
-                "refactor": "Refactor this code to improve readability, maintainability, and performance. Provide the complete refactored code:",
-                "document": "Add comprehensive documentation, docstrings, and inline comments to this code:",
-                "security": "Analyze this code for potential security vulnerabilities and suggest fixes:"
-            }
-            
-            results = {}
-            
-            for task_name, prompt in tasks.items():
-                print(f"🔍 Running {task_name.title()} Analysis...")
-                
-                full_prompt = f"{prompt}\n\n```python\n{code_content}\n```"
-                
-                response = self.client.messages.create(
-                    model="claude-3-5-sonnet-20241022",
-                    max_tokens=2000,
-                    messages=[{"role": "user", "content": full_prompt}]
-                )
-                
-                results[task_name] = response.content[0].text
-                print(f"✅ {task_name.title()} completed")
-            
-            return results
-            
         except Exception as e:
             return {"error": f"Failed to analyze file: {e}"}
+
+        unknown = sorted(set(passes or ()) - set(self.REVIEW_PASSES))
+        if unknown:
+            return {"error": f"Unknown review passes: {', '.join(unknown)}"}
+        selected = [name for name in self.REVIEW_PASSES if passes is None or name in passes]
+
+        shared_code = f"Here is the Python code to analyze:\n\n```python\n{code_content}\n```"
+        _review_usage.set({"requests": 0, "input_tokens": 0, "cache_creation_input_tokens": 0,
+                           "cache_read_input_tokens": 0, "output_tokens": 0})
+        chunks = chunk_python_source(code_content, self.CHUNK_TOKENS)
+        if len(chunks) > 1:
+            return self._run_chunked_review(file_path, chunks, selected)
+        if not single_call:
+            return self._run_review_passes(shared_code, selected)
+
+        results = self._run_structured_review(shared_code, selected)
+        retry = [name for name in selected if name not in results]
+        if retry:
+            print(f"⚠️ Structured review left out {', '.join(retry)}; running them separately")
+            results.update(self._run_review_passes(shared_code, retry))
+        return {name: results[name] for name in selected}
+
+    @property
+    def last_review_usage(self) -> Dict[str, int]:
+        """Token usage of the latest code_review_and_refactor call in this context"""
+        return dict(_review_usage.get() or {})
+
+    def _record_review_usage(self, response: Any):
+        """Add a review response's token usage to last_review_usage"""
+        usage = getattr(response, "usage", None)
+        totals = _review_usage.get()
+        with self._usage_lock:
+            totals["requests"] += 1
+            for name in ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens", "output_tokens"):
+                value = getattr(usage, name, None)
+                totals[name] += value if isinstance(value, int) else 0
+
+    def _run_review_passes(self, shared_code: str, selected: List[str]) -> Dict[str, str]:
+        """Run each review pass as its own request, concurrently"""
+        cache_ready = threading.Event()
+        if len(selected) < 2 or estimate_tokens(shared_code) < MIN_CACHEABLE_TOKENS:
+            cache_ready.set()
+
+        def run_pass(name: str, first: bool) -> str:
+            request = {
+                "model": self.REVIEW_MODEL,
+                "task": "code",
+                "messages": [{"role": "user", "content": build_cached_content(shared_code, self.REVIEW_PASSES[name])}]
+            }
+            try:
+                if first and not cache_ready.is_set():
+                    with stream_message(self.client, **request) as stream:
+                        for _ in stream.text_stream:
+                            cache_ready.set()
+                        response = stream.get_final_message()
+                else:
+                    cache_ready.wait(remaining())
+                    response = create_message(self.client, **request)
+                self._record_review_usage(response)
+                print(f"✅ {name.title()} completed")
+                return response.content[0].text
+            except Exception as e:
+                print(f"❌ {name.title()} failed: {e}")
+                return f"Error: {e}"
+            finally:
+                if first:
+                    cache_ready.set()
+
+        print(f"🔍 Running {', '.join(name.title() for name in selected)} Analysis...")
+        with ThreadPoolExecutor(max_workers=max(len(selected), 1)) as executor:
+            # Each pass runs in a copy of this context to keep the deadline and traffic class
+            futures = [executor.submit(contextvars.copy_context().run, run_pass, name, index == 0)
+                       for index, name in enumerate(selected)]
+            return {name: future.result() for name, future in zip(selected, futures)}
+
+    def _run_chunked_review(self, file_path: str, chunks: List[CodeChunk], selected: List[str]) -> Dict[str, str]:
+        """Run each review pass over the parts of a file too large for one prompt"""
+        print(f"📄 {file_path} is large; reviewing it in {len(chunks)} parts...")
+
+        def ask(prompt: str) -> str:
+            response = create_message(
+                self.client,
+                model=self.REVIEW_MODEL,
+                task="code",
+                messages=[{"role": "user", "content": prompt}]
+            )
+            self._record_review_usage(response)
+            return response.content[0].text
+
+        def run_pass(name: str) -> str:
+            def map_prompt(chunk: CodeChunk) -> str:
+                return (f"Here is part of a Python file ({chunk.label}), after the module's imports and "
+                        f"globals:\n\n```python\n{chunk.text}\n```\n\n{self.REVIEW_PASSES[name]} "
+                        f"Only cover {chunk.label}.")
+
+            def reduce_prompt(partials: List[str]) -> str:
+                return (f"These are {name} results for consecutive parts of the Python file {file_path}. "
+                        f"Merge them into one report for the whole file: drop duplicates, keep each "
+                        f"finding's line range and put the most important findings first.\n\n"
+                        + "\n\n".join(partials))
+
+            try:
+                result = map_reduce(chunks, map_prompt, ask, None if name in self.CODE_PASSES else reduce_prompt)
+                print(f"✅ {name.title()} completed")
+                return result
+            except Exception as e:
+                print(f"❌ {name.title()} failed: {e}")
+                return f"Error: {e}"
+
+        with ThreadPoolExecutor(max_workers=max(len(selected), 1)) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, run_pass, name) for name in selected]
+            return {name: future.result() for name, future in zip(selected, futures)}
+
+    @classmethod
+    def review_tool(cls, selected: Sequence[str]) -> Dict[str, Any]:
+        """Tool definition whose input schema has one text section per review pass"""
+        return {
+            "name": cls.REVIEW_TOOL_NAME,
+            "description": "Submit the results of all review tasks for the code.",
+            "input_schema": {
+                "type": "object",
+                "properties": {name: {"type": "string", "description": cls.REVIEW_PASSES[name]}
+                               for name in selected},
+                "required": list(selected),
+                "additionalProperties": False
+            }
+        }
+
+    @classmethod
+    def validate_review_sections(cls, data: Any, selected: Sequence[str]) -> Dict[str, str]:
+        """
+        Check a structured review against the review_tool schema
+
+        Args:
+            data: Input of the submit_review tool call
+            selected: Passes the review was asked for
+
+        Returns:
+            The sections that are present and non-empty text; other passes are left out
+        """
+        if not isinstance(data, dict):
+            return {}
+        return {name: data[name] for name in selected
+                if isinstance(data.get(name), str) and data[name].strip()}
+
+    def _run_structured_review(self, shared_code: str, selected: List[str]) -> Dict[str, str]:
+        """Answer every review pass with one tool call; returns only the valid sections"""
+        tasks = "\n".join(f"- {name}: {self.REVIEW_PASSES[name]}" for name in selected)
+        instruction = (f"Complete each of these tasks for the code above and submit every result "
+                       f"with the {self.REVIEW_TOOL_NAME} tool:\n{tasks}")
+        print(f"🔍 Running {', '.join(name.title() for name in selected)} Analysis in one request...")
+        try:
+            response = create_message(
+                self.client,
+                model=self.REVIEW_MODEL,
+                task="code",
+                # Room for every section, within the model's output limit
+                max_tokens=output_budget(self.REVIEW_MODEL, "code") * len(selected),
+                tools=[self.review_tool(selected)],
+                tool_choice={"type": "tool", "name": self.REVIEW_TOOL_NAME},
+                messages=[{"role": "user", "content": build_cached_content(shared_code, instruction)}]
+            )
+        except Exception as e:
+            print(f"❌ Structured review failed: {e}")
+            return {}
+        self._record_review_usage(response)
+        submitted = next((block.input for block in response.content
+                          if getattr(block, "type", None) == "tool_use" and block.name == self.REVIEW_TOOL_NAME), None)
+        sections = self.validate_review_sections(submitted, selected)
+        if sections:
+            print(f"✅ {', '.join(name.title() for name in sections)} completed")
+        return sections
+
+    @classmethod
+    def review_prompt_version(cls, selected: Sequence[str]) -> str:
+        """Short hash of the prompts of the selected passes; changes whenever a prompt is edited"""
+        prompts = json.dumps({name: cls.REVIEW_PASSES[name] for name in selected}, sort_keys=True)
+        return hashlib.sha256(prompts.encode("utf-8")).hexdigest()[:12]
+
+    @with_deadline
+    def review_repository(self, root: str,
+                          include: Optional[Sequence[str]] = None,
+                          exclude: Optional[Sequence[str]] = None,
+                          store_path: Optional[str] = None,
+                          max_files_in_flight: int = 8,
+                          passes: Optional[Sequence[str]] = None,
+                          single_call: bool = False,
+                          base_ref: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Review every Python file under a directory
+
+        Files are reviewed ``max_files_in_flight`` at a time and each result
+        is appended to a ReviewStore as soon as it finishes. The store is
+        also an index of content hash, prompt version and model: a file whose
+        content was already reviewed with the same prompts and model is
+        served from it instead of being sent again, so an interrupted run
+        picks up where it stopped and an unchanged tree costs no requests.
+        Empty files (such as most ``__init__.py``) are skipped. With ``base_ref`` only files that git reports as changed since that
+        ref (or untracked) are considered at all, which keeps a pre-commit
+        run on a large repository down to the files being committed. Once
+        the deadline has passed no new files are started. Requests run in
+        the BATCH traffic class, so interactive calls overtake them.
+
+        Args:
+            root: Directory to review
+            include: Glob patterns of files to review (see find_python_files)
+            exclude: Glob patterns of files and directories to skip
+            store_path: JSONL store (``<root>/.claude_reviews/reviews.jsonl`` if None)
+            max_files_in_flight: Files reviewed at the same time
+            passes: Review passes to run on each file (all of them by default)
+            single_call: Review each file with one structured request
+            base_ref: Git ref to compare with; only files changed since it are reviewed
+
+        Returns:
+            Counts of files found, changed, skipped, reviewed and failed, with the token usage and store path
+        """
+        started = time.monotonic()
+        unknown = sorted(set(passes or ()) - set(self.REVIEW_PASSES))
+        if unknown:
+            return {"error": f"Unknown review passes: {', '.join(unknown)}"}
+        selected = [name for name in self.REVIEW_PASSES if passes is None or name in passes]
+        prompt_version = self.review_prompt_version(selected)
+
+        root_path = Path(root)
+        store = ReviewStore(store_path or root_path / ".claude_reviews" / "reviews.jsonl")
+        files = find_python_files(root_path, include, exclude)
+        try:
+            candidates = files if base_ref is None else sorted(set(files) & changed_files(root_path, base_ref))
+        except RuntimeError as e:
+            return {"error": f"Failed to find changed files: {e}"}
+
+        todo = []
+        for path in candidates:
+            if (root_path / path).stat().st_size == 0:
+                continue
+            content_hash = file_hash(root_path / path)
+            key = (content_hash, prompt_version, self.REVIEW_MODEL)
+            current = store.get(path)
+            if (current is not None and not current.get("failed")
+                    and (current.get("content_hash"), current.get("prompt_version"), current.get("model")) == key):
+                continue
+            known = store.lookup(*key)
+            if known is None:
+                todo.append((path, content_hash))
+            else:
+                # Same content under another path, or reverted to a version reviewed before
+                store.add(path, known["results"], content_hash=content_hash, prompt_version=prompt_version,
+                          model=self.REVIEW_MODEL, reused_from=known["path"])
+        summary: Dict[str, Any] = {
+            "files": len(files), "changed": len(candidates), "skipped": len(files) - len(todo),
+            "reviewed": 0, "failed": 0, "remaining": len(todo), "interrupted": False, "store": str(store.path),
+            "usage": {"requests": 0, "input_tokens": 0, "cache_creation_input_tokens": 0,
+                      "cache_read_input_tokens": 0, "output_tokens": 0}
+        }
+        print(f"📂 {len(files)} Python files under {root}; {len(todo)} to review, "
+              f"{summary['skipped']} unchanged or already reviewed")
+
+        def review_one(path: str, content_hash: str) -> Dict[str, Any]:
+            file_started = time.monotonic()
+            results = self.code_review_and_refactor(str(root_path / path), passes=selected, single_call=single_call)
+            return store.add(path, results, content_hash=content_hash, prompt_version=prompt_version,
+                             model=self.REVIEW_MODEL, seconds=round(time.monotonic() - file_started, 3),
+                             usage=self.last_review_usage)
+
+        queued = iter(todo)
+        executor = ThreadPoolExecutor(max_workers=max(max_files_in_flight, 1))
+        pending: Dict[Future, str] = {}
+        try:
+            while True:
+                # Submit only as many files as can run, so a deadline or Ctrl-C stops new work promptly
+                while len(pending) < max_files_in_flight and not expired():
+                    item = next(queued, None)
+                    if item is None:
+                        break
+                    pending[executor.submit(_batch_context().run, review_one, *item)] = item[0]
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    path = pending.pop(future)
+                    record = future.result()
+                    summary["remaining"] -= 1
+                    summary["failed" if record["failed"] else "reviewed"] += 1
+                    for name, value in record["usage"].items():
+                        summary["usage"][name] = summary["usage"].get(name, 0) + value
+                    print(f"{'❌' if record['failed'] else '✅'} [{len(files) - summary['remaining']}/{len(files)}] {path}")
+        except KeyboardInterrupt:
+            summary["interrupted"] = True
+            print(f"\n⏸️ Interrupted; finished files are saved in {store.path}, run again to resume")
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=not summary["interrupted"])
+        if summary["remaining"] and not summary["interrupted"]:
+            note_cut_short()
+        summary["seconds"] = round(time.monotonic() - started, 3)
+        return summary
+
+    @with_deadline
+    def review_diff(self, base_ref: str, head_ref: Optional[str] = None,
+                    root: str = ".",
+                    context_lines: int = 3,
+                    max_request_tokens: Optional[int] = None,
+                    max_workers: int = 4) -> Dict[str, Any]:
+        """
+        Review only what changed between two git refs
+
+        Instead of whole files, the unified diff is sent: each hunk keeps
+        ``context_lines`` unchanged lines around the change, is numbered with
+        the new file's line numbers and is preceded by the signatures of the
+        classes and functions it sits in. Hunks are packed in diff order into
+        requests of at most ``max_request_tokens`` that run concurrently, and
+        the findings each request reports are checked against the hunks it
+        was sent, so every finding points at a file and line in the change.
+        No new requests start once the deadline has passed. Requests run in
+        the BATCH traffic class.
+
+        Args:
+            base_ref: Ref to compare from (e.g. the PR's merge base)
+            head_ref: Ref to compare to, or None for the working tree
+            root: Directory inside the git work tree; paths are relative to it
+            context_lines: Unchanged lines kept around each change
+            max_request_tokens: Token budget of the hunks in one request (DIFF_REQUEST_TOKENS if None)
+            max_workers: Requests sent at the same time
+
+        Returns:
+            Findings sorted by file and line, with the size of the diff, the
+            estimated prompt tokens against the full changed files, and any errors
+        """
+        sources: Dict[str, str] = {}
+        try:
+            hunks = diff_hunks(root, base_ref, head_ref, context_lines, sources=sources)
+        except (RuntimeError, OSError) as e:
+            return {"error": f"Failed to read the diff: {e}"}
+        batches = pack_hunks(hunks, max_request_tokens or self.DIFF_REQUEST_TOKENS)
+        instruction = ("Review the change below for bugs, security problems and maintainability issues. "
+                       "Lines starting with + were added and - removed; the number before a line is its "
+                       "line number in the new file. Lines marked '# enclosing' are the signatures of the "
+                       "code the hunk is in. Report only problems in added or changed lines with the "
+                       f"{FINDINGS_TOOL['name']} tool, using the file and new line number shown.")
+        result: Dict[str, Any] = {
+            "findings": [], "files": len(sources), "hunks": len(hunks), "requests": 0,
+            "prompt_tokens": 0, "full_file_tokens": sum(estimate_tokens(source) for source in sources.values()),
+            "dropped": 0, "errors": []
+        }
+        if not batches:
+            return result
+        print(f"🔍 Reviewing {len(hunks)} hunks in {len(sources)} files with {len(batches)} requests...")
+
+        def review_batch(batch: List[DiffHunk]) -> Dict[str, Any]:
+            prompt = instruction + "\n\n" + "\n".join(hunk.text for hunk in batch)
+            response = create_message(
+                self.client,
+                model=self.REVIEW_MODEL,
+                task="code",
+                tools=[FINDINGS_TOOL],
+                tool_choice={"type": "tool", "name": FINDINGS_TOOL["name"]},
+                messages=[{"role": "user", "content": prompt}]
+            )
+            reported = next((block.input for block in response.content
+                             if getattr(block, "type", None) == "tool_use" and block.name == FINDINGS_TOOL["name"]),
+                            {})
+            findings, dropped = map_findings(reported.get("findings") if isinstance(reported, dict) else None,
+                                             batch)
+            return {"findings": findings, "dropped": dropped, "prompt_tokens": estimate_tokens(prompt)}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            futures = []
+            for batch in batches:
+                if expired():
+                    note_cut_short()
+                    break
+                futures.append((batch, executor.submit(_batch_context().run, review_batch, batch)))
+            for batch, future in futures:
+                try:
+                    reviewed = future.result()
+                except Exception as e:
+                    paths = ", ".join(sorted({hunk.path for hunk in batch}))
+                    result["errors"].append(f"{paths}: {e}")
+                    continue
+                result["requests"] += 1
+                result["prompt_tokens"] += reviewed["prompt_tokens"]
+                result["dropped"] += reviewed["dropped"]
+                result["findings"].extend(reviewed["findings"])
+        result["findings"].sort(key=lambda finding: (finding["path"], finding["line"]))
+        print(f"✅ {len(result['findings'])} findings; ~{result['prompt_tokens']} prompt tokens "
+              f"instead of ~{result['full_file_tokens']} for the whole files")
+        return result
     
-    def generate_test_cases(self, function_code: str) -> str:
-        """Generate comprehensive test cases for a function"""
-        prompt = f"""
+    @staticmethod
+    def build_test_generation_prompt(function_code: str) -> str:
+        """Build the generate_test_cases prompt for a function"""
+        return f"""
         Generate comprehensive unit tests for this Python function using pytest.
         Include edge cases, error handling, and various input scenarios:
         
@@ -65,46 +504,217 @@ class AdvancedClaudeDemo:
         {function_code}
         ```
         
-        Provide complete test code that I can run directly.
+        Provide complete test code that I can run directly. The function is in
+        the module `{MODULE_NAME}`; import it from there.
         """
+    
+    @with_deadline
+    def generate_test_cases(self, function_code: str) -> str:
+        """Generate comprehensive test cases for a function"""
+        prompt = self.build_test_generation_prompt(function_code)
         
         try:
-            response = self.client.messages.create(
+            response = create_message(
+                self.client,
                 model="claude-3-5-sonnet-20241022",
-                max_tokens=1500,
+                task="code",
                 messages=[{"role": "user", "content": prompt}]
             )
             return response.content[0].text
         except Exception as e:
             return f"Error generating tests: {e}"
     
-    def explain_complex_code(self, code: str) -> str:
-        """Provide detailed explanation of complex code"""
-        prompt = f"""
+    def generate_test_cases_batch(self, functions: Dict[str, str],
+                                  submitter: Optional[BatchSubmitter] = None,
+                                  timeout: Optional[float] = None) -> Dict[str, str]:
+        """
+        Generate tests for many functions through the Message Batches API
+        
+        Args:
+            functions: Function source keyed by custom_id (letters, digits, '-' and '_')
+            submitter: Batch submitter to use (defaults to one on this client)
+            timeout: Maximum seconds to wait for the batch
+            
+        Returns:
+            Generated tests (or an error string) keyed by custom_id
+        """
+        requests = [
+            {
+                "custom_id": custom_id,
+                "params": {
+                    "model": "claude-3-5-sonnet-20241022",
+                    "max_tokens": output_budget("claude-3-5-sonnet-20241022", "code"),
+                    "messages": [{"role": "user", "content": self.build_test_generation_prompt(code)}]
+                }
+            }
+            for custom_id, code in functions.items()
+        ]
+        submitter = submitter or BatchSubmitter(self.client)
+        return submitter.run(requests, timeout=timeout)
+
+    def _repair_tests(self, function_code: str, test_code: str, result: Dict[str, Any]) -> str:
+        """Ask again for the failing tests only and splice them into the module; the whole module if it did not run"""
+        failing = failing_tests(result)
+        if failing:
+            failures = "\n\n".join(f"{test_id}:\n{message}" for test_id, message in failing.items())
+            prompt = (f"These pytest tests for the function below failed:\n\n{failures}\n\n"
+                      f"```python\n{function_code}\n```\n\n"
+                      "Write corrected versions of only these tests, as top-level test functions, so that "
+                      "they check the function's intended behavior. Do not repeat the passing tests. "
+                      f"Import the function from `{MODULE_NAME}`.")
+        else:
+            prompt = (f"{self.build_test_generation_prompt(function_code)}\n"
+                      f"A previous attempt could not be run:\n\n{result['output'][-2000:]}")
+        response = create_message(
+            self.client,
+            model="claude-3-5-sonnet-20241022",
+            task="code",
+            messages=[{"role": "user", "content": prompt}]
+        )
+        replacement = build_test_module(response.content[0].text)
+        if not failing:
+            return replacement
+        return drop_tests(test_code, set(failing)).rstrip() + "\n\n\n" + replacement
+
+    def validate_test_cases(self, functions: Dict[str, str],
+                            generated: Optional[Dict[str, str]] = None,
+                            regenerate_failing: bool = False,
+                            limits: Optional[SandboxLimits] = None,
+                            max_workers: Optional[int] = None,
+                            max_requests: int = 8) -> Dict[str, Dict[str, Any]]:
+        """
+        Generate tests for functions and check that they actually run
+
+        The code blocks of each generate_test_cases response are written
+        next to the function in a temporary directory and run with pytest
+        in an isolated subprocess under ``limits``, one subprocess per CPU
+        core at a time. Generation and execution overlap: a function's tests
+        start running as soon as its response arrives. With
+        ``regenerate_failing`` the model is asked once more for only the
+        tests that failed (or the whole module, if it could not be run at
+        all), and the repaired module is run again. Requests run in the
+        BATCH traffic class.
+
+        Args:
+            functions: Function source keyed by name
+            generated: Responses already generated (e.g. by generate_test_cases_batch), keyed the same way
+            regenerate_failing: Ask again for the failing tests and rerun them
+            limits: Resource limits of each run
+            max_workers: Test runs at the same time (one per CPU core if None)
+            max_requests: Generation requests sent at the same time
+
+        Returns:
+            Per function: the run_tests result (status, per-test outcomes,
+            counts, output) with the ``test_code`` that was run and whether
+            it was ``regenerated``
+        """
+        generated = dict(generated or {})
+        workers = max(1, max_workers or os.cpu_count() or 1)
+        results: Dict[str, Dict[str, Any]] = {}
+
+        def generate(name: str) -> str:
+            if name not in generated:
+                generated[name] = self.generate_test_cases(functions[name])
+            return generated[name]
+
+        def validate(name: str, response: str) -> Dict[str, Any]:
+            test_code = build_test_module(response)
+            result = run_tests(functions[name], test_code, limits)
+            result.update(test_code=test_code, regenerated=False)
+            if regenerate_failing and result["status"] != "passed":
+                try:
+                    repaired = self._repair_tests(functions[name], test_code, result)
+                except Exception as e:
+                    result["output"] += f"\nError regenerating tests: {e}"
+                    return result
+                result = run_tests(functions[name], repaired, limits)
+                result.update(test_code=repaired, regenerated=True)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, max_requests)) as requests, \
+                ThreadPoolExecutor(max_workers=workers) as runs:
+            responses = {requests.submit(_batch_context().run, generate, name): name for name in functions}
+            validations = {}
+            for response in as_completed(responses):
+                name = responses[response]
+                validations[name] = runs.submit(_batch_context().run, validate, name, response.result())
+            for name in functions:
+                future = validations[name]
+                results[name] = future.result()
+                print(f"{'✅' if results[name]['status'] == 'passed' else '❌'} {name}: "
+                      f"{results[name]['passed']} passed, {results[name]['failed']} failed, "
+                      f"{results[name]['errors']} errors")
+        return results
+    
+    @staticmethod
+    def _explanation_prompt(code: str, part: Optional[str] = None) -> str:
+        """Build the explain_complex_code prompt for code or one part of it"""
+        scope = f"\n        This is {part} of a larger module, after its imports and globals; explain only that part.\n" if part else ""
+        return f"""
         Explain this code in detail, breaking down:
         1. What it does (high-level purpose)
         2. How it works (step-by-step logic)
         3. Key concepts and patterns used
         4. Potential improvements or alternatives
-        
+        {scope}
         Code to explain:
         ```python
         {code}
         ```
         """
-        
-        try:
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1500,
+    
+    @with_deadline
+    def explain_complex_code(self, code: str) -> str:
+        """
+        Provide detailed explanation of complex code
+
+        Code larger than CHUNK_TOKENS is split on class and function
+        boundaries, the parts are explained in parallel and the explanations
+        are merged into one.
+        """
+        def ask(prompt: str) -> str:
+            response = get_shared_router().send(
+                self.client,
+                task="explanation",
                 messages=[{"role": "user", "content": prompt}]
             )
             return response.content[0].text
+        
+        try:
+            chunks = chunk_python_source(code, self.CHUNK_TOKENS)
+            if len(chunks) == 1:
+                return ask(self._explanation_prompt(code))
+            
+            print(f"📄 The code is large; explaining it in {len(chunks)} parts...")
+            return map_reduce(
+                chunks,
+                lambda chunk: self._explanation_prompt(chunk.text, chunk.label),
+                ask,
+                lambda partials: (
+                    "These explain consecutive parts of one Python module. Combine them into a single "
+                    "explanation of the whole module: its high-level purpose, how the parts work "
+                    "together, the key concepts and patterns, and possible improvements.\n\n"
+                    + "\n\n".join(partials)
+                )
+            )
         except Exception as e:
             return f"Error explaining code: {e}"
     
-    def optimize_performance(self, code: str) -> str:
-        """Analyze and optimize code performance"""
+    @with_deadline
+    def optimize_performance(self, code: str, verify: bool = False) -> Union[str, Dict[str, Any]]:
+        """
+        Analyze and optimize code performance
+        
+        Args:
+            code: Code to optimize
+            verify: Check the optimized functions against the originals and
+                time both (see speedup.measure_speedup)
+            
+        Returns:
+            The analysis; with ``verify``, a dict of the analysis, the
+            measured speedup and memory change per function, and the
+            optimized code only if every function matched and got faster
+        """
         prompt = f"""
         Analyze this code for performance bottlenecks and provide optimized versions:
         
@@ -113,6 +723,8 @@ class AdvancedClaudeDemo:
         3. Provide optimized code with explanations
         4. Compare time/space complexity before and after
         
+        Keep each function's name and signature so the optimized code is a drop-in replacement.
+        
         Code to optimize:
         ```python
         {code}
@@ -120,14 +732,19 @@ class AdvancedClaudeDemo:
         """
         
         try:
-            response = self.client.messages.create(
+            response = create_message(
+                self.client,
                 model="claude-3-5-sonnet-20241022",
-                max_tokens=2000,
+                task="code",
                 messages=[{"role": "user", "content": prompt}]
             )
-            return response.content[0].text
+            text = response.content[0].text
         except Exception as e:
-            return f"Error optimizing code: {e}"
+            return {"error": f"Error optimizing code: {e}"} if verify else f"Error optimizing code: {e}"
+        if not verify:
+            return text
+        print("⏱️ Checking and timing the optimized functions...")
+        return verify_optimization(code, text)
 
 def demo_file_analysis():
     """Demonstrate file analysis similar to DataCamp's client.py example"""
@@ -160,14 +777,16 @@ class APIClient:
         return response.status_code == 201
 '''
     
-    # Write sample file
-    with open('sample_api_client.py', 'w') as f:
-        f.write(sample_file_content)
-    
-    demo = AdvancedClaudeDemo()
-    
-    print("📁 Analyzing sample_api_client.py...")
-    results = demo.code_review_and_refactor('sample_api_client.py')
+    # Write the sample file to a temporary directory rather than the current one
+    with tempfile.TemporaryDirectory() as workdir:
+        sample_file = os.path.join(workdir, 'sample_api_client.py')
+        with open(sample_file, 'w') as f:
+            f.write(sample_file_content)
+        
+        demo = AdvancedClaudeDemo()
+        
+        print("📁 Analyzing sample_api_client.py...")
+        results = demo.code_review_and_refactor(sample_file)
     
     for task_name, result in results.items():
         if task_name != "error":
@@ -176,8 +795,6 @@ class APIClient:
             print('='*60)
             print(result)
     
-    # Clean up
-    os.remove('sample_api_client.py')
     print("\n✅ File analysis demonstration completed!")
 
 def demo_test_generation():
@@ -211,6 +828,12 @@ def binary_search(arr, target):
     print("\n📝 Generated Test Cases:")
     print("="*60)
     print(tests)
+    
+    print("\n🏃 Running the generated tests in a sandbox...")
+    result = demo.validate_test_cases({"binary_search": function_code}, {"binary_search": tests},
+                                      regenerate_failing=True)["binary_search"]
+    for test_id, test in result["tests"].items():
+        print(f"   {test['outcome']:>7}  {test_id}")
 
 def demo_performance_optimization():
     """Demonstrate performance optimization"""
@@ -236,11 +859,16 @@ def fibonacci_slow(n):
     demo = AdvancedClaudeDemo()
     
     print("⚡ Optimizing performance-critical code...")
-    optimization = demo.optimize_performance(slow_code)
+    optimization = demo.optimize_performance(slow_code, verify=True)
+    if "error" in optimization:
+        print(f"❌ {optimization['error']}")
+        return
     
     print("\n🚀 Performance Optimization Results:")
     print("="*60)
-    print(optimization)
+    print(optimization["response"])
+    print("\n📏 Measured:")
+    print(format_measurements(optimization["measurements"]))
 
 def demo_code_explanation():
     """Demonstrate complex code explanation"""
@@ -0,0 +1,191 @@
+"""
+Asynchronous Claude client
+asyncio counterpart of ClaudeClient with concurrent fan-out
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+import anthropic
+
+from .basic_demo import ClaudeClient
+from .bulkhead import BATCH, traffic_class
+from .client_pool import get_client_pool
+from .deadline import with_deadline
+from .messaging import create_message_async
+from .model_router import get_shared_router
+
+
+class AsyncClaudeClient:
+    """
+    asyncio version of ClaudeClient built on ``anthropic.AsyncAnthropic``.
+
+    Each instance owns an async connection pool sized and instrumented like
+    the shared sync pool (see ClientPool.new_async_http_client).
+    """
+
+    def __init__(self, api_key: Optional[str] = None, max_concurrency: int = 10):
+        """
+        Initialize async Claude client
+
+        Args:
+            api_key: Your Anthropic API key. If not provided, will look for ANTHROPIC_API_KEY env var
+            max_concurrency: Default cap on in-flight requests for chat_many
+        """
+        pool = get_client_pool()
+        self.client = anthropic.AsyncAnthropic(
+            api_key=api_key or os.getenv("ANTHROPIC_API_KEY"),
+            base_url=pool.base_url,
+            http_client=pool.new_async_http_client(),
+            timeout=pool.timeout(),
+            max_retries=0
+        )
+        self.max_concurrency = max_concurrency
+
+    async def __aenter__(self) -> "AsyncClaudeClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the underlying connection pool"""
+        await self.client.close()
+
+    async def _create(self, messages: List[Dict[str, str]], model: Optional[str]) -> str:
+        """Send one request (routed if model is None) and return the text, raising on failure"""
+        if model is None:
+            message_obj = await get_shared_router().send_async(self.client, task="chat", messages=messages)
+        else:
+            message_obj = await create_message_async(
+                self.client,
+                model=model,
+                task="chat",
+                messages=messages
+            )
+        return message_obj.content[0].text
+
+    @with_deadline
+    async def chat(self, message: str, model: Optional[str] = None) -> str:
+        """
+        Send a message to Claude and get a response
+
+        Args:
+            message: The message to send to Claude
+            model: The Claude model to use (routed by cost and complexity if omitted)
+
+        Returns:
+            Claude's response
+        """
+        try:
+            return await self._create([{"role": "user", "content": message}], model)
+        except Exception as e:
+            return f"Error: {e}"
+
+    @with_deadline
+    async def multi_turn_conversation(self, messages: List[Dict[str, str]],
+                                      model: Optional[str] = None) -> str:
+        """
+        Have a multi-turn conversation with Claude
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            model: The Claude model to use (routed by cost and complexity if omitted)
+
+        Returns:
+            Claude's response
+        """
+        try:
+            return await self._create(messages, model)
+        except Exception as e:
+            return f"Error: {e}"
+
+    @with_deadline
+    async def analyze_code(self, code: str, task: str = "analyze") -> str:
+        """
+        Analyze code using Claude
+
+        Args:
+            code: The code to analyze
+            task: The task to perform (analyze, refactor, document, debug)
+
+        Returns:
+            Claude's analysis
+        """
+        return await self.chat(ClaudeClient.build_analysis_prompt(code, task))
+
+    @with_deadline
+    async def chat_many(self, prompts: List[str],
+                        concurrency: Optional[int] = None,
+                        model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Send many prompts concurrently
+
+        Args:
+            prompts: Messages to send, one request each
+            concurrency: Maximum in-flight requests (defaults to max_concurrency)
+            model: The Claude model to use (routed per prompt if omitted)
+
+        Returns:
+            One result per prompt, in input order. Each result has
+            'index', 'response' and 'error'; exactly one of the last two is set.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.max_concurrency)
+
+        async def run_one(index: int, prompt: str) -> Dict[str, Any]:
+            # Fan-outs use the batch bulkhead so they cannot starve interactive calls
+            async with semaphore:
+                try:
+                    with traffic_class(BATCH):
+                        text = await self._create([{"role": "user", "content": prompt}], model)
+                    return {"index": index, "response": text, "error": None}
+                except Exception as e:
+                    return {"index": index, "response": None, "error": str(e)}
+
+        return list(await asyncio.gather(*(run_one(i, p) for i, p in enumerate(prompts))))
+
+    @with_deadline
+    async def analyze_code_many(self, codes: List[str], task: str = "analyze",
+                                concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Analyze many code snippets concurrently
+
+        Args:
+            codes: Code snippets to analyze
+            task: The task to perform (analyze, refactor, document, debug)
+            concurrency: Maximum in-flight requests (defaults to max_concurrency)
+
+        Returns:
+            One result per snippet, in input order (see chat_many)
+        """
+        prompts = [ClaudeClient.build_analysis_prompt(code, task) for code in codes]
+        return await self.chat_many(prompts, concurrency=concurrency)
+
+
+async def demonstrate_concurrent_analysis():
+    """Demonstrate fanning out several code analyses at once"""
+    print("=== Concurrent Code Analysis Demo ===")
+
+    snippets = [
+        "def add(a, b):\n    return a + b",
+        "def is_even(n):\n    return n % 2 == 0",
+        "def reverse(s):\n    return s[::-1]",
+    ]
+
+    async with AsyncClaudeClient() as client:
+        results = await client.analyze_code_many(snippets, concurrency=3)
+
+    for snippet, result in zip(snippets, results):
+        print(f"\n📄 {snippet.splitlines()[0]}")
+        print(result["response"] if result["error"] is None else f"❌ Error: {result['error']}")
+    print("\n" + "="*50 + "\n")
+
+
+def main():
+    """Run the async demonstration"""
+    asyncio.run(demonstrate_concurrent_analysis())
+
+
+if __name__ == "__main__":
+    main()
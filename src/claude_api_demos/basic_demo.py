@@ -1,86 +1,239 @@
-import anthropic
-import os
-from typing import Optional, List, Dict, Any
+import time
+from typing import Optional, List, Dict, Any, Iterator
 import json
 
+from .batches import BatchSubmitter
+from .client_pool import get_shared_client
+from .deadline import with_deadline
+from .hedging import HedgePolicy
+from .messaging import create_message, stream_message
+from .model_router import get_shared_router
+from .response_cache import ResponseCache, request_cache_key
+from .token_budget import output_budget
+
 class ClaudeClient:
-    def __init__(self, api_key: Optional[str] = None):
+    # Instruction prefixes used by analyze_code
+    ANALYSIS_PROMPTS = {
+        "analyze": "Analyze this code and provide insights about its structure, functionality, and potential improvements:",
+        "refactor": "Refactor this code to improve readability, maintainability, and performance:",
+        "document": "Add comprehensive documentation and comments to this code:",
+        "debug": "Identify potential bugs or issues in this code and suggest fixes:"
+    }
+
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[ResponseCache] = None,
+                 hedge: Optional[HedgePolicy] = None):
         """
         Initialize Claude client
         
         Args:
             api_key: Your Anthropic API key. If not provided, will look for ANTHROPIC_API_KEY env var
+            cache: Optional response cache; identical requests are then served from it
+            hedge: Optional hedging policy; slow-to-start requests are then duplicated
+        """
+        self.client = get_shared_client(api_key)
+        self.cache = cache
+        self.hedge = hedge
+        self.stream_metrics: List[Dict[str, Any]] = []
+    
+    def _complete(self, messages: List[Dict[str, str]], model: Optional[str], bypass_cache: bool = False) -> str:
+        """
+        Send a request (or serve it from the cache) and return the text
+        
+        Args:
+            messages: Conversation messages
+            model: The Claude model to use, or None to let the model router choose
+            bypass_cache: Skip the cache lookup; the fresh answer still refreshes the cache
+            
+        Returns:
+            Claude's response text
         """
-        self.client = anthropic.Anthropic(
-            api_key=api_key or os.getenv("ANTHROPIC_API_KEY")
-        )
+        # max_tokens follows from the input and the task, so the task stands in for it in the key
+        key = request_cache_key({"model": model or "auto", "messages": messages, "task": "chat"}) if self.cache is not None else None
+        if key is not None and not bypass_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        sender = self.hedge.create if self.hedge is not None else create_message
+        if model is None:
+            message_obj = get_shared_router().send(self.client, task="chat", sender=sender, messages=messages)
+        else:
+            message_obj = sender(self.client, model=model, task="chat", messages=messages)
+        text = message_obj.content[0].text
+        if key is not None:
+            self.cache.set(key, text)
+        return text
     
-    def chat(self, message: str, model: str = "claude-3-5-sonnet-20241022") -> str:
+    @with_deadline
+    def chat(self, message: str, model: Optional[str] = None,
+             bypass_cache: bool = False) -> str:
         """
         Send a message to Claude and get a response
         
         Args:
             message: The message to send to Claude
-            model: The Claude model to use
+            model: The Claude model to use (routed by cost and complexity if omitted)
+            bypass_cache: Ignore any cached answer for this request
             
         Returns:
             Claude's response
         """
         try:
-            message_obj = self.client.messages.create(
+            return self._complete([{"role": "user", "content": message}], model, bypass_cache)
+        except Exception as e:
+            return f"Error: {e}"
+    
+    @with_deadline
+    def chat_stream(self, message: str, model: str = "claude-3-5-sonnet-20241022") -> Iterator[str]:
+        """
+        Send a message to Claude and yield the response text as it arrives
+        
+        Timing for each call is appended to ``stream_metrics`` once the
+        stream finishes: time to first token, total duration and output
+        tokens per second (measured from the first token to the end).
+        
+        Args:
+            message: The message to send to Claude
+            model: The Claude model to use
+            
+        Yields:
+            Text deltas from Claude's response
+        """
+        started = time.perf_counter()
+        first_token_at = None
+        metrics: Dict[str, Any] = {"model": model, "error": None}
+        try:
+            with stream_message(
+                self.client,
                 model=model,
-                max_tokens=1000,
+                task="chat",
                 messages=[
                     {"role": "user", "content": message}
                 ]
-            )
-            return message_obj.content[0].text
+            ) as stream:
+                for text in stream.text_stream:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield text
+                final_message = stream.get_final_message()
+            metrics["output_tokens"] = final_message.usage.output_tokens
         except Exception as e:
-            return f"Error: {e}"
+            metrics["error"] = str(e)
+            yield f"Error: {e}"
+        finally:
+            finished = time.perf_counter()
+            metrics["duration"] = round(finished - started, 4)
+            metrics["time_to_first_token"] = round(first_token_at - started, 4) if first_token_at else None
+            output_tokens = metrics.get("output_tokens", 0)
+            generation_time = finished - first_token_at if first_token_at else 0
+            metrics["output_tokens_per_second"] = round(output_tokens / generation_time, 2) if generation_time > 0 else None
+            self.stream_metrics.append(metrics)
+    
+    def get_stream_stats(self) -> Dict[str, Any]:
+        """Summarize time-to-first-token and throughput across streamed calls"""
+        ttfts = sorted(m["time_to_first_token"] for m in self.stream_metrics if m["time_to_first_token"] is not None)
+        rates = [m["output_tokens_per_second"] for m in self.stream_metrics if m["output_tokens_per_second"] is not None]
+        
+        def percentile(values: List[float], pct: float) -> Optional[float]:
+            if not values:
+                return None
+            return values[min(int(len(values) * pct), len(values) - 1)]
+        
+        return {
+            "calls": len(self.stream_metrics),
+            "errors": sum(1 for m in self.stream_metrics if m["error"]),
+            "ttft_p50": percentile(ttfts, 0.50),
+            "ttft_p95": percentile(ttfts, 0.95),
+            "ttft_max": ttfts[-1] if ttfts else None,
+            "average_output_tokens_per_second": round(sum(rates) / len(rates), 2) if rates else None
+        }
     
-    def multi_turn_conversation(self, messages: List[Dict[str, str]], model: str = "claude-3-5-sonnet-20241022") -> str:
+    @with_deadline
+    def multi_turn_conversation(self, messages: List[Dict[str, str]], model: Optional[str] = None,
+                                bypass_cache: bool = False) -> str:
         """
         Have a multi-turn conversation with Claude
         
         Args:
             messages: List of message dictionaries with 'role' and 'content' keys
-            model: The Claude model to use
+            model: The Claude model to use (routed by cost and complexity if omitted)
+            bypass_cache: Ignore any cached answer for this request
             
         Returns:
             Claude's response
         """
         try:
-            message_obj = self.client.messages.create(
-                model=model,
-                max_tokens=1000,
-                messages=messages
-            )
-            return message_obj.content[0].text
+            return self._complete(messages, model, bypass_cache)
         except Exception as e:
             return f"Error: {e}"
     
-    def analyze_code(self, code: str, task: str = "analyze") -> str:
+    @with_deadline
+    def analyze_code(self, code: str, task: str = "analyze", bypass_cache: bool = False) -> str:
         """
         Analyze code using Claude
         
         Args:
             code: The code to analyze
             task: The task to perform (analyze, refactor, document, debug)
+            bypass_cache: Ignore any cached answer for this request
             
         Returns:
             Claude's analysis
         """
-        prompts = {
-            "analyze": "Analyze this code and provide insights about its structure, functionality, and potential improvements:",
-            "refactor": "Refactor this code to improve readability, maintainability, and performance:",
-            "document": "Add comprehensive documentation and comments to this code:",
-            "debug": "Identify potential bugs or issues in this code and suggest fixes:"
-        }
+        return self.chat(self.build_analysis_prompt(code, task), bypass_cache=bypass_cache)
+
+    def analyze_code_batch_requests(self, codes: Dict[str, str], task: str = "analyze",
+                                    model: str = "claude-3-5-sonnet-20241022") -> List[Dict[str, Any]]:
+        """
+        Build Message Batches requests for analyze_code
         
-        prompt = prompts.get(task, prompts["analyze"])
-        full_message = f"{prompt}\n\n```python\n{code}\n```"
+        Args:
+            codes: Code snippets keyed by custom_id (letters, digits, '-' and '_', up to 64 chars)
+            task: The task to perform (analyze, refactor, document, debug)
+            model: The Claude model to use
+            
+        Returns:
+            Requests ready for BatchSubmitter.submit_batch
+        """
+        return [
+            {
+                "custom_id": custom_id,
+                "params": {
+                    "model": model,
+                    "max_tokens": output_budget(model, "chat"),
+                    "messages": [{"role": "user", "content": self.build_analysis_prompt(code, task)}]
+                }
+            }
+            for custom_id, code in codes.items()
+        ]
+    
+    def analyze_code_batch(self, codes: Dict[str, str], task: str = "analyze",
+                           submitter: Optional[BatchSubmitter] = None,
+                           timeout: Optional[float] = None) -> Dict[str, str]:
+        """
+        Analyze many code snippets through the Message Batches API
+        
+        Batches are billed at a discount and are not latency sensitive, so this
+        suits overnight workloads. To survive a crash, submit the requests from
+        analyze_code_batch_requests yourself and resume with BatchSubmitter.
         
-        return self.chat(full_message)
+        Args:
+            codes: Code snippets keyed by custom_id
+            task: The task to perform (analyze, refactor, document, debug)
+            submitter: Batch submitter to use (defaults to one on this client)
+            timeout: Maximum seconds to wait for the batch
+            
+        Returns:
+            Claude's analysis (or an error string) keyed by custom_id
+        """
+        submitter = submitter or BatchSubmitter(self.client)
+        return submitter.run(self.analyze_code_batch_requests(codes, task), timeout=timeout)
+
+    @classmethod
+    def build_analysis_prompt(cls, code: str, task: str = "analyze") -> str:
+        """Build the analyze_code prompt for a task"""
+        prompt = cls.ANALYSIS_PROMPTS.get(task, cls.ANALYSIS_PROMPTS["analyze"])
+        return f"{prompt}\n\n```python\n{code}\n```"
 
 def demonstrate_basic_chat():
     """Demonstrate basic chat functionality"""
@@ -91,6 +244,22 @@ def demonstrate_basic_chat():
     print("Claude:", response)
     print("\n" + "="*50 + "\n")
 
+def demonstrate_streaming_chat():
+    """Demonstrate streaming responses with time-to-first-token metrics"""
+    print("=== Streaming Chat Demo ===")
+    client = ClaudeClient()
+    
+    print("Claude: ", end="", flush=True)
+    for text in client.chat_stream("Explain in a few sentences why streaming responses feel faster."):
+        print(text, end="", flush=True)
+    print()
+    
+    metrics = client.stream_metrics[-1]
+    print(f"\n⏱️ Time to first token: {metrics['time_to_first_token']}s")
+    print(f"⏱️ Total duration: {metrics['duration']}s")
+    print(f"⚡ Output tokens/sec: {metrics['output_tokens_per_second']}")
+    print("\n" + "="*50 + "\n")
+
 def demonstrate_code_analysis():
     """Demonstrate code analysis capabilities"""
     print("=== Code Analysis Demo ===")
@@ -198,6 +367,7 @@ def main():
     try:
         # Run all demonstrations
         demonstrate_basic_chat()
+        demonstrate_streaming_chat()
         demonstrate_code_analysis()
         demonstrate_code_refactoring()
         demonstrate_multi_turn_conversation()
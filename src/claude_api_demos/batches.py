@@ -0,0 +1,280 @@
+"""
+Message Batches support
+Submit bulk requests at batch pricing, poll them and stream results back
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Union
+
+from .client_pool import get_shared_client
+from .retry import get_shared_retry_policy
+
+
+class BatchHandle:
+    """
+    Persistent record of a submitted Message Batch.
+
+    The handle is written to ``<state_dir>/<batch_id>.json`` as soon as the
+    batch is created, and every result read back is appended to
+    ``<batch_id>.results.jsonl``, so a crashed process can pick the batch up
+    again with BatchSubmitter.resume without re-submitting or re-downloading.
+    """
+
+    def __init__(self, batch_id: str, custom_ids: List[str], state_dir: Path,
+                 status: str = "in_progress", created_at: Optional[str] = None):
+        self.batch_id = batch_id
+        self.custom_ids = custom_ids
+        self.state_dir = Path(state_dir)
+        self.status = status
+        self.created_at = created_at or time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    @property
+    def path(self) -> Path:
+        return self.state_dir / f"{self.batch_id}.json"
+
+    @property
+    def results_path(self) -> Path:
+        return self.state_dir / f"{self.batch_id}.results.jsonl"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "batch_id": self.batch_id,
+            "custom_ids": self.custom_ids,
+            "status": self.status,
+            "created_at": self.created_at
+        }
+
+    def save(self):
+        """Write the handle to the state directory"""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        tmp_path.replace(self.path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "BatchHandle":
+        """Read a handle written by save"""
+        path = Path(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["batch_id"], data["custom_ids"], path.parent,
+                   status=data["status"], created_at=data["created_at"])
+
+    def stored_results(self) -> Dict[str, Dict[str, Any]]:
+        """Results already read back and saved locally, keyed by custom_id"""
+        results = {}
+        if self.results_path.exists():
+            with open(self.results_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Cut off by a crash while appending; the result is read back again
+                        continue
+                    results[record["custom_id"]] = record["result"]
+        return results
+
+
+def open_jsonl_for_append(path: Union[str, Path]) -> IO[str]:
+    """
+    Open a JSONL file for appending, starting on a fresh line
+
+    A process that crashed mid-append leaves a last line without its
+    newline; without one added, the next record would be glued onto it
+    and lost along with it when the file is read back.
+    """
+    path = Path(path)
+    if path.exists() and path.stat().st_size:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b"\n"
+        if torn:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n")
+    return open(path, "a", encoding="utf-8")
+
+
+def _result_to_dict(result: Any) -> Dict[str, Any]:
+    """Flatten an SDK batch result into a JSON-friendly dict"""
+    outcome: Dict[str, Any] = {"type": result.type}
+    if result.type == "succeeded":
+        message = result.message
+        outcome["text"] = "".join(
+            block.text for block in message.content if getattr(block, "type", None) == "text"
+        )
+        outcome["stop_reason"] = message.stop_reason
+        outcome["model"] = message.model
+        outcome["usage"] = {
+            "input_tokens": message.usage.input_tokens,
+            "output_tokens": message.usage.output_tokens
+        }
+    elif result.type == "errored":
+        error = getattr(result.error, "error", result.error)
+        outcome["error"] = getattr(error, "message", None) or str(error)
+    return outcome
+
+
+class BatchSubmitter:
+    """
+    Submit Message Batches and map their results back to custom_id.
+
+    Requests use the Batches API shape: ``{"custom_id": ..., "params": {...}}``
+    where params are the usual messages.create arguments.
+    """
+
+    def __init__(self, client: Any = None,
+                 state_dir: Union[str, Path] = ".claude_batches",
+                 poll_interval: float = 30.0):
+        """
+        Initialize the submitter
+
+        Args:
+            client: Anthropic client (defaults to the shared pooled client)
+            state_dir: Directory where handles and downloaded results are kept
+            poll_interval: Seconds between status checks while waiting
+        """
+        self.client = client or get_shared_client()
+        self.state_dir = Path(state_dir)
+        self.poll_interval = poll_interval
+
+    def submit_batch(self, requests: List[Dict[str, Any]]) -> BatchHandle:
+        """
+        Create a Message Batch
+
+        Args:
+            requests: Batch requests, each with a unique 'custom_id' and 'params'
+
+        Returns:
+            A persisted handle for the new batch
+        """
+        custom_ids = [request["custom_id"] for request in requests]
+        if len(set(custom_ids)) != len(custom_ids):
+            raise ValueError("custom_id values must be unique within a batch")
+
+        batch = get_shared_retry_policy().call(
+            lambda: self.client.messages.batches.create(requests=requests)
+        )
+        handle = BatchHandle(batch.id, custom_ids, self.state_dir, status=batch.processing_status)
+        handle.save()
+        return handle
+
+    def resume(self, batch_id: str) -> BatchHandle:
+        """Load the handle of a batch submitted by an earlier process"""
+        return BatchHandle.load(self.state_dir / f"{batch_id}.json")
+
+    def pending_handles(self) -> List[BatchHandle]:
+        """Handles whose results have not been fully collected yet"""
+        if not self.state_dir.exists():
+            return []
+        handles = [BatchHandle.load(path) for path in sorted(self.state_dir.glob("*.json"))]
+        return [handle for handle in handles if handle.status != "collected"]
+
+    def poll(self, handle: BatchHandle) -> str:
+        """
+        Refresh the batch status
+
+        Returns:
+            The processing status ("in_progress", "canceling" or "ended")
+        """
+        batch = get_shared_retry_policy().call(
+            lambda: self.client.messages.batches.retrieve(handle.batch_id)
+        )
+        if handle.status != "collected":
+            handle.status = batch.processing_status
+            handle.save()
+        return batch.processing_status
+
+    def wait(self, handle: BatchHandle, timeout: Optional[float] = None) -> bool:
+        """
+        Poll until the batch has ended
+
+        Args:
+            handle: Batch to wait for
+            timeout: Maximum seconds to wait, or None to wait indefinitely
+
+        Returns:
+            True if the batch ended, False on timeout
+        """
+        started = time.monotonic()
+        while self.poll(handle) != "ended":
+            if timeout is not None and time.monotonic() - started + self.poll_interval > timeout:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def iter_results(self, handle: BatchHandle) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the results of an ended batch
+
+        Results saved by an earlier (possibly crashed) run are yielded first
+        without downloading them again; new results are saved as they arrive.
+
+        Yields:
+            Dicts with 'custom_id' and 'result'
+        """
+        stored = handle.stored_results()
+        for custom_id, result in stored.items():
+            yield {"custom_id": custom_id, "result": result}
+        if handle.status == "collected" or len(stored) == len(handle.custom_ids):
+            self._mark_collected(handle)
+            return
+
+        decoder = get_shared_retry_policy().call(
+            lambda: self.client.messages.batches.results(handle.batch_id)
+        )
+        with open_jsonl_for_append(handle.results_path) as f:
+            for entry in decoder:
+                if entry.custom_id in stored:
+                    continue
+                record = {"custom_id": entry.custom_id, "result": _result_to_dict(entry.result)}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                stored[entry.custom_id] = record["result"]
+                yield record
+        self._mark_collected(handle)
+
+    def collect_results(self, handle: BatchHandle) -> Dict[str, Dict[str, Any]]:
+        """Read every result of an ended batch, keyed by custom_id"""
+        return {record["custom_id"]: record["result"] for record in self.iter_results(handle)}
+
+    def collect_texts(self, handle: BatchHandle) -> Dict[str, str]:
+        """
+        Read an ended batch as response texts, keyed by custom_id
+
+        Failed requests map to an "Error: ..." string, like the synchronous methods.
+        """
+        texts = {}
+        for custom_id, result in self.collect_results(handle).items():
+            if result["type"] == "succeeded":
+                texts[custom_id] = result["text"]
+            else:
+                texts[custom_id] = f"Error: {result.get('error', result['type'])}"
+        return texts
+
+    def run(self, requests: List[Dict[str, Any]], timeout: Optional[float] = None) -> Dict[str, str]:
+        """
+        Submit a batch, wait for it and return the texts keyed by custom_id
+
+        Args:
+            requests: Batch requests, each with a unique 'custom_id' and 'params'
+            timeout: Maximum seconds to wait for processing
+
+        Returns:
+            Response text (or error string) per custom_id
+        """
+        handle = self.submit_batch(requests)
+        if not self.wait(handle, timeout=timeout):
+            raise TimeoutError(f"Batch {handle.batch_id} did not finish within {timeout} seconds")
+        return self.collect_texts(handle)
+
+    def _mark_collected(self, handle: BatchHandle):
+        if handle.status != "collected":
+            handle.status = "collected"
+            handle.save()
@@ -0,0 +1,228 @@
+"""
+Bulkheads for Claude API calls
+Separate concurrency pools so bulk work cannot starve interactive requests
+"""
+
+import asyncio
+import contextvars
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from .deadline import DeadlineExceeded, remaining
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+_traffic_class: "contextvars.ContextVar[str]" = contextvars.ContextVar("traffic_class", default=INTERACTIVE)
+
+
+class BulkheadFullError(RuntimeError):
+    """Raised when a bulkhead has no free slot within its wait limit"""
+
+    def __init__(self, name: str, max_concurrent: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        super().__init__(f"Bulkhead '{name}' is full ({max_concurrent} calls in flight)")
+
+
+@contextmanager
+def traffic_class(name: str) -> Iterator[None]:
+    """
+    Run the enclosed calls in a traffic class
+
+    The class is carried by a context variable, so it also applies to
+    asyncio tasks and threads started with a copied context inside the block.
+
+    Args:
+        name: Traffic class, e.g. INTERACTIVE or BATCH
+    """
+    token = _traffic_class.set(name)
+    try:
+        yield
+    finally:
+        _traffic_class.reset(token)
+
+
+def current_traffic_class() -> str:
+    """Traffic class of the calling code (interactive unless set)"""
+    return _traffic_class.get()
+
+
+class Bulkhead:
+    """
+    Concurrency limit for one traffic class.
+
+    A call waits up to ``max_wait`` seconds for a slot and otherwise fails
+    with BulkheadFullError, so an exhausted pool sheds load instead of
+    queueing without bound. The wait never outlasts the caller's deadline;
+    running out of that first raises DeadlineExceeded.
+    """
+
+    # Seconds between slot checks for asyncio callers
+    ASYNC_POLL_INTERVAL = 0.01
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: Optional[float] = 60.0):
+        """
+        Initialize the bulkhead
+
+        Args:
+            name: Traffic class the bulkhead serves
+            max_concurrent: Calls allowed in flight at once
+            max_wait: Seconds to wait for a slot, or None to wait indefinitely
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._peak = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected = 0
+
+    def _admit(self):
+        with self._lock:
+            self._in_use += 1
+            self._admitted += 1
+            self._peak = max(self._peak, self._in_use)
+
+    def _leave(self):
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+
+    def _reject(self):
+        with self._lock:
+            self._rejected += 1
+        raise BulkheadFullError(self.name, self.max_concurrent)
+
+    def _wait_limit(self) -> Tuple[Optional[float], bool]:
+        """Seconds to wait for a slot, and whether the caller's deadline is what limits them"""
+        left = remaining()
+        if left is not None and (self.max_wait is None or left < self.max_wait):
+            return left, True
+        return self.max_wait, False
+
+    def _wait_for_slot(self) -> bool:
+        timeout, by_deadline = self._wait_limit()
+        with self._lock:
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired and by_deadline:
+            raise DeadlineExceeded("bulkhead wait")
+        return acquired
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a slot for the duration of the block"""
+        if not self._slots.acquire(blocking=False) and not self._wait_for_slot():
+            self._reject()
+        self._admit()
+        try:
+            yield
+        finally:
+            self._leave()
+
+    async def _wait_for_slot_async(self) -> bool:
+        # Poll rather than block a worker thread, so a cancelled waiter can never
+        # take a slot after it has gone away
+        loop = asyncio.get_running_loop()
+        timeout, by_deadline = self._wait_limit()
+        until = None if timeout is None else loop.time() + timeout
+        with self._lock:
+            self._waiting += 1
+        try:
+            while not self._slots.acquire(blocking=False):
+                if until is not None and loop.time() >= until:
+                    if by_deadline:
+                        raise DeadlineExceeded("bulkhead wait")
+                    return False
+                await asyncio.sleep(self.ASYNC_POLL_INTERVAL)
+            return True
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    @asynccontextmanager
+    async def slot_async(self) -> AsyncIterator[None]:
+        """asyncio version of slot"""
+        if not self._slots.acquire(blocking=False) and not await self._wait_for_slot_async():
+            self._reject()
+        self._admit()
+        try:
+            yield
+        finally:
+            self._leave()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get bulkhead occupancy and counters"""
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "in_use": self._in_use,
+                "peak": self._peak,
+                "waiting": self._waiting,
+                "admitted": self._admitted,
+                "rejected": self._rejected
+            }
+
+
+class BulkheadRegistry:
+    """Bulkheads by traffic class; classes without a configured size share the interactive one"""
+
+    def __init__(self, interactive: int = 32, batch: int = 16, max_wait: Optional[float] = 60.0,
+                 **other_classes: int):
+        """
+        Initialize the registry
+
+        Args:
+            interactive: Concurrent calls for interactive traffic
+            batch: Concurrent calls for batch traffic
+            max_wait: Seconds a call waits for a slot
+            **other_classes: Sizes for further traffic classes
+        """
+        sizes = dict(other_classes, **{INTERACTIVE: interactive, BATCH: batch})
+        self._bulkheads = {name: Bulkhead(name, size, max_wait) for name, size in sizes.items()}
+
+    def for_class(self, name: Optional[str] = None) -> Bulkhead:
+        """Bulkhead for a traffic class (the caller's current class by default)"""
+        name = name or current_traffic_class()
+        return self._bulkheads.get(name, self._bulkheads[INTERACTIVE])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the state of every bulkhead"""
+        return {name: bulkhead.get_stats() for name, bulkhead in self._bulkheads.items()}
+
+
+_registry: Optional[BulkheadRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_shared_bulkheads() -> BulkheadRegistry:
+    """Get the process-wide bulkheads"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = BulkheadRegistry()
+        return _registry
+
+
+def configure_bulkheads(**kwargs) -> BulkheadRegistry:
+    """Replace the process-wide bulkheads with ones built from kwargs"""
+    global _registry
+    with _registry_lock:
+        _registry = BulkheadRegistry(**kwargs)
+        return _registry
+
+
+def reset_bulkheads():
+    """Drop the process-wide bulkheads"""
+    global _registry
+    with _registry_lock:
+        _registry = None
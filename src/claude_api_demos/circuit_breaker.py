@@ -0,0 +1,234 @@
+"""
+Circuit breakers for Claude API calls
+Stop sending to a model that keeps failing and probe it again after a cool-down
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .retry import classify_error
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Retryable reasons that say nothing about the backend's health: the rate
+# limiter already handles 429, and 409 is a request conflict
+NOT_BACKEND_FAILURES = {"429", "409"}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request to a model whose breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"Circuit for {name} is open; retrying in {retry_in:.1f}s")
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """Whether an error means the backend is unhealthy (5xx, 529, timeouts, connection errors)"""
+    reason = classify_error(error)
+    return reason is not None and reason not in NOT_BACKEND_FAILURES
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker.
+
+    While closed, calls go through and consecutive backend failures are
+    counted. After ``failure_threshold`` of them the breaker opens and every
+    call fails fast with CircuitOpenError. Once ``recovery_timeout`` has
+    passed it lets ``half_open_max_calls`` probe calls through: a success
+    closes it again, a failure re-opens it.
+    """
+
+    def __init__(self, name: str,
+                 failure_threshold: int = 5,
+                 recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the breaker
+
+        Args:
+            name: What the breaker protects, e.g. "messages:claude-3-5-sonnet-20241022"
+            failure_threshold: Consecutive failures that open the breaker
+            recovery_timeout: Seconds to stay open before probing
+            half_open_max_calls: Probe calls allowed at once while half-open
+            clock: Time source (monotonic seconds)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._successes = 0
+        self._failures = 0
+        self._rejected = 0
+        self._transitions: Dict[str, int] = {}
+
+    def _move(self, state: str):
+        """Change state (caller holds the lock)"""
+        if state == self._state:
+            return
+        self._state = state
+        self._transitions[state] = self._transitions.get(state, 0) + 1
+        if state == OPEN:
+            self._opened_at = self._clock()
+        self._probes = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+                self._move(HALF_OPEN)
+            return self._state
+
+    def allow(self):
+        """
+        Claim permission to send a call
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with all probes in flight
+        """
+        with self._lock:
+            if self._state == OPEN:
+                remaining = self.recovery_timeout - (self._clock() - self._opened_at)
+                if remaining > 0:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, remaining)
+                self._move(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, 0.0)
+                self._probes += 1
+
+    def release(self):
+        """Give back a permission from allow() for a call that was never sent or was abandoned"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self):
+        """Report a call that reached a healthy backend"""
+        with self._lock:
+            self._successes += 1
+            self._consecutive_failures = 0
+            if self._state == HALF_OPEN:
+                self._move(CLOSED)
+
+    def record_failure(self, error: BaseException):
+        """
+        Report a failed call
+
+        Errors that do not indicate an unhealthy backend (bad requests,
+        rate limits) count as a success for the breaker.
+        """
+        if not counts_as_failure(error):
+            self.record_success()
+            return
+        with self._lock:
+            self._failures += 1
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._move(OPEN)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get breaker state and counters"""
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._consecutive_failures,
+                "successes": self._successes,
+                "failures": self._failures,
+                "rejected": self._rejected,
+                "transitions": dict(self._transitions)
+            }
+
+
+class BreakerRegistry:
+    """
+    One CircuitBreaker per (endpoint, model), plus optional failover models.
+
+    ``fallbacks`` maps a model to the model to use while its breaker is open.
+    """
+
+    def __init__(self, fallbacks: Optional[Dict[str, str]] = None, **breaker_options):
+        """
+        Initialize the registry
+
+        Args:
+            fallbacks: Model to fail over to, keyed by the primary model
+            **breaker_options: Keyword arguments for each CircuitBreaker
+        """
+        self.fallbacks = dict(fallbacks or {})
+        self.breaker_options = breaker_options
+        self._lock = threading.Lock()
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._failovers = 0
+
+    def get(self, endpoint: str, model: str) -> CircuitBreaker:
+        """Breaker for an endpoint and model, created on first use"""
+        key = (endpoint, model)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(f"{endpoint}:{model}", **self.breaker_options)
+                self._breakers[key] = breaker
+            return breaker
+
+    def fallback_for(self, model: str) -> Optional[str]:
+        """Model to fail over to when ``model`` is unavailable, if one is configured"""
+        fallback = self.fallbacks.get(model)
+        if fallback is not None:
+            with self._lock:
+                self._failovers += 1
+        return fallback
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the state of every breaker"""
+        with self._lock:
+            breakers = dict(self._breakers)
+            failovers = self._failovers
+        return {
+            "failovers": failovers,
+            "breakers": {breaker.name: breaker.get_stats() for breaker in breakers.values()}
+        }
+
+
+_registry: Optional[BreakerRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_shared_breakers() -> BreakerRegistry:
+    """Get the process-wide breaker registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = BreakerRegistry()
+        return _registry
+
+
+def configure_circuit_breakers(**kwargs) -> BreakerRegistry:
+    """Replace the process-wide breaker registry with one built from kwargs"""
+    global _registry
+    with _registry_lock:
+        _registry = BreakerRegistry(**kwargs)
+        return _registry
+
+
+def reset_circuit_breakers():
+    """Drop the process-wide breaker registry"""
+    global _registry
+    with _registry_lock:
+        _registry = None
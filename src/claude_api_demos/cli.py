@@ -6,10 +6,14 @@ Command-line interface for Claude API Demonstrations
 import sys
 import os
 from pathlib import Path
+from typing import Optional
 
 # Add package to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
+# Seconds each non-interactive demo may run before its remaining calls are cut short
+DEMO_DEADLINE = 300.0
+
 def check_api_key():
     """Check if API key is configured"""
     try:
@@ -41,8 +45,10 @@ def run_basic_demo():
     print("="*60)
     
     try:
+        from claude_api_demos.deadline import deadline_scope
         from claude_api_demos.basic_demo import main
-        main()
+        with deadline_scope(DEMO_DEADLINE):
+            main()
     except Exception as e:
         print(f"❌ Error running basic demo: {e}")
 
@@ -52,8 +58,10 @@ def run_advanced_demo():
     print("="*60)
     
     try:
+        from claude_api_demos.deadline import deadline_scope
         from claude_api_demos.advanced_demo import main
-        main()
+        with deadline_scope(DEMO_DEADLINE):
+            main()
     except Exception as e:
         print(f"❌ Error running advanced demo: {e}")
 
@@ -74,8 +82,10 @@ def run_realworld_demo():
     print("="*60)
     
     try:
+        from claude_api_demos.deadline import deadline_scope
         from claude_api_demos.real_world_demo import main
-        main()
+        with deadline_scope(DEMO_DEADLINE):
+            main()
     except Exception as e:
         print(f"❌ Error running real-world demo: {e}")
 
@@ -90,6 +100,94 @@ def run_rd_analytics_demo():
     except Exception as e:
         print(f"❌ Error running R&D analytics demo: {e}")
 
+def show_connection_stats():
+    """Show how well the shared client pool reused its connections"""
+    from claude_api_demos.bulkhead import get_shared_bulkheads
+    from claude_api_demos.circuit_breaker import get_shared_breakers
+    from claude_api_demos.client_pool import get_client_pool
+    from claude_api_demos.coalescing import get_shared_singleflight
+    from claude_api_demos.model_router import get_shared_router
+    from claude_api_demos.prompt_cache import get_prompt_cache_stats
+    from claude_api_demos.retry import get_shared_retry_policy
+    from claude_api_demos.scheduler import get_shared_scheduler
+    from claude_api_demos.token_budget import get_shared_token_counter
+
+    stats = get_client_pool().get_stats()
+    print("\n🔌 Connection Pool Summary:")
+    print(f"   Requests sent: {stats['requests']}")
+    print(f"   New connections: {stats['new_connections']} ({stats['tls_handshakes']} TLS handshakes)")
+    print(f"   Reused connections: {stats['reused_connections']} ({stats['reuse_ratio']:.0%})")
+
+    retries = get_shared_retry_policy().get_stats()
+    print(f"   Retries: {retries['retries']} ({retries['recovered_calls']} calls recovered, "
+          f"{retries['exhausted_calls']} gave up)")
+
+    merged = get_shared_singleflight().get_stats()
+    print(f"   Coalesced requests: {merged['merged']} of {merged['calls']} shared an in-flight call")
+
+    cached = get_prompt_cache_stats().get_stats()
+    print(f"   Prompt cache: {cached['cache_read_input_tokens']} input tokens read, "
+          f"{cached['cache_creation_input_tokens']} written ({cached['cache_read_ratio']:.0%} of prompt tokens from cache)")
+
+    counted = get_shared_token_counter().get_stats()
+    print(f"   Token counting: {counted['api_calls']} endpoint calls, {counted['cache_hits']} cached, "
+          f"{counted['rejected']} oversized requests rejected")
+
+    routing = get_shared_router().get_stats()
+    if routing["calls"]:
+        routes = ", ".join(f"{route} ({count})" for route, count in sorted(routing["routes"].items()))
+        print(f"   Model routes: {routes}")
+        print(f"   Escalations: {routing['escalations']} of {routing['calls']} ({routing['escalation_rate']:.0%})")
+
+    breakers = get_shared_breakers().get_stats()
+    for name, breaker in breakers["breakers"].items():
+        if breaker["state"] != "closed" or breaker["rejected"]:
+            print(f"   Circuit {name}: {breaker['state']} ({breaker['rejected']} calls failed fast)")
+    if breakers["failovers"]:
+        print(f"   Failovers to fallback models: {breakers['failovers']}")
+    for name, bulkhead in get_shared_bulkheads().get_stats().items():
+        print(f"   Bulkhead {name}: peak {bulkhead['peak']}/{bulkhead['max_concurrent']} in flight, "
+              f"{bulkhead['rejected']} rejected")
+    for name, queue in get_shared_scheduler().get_stats()["classes"].items():
+        if queue["queued"] or queue["rejected"]:
+            print(f"   Queue {name}: {queue['queued']} of {queue['admitted']} queued, "
+                  f"wait p50 {queue['wait_p50']}s / p95 {queue['wait_p95']}s, {queue['rejected']} rejected")
+
+def run_repository_review(root: str = ".", base_ref: Optional[str] = None):
+    """Review the Python files under a directory, sending only new or changed ones"""
+    print(f"\n📂 Reviewing {root}" + (f" (changes since {base_ref})" if base_ref else "") + "...")
+    print("="*60)
+    
+    try:
+        from claude_api_demos.advanced_demo import AdvancedClaudeDemo
+        summary = AdvancedClaudeDemo().review_repository(root, base_ref=base_ref)
+        if "error" in summary:
+            print(f"❌ {summary['error']}")
+            return
+        print(f"\n✅ {summary['reviewed']} reviewed, {summary['failed']} failed, "
+              f"{summary['skipped']} unchanged in {summary['seconds']}s")
+        print(f"   Results: {summary['store']}")
+    except Exception as e:
+        print(f"❌ Error reviewing repository: {e}")
+
+def run_diff_review(base_ref: str = "HEAD", head_ref: Optional[str] = None):
+    """Review only the hunks changed between two refs, e.g. a pull request in CI"""
+    print(f"\n🔀 Reviewing changes {base_ref}..{head_ref or 'working tree'}...")
+    print("="*60)
+    
+    try:
+        from claude_api_demos.advanced_demo import AdvancedClaudeDemo
+        result = AdvancedClaudeDemo().review_diff(base_ref, head_ref)
+        if "error" in result:
+            print(f"❌ {result['error']}")
+            return
+        for finding in result["findings"]:
+            print(f"{finding['path']}:{finding['line']}: {finding['severity']}: {finding['message']}")
+        for error in result["errors"]:
+            print(f"❌ {error}")
+    except Exception as e:
+        print(f"❌ Error reviewing diff: {e}")
+
 def show_menu():
     """Show main menu"""
     print("\n🤖 Claude API Demonstration Suite")
@@ -172,15 +270,22 @@ def main():
             run_realworld_demo()
         elif demo_type == "rdanalytics" or demo_type == "rd":
             run_rd_analytics_demo()
+        elif demo_type == "review":
+            # claude-demos review [root] [base_ref], e.g. from a pre-commit hook
+            run_repository_review(*sys.argv[2:4])
+        elif demo_type == "diff":
+            # claude-demos diff [base_ref] [head_ref], e.g. in a pull request pipeline
+            run_diff_review(*sys.argv[2:4])
         elif demo_type == "all":
             run_basic_demo()
             run_advanced_demo()
             run_interactive_demo()
             run_realworld_demo()
             run_rd_analytics_demo()
+            show_connection_stats()
         else:
             print(f"❌ Unknown demo type: {demo_type}")
-            print("Available options: basic, advanced, interactive, realworld, rdanalytics, all")
+            print("Available options: basic, advanced, interactive, realworld, rdanalytics, review, diff, all")
         return
     
     # Interactive menu
@@ -210,6 +315,7 @@ def main():
                 run_interactive_demo()
                 run_realworld_demo()
                 run_rd_analytics_demo()
+                show_connection_stats()
                 print("\n🎉 All demonstrations completed!")
             elif choice == "7":
                 show_help()
@@ -0,0 +1,268 @@
+"""
+Shared Anthropic client pool
+One process-wide connection pool reused by every demo class
+"""
+
+import importlib.util
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import anthropic
+import httpx
+
+from .rate_limiter import get_shared_rate_limiter
+
+
+class ClientPool:
+    """
+    Registry of Anthropic clients that share a single httpx connection pool.
+
+    Every demo class asks the pool for a client instead of building its own
+    ``anthropic.Anthropic``, so repeated demo runs keep their TCP/TLS
+    connections warm instead of paying a new handshake per instance.
+
+    With ``http2=True`` the async clients (new_async_http_client, used by
+    AsyncClaudeClient) multiplex concurrent requests over a few connections
+    instead of one connection each; this needs the optional ``h2`` package
+    (``pip install claude-api-demos[http2]``). The shared sync client always
+    speaks HTTP/1.1: it is used from many threads at once, and a sync
+    HTTP/2 connection shared that way sends stream headers out of order,
+    which servers reject.
+    """
+
+    def __init__(self,
+                 max_connections: int = 100,
+                 max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0,
+                 http2: bool = False,
+                 connect_timeout: float = 5.0,
+                 read_timeout: float = 600.0,
+                 proxy: Optional[str] = None,
+                 base_url: Optional[str] = None):
+        """
+        Initialize the pool
+
+        Args:
+            max_connections: Maximum number of concurrent connections
+            max_keepalive_connections: Maximum idle connections kept open for reuse
+            keepalive_expiry: Seconds an idle connection is kept before closing
+            http2: Negotiate HTTP/2 on async clients; over plain http:// it is used with prior knowledge
+            connect_timeout: Seconds to establish a connection
+            read_timeout: Seconds to wait for each chunk of a response
+            proxy: Proxy URL to send requests through, e.g. a local debugging proxy
+            base_url: API base URL (defaults to the SDK's, or ANTHROPIC_BASE_URL)
+
+        Raises:
+            ImportError: If http2 is requested but h2 is not installed
+        """
+        if http2 and importlib.util.find_spec("h2") is None:
+            raise ImportError("HTTP/2 needs the h2 package: pip install claude-api-demos[http2]")
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.proxy = proxy
+        self.base_url = base_url
+
+        self._lock = threading.Lock()
+        self._clients: Dict[Optional[str], anthropic.Anthropic] = {}
+        self._http_client: Optional[httpx.Client] = None
+
+        self._requests = 0
+        self._new_connections = 0
+        self._tls_handshakes = 0
+        self._http_versions: Dict[str, int] = {}
+
+    def get(self, api_key: Optional[str] = None) -> anthropic.Anthropic:
+        """
+        Get the shared client for an API key
+
+        Args:
+            api_key: Your Anthropic API key. If not provided, will look for ANTHROPIC_API_KEY env var
+
+        Returns:
+            An Anthropic client backed by the shared connection pool
+        """
+        key = api_key or os.getenv("ANTHROPIC_API_KEY")
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                # Retries are handled by the shared RetryPolicy in messaging
+                client = anthropic.Anthropic(
+                    api_key=key,
+                    base_url=self.base_url,
+                    http_client=self._get_http_client(),
+                    timeout=self.timeout(),
+                    max_retries=0
+                )
+                self._clients[key] = client
+            return client
+
+    def _get_http_client(self) -> httpx.Client:
+        """Build the shared httpx client on first use (caller holds the lock)"""
+        if self._http_client is None:
+            self._http_client = anthropic.DefaultHttpxClient(
+                event_hooks={"request": [self._on_request], "response": [self._on_response]},
+                **self.transport_options(asynchronous=False)
+            )
+        return self._http_client
+
+    def new_async_http_client(self) -> httpx.AsyncClient:
+        """
+        Build an async httpx client with the pool's limits and instrumentation
+
+        Async connections are bound to the event loop that opened them, so
+        async clients get their own connection pool instead of sharing one.
+        """
+        return anthropic.DefaultAsyncHttpxClient(
+            event_hooks={"request": [self._on_request_async], "response": [self._on_response_async]},
+            **self.transport_options(asynchronous=True)
+        )
+
+    def limits(self) -> httpx.Limits:
+        """Get the configured connection limits"""
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        """Get the configured connect and read timeouts"""
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    def transport_options(self, asynchronous: bool = True) -> Dict[str, Any]:
+        """
+        Keyword arguments for the httpx clients built by the pool
+
+        Args:
+            asynchronous: Options for an async client; sync clients never get HTTP/2
+        """
+        http2 = self.http2 and asynchronous
+        options: Dict[str, Any] = {"limits": self.limits(), "timeout": self.timeout(), "http2": http2}
+        if http2 and (self.base_url or os.getenv("ANTHROPIC_BASE_URL", "")).startswith("http://"):
+            # Cleartext has no ALPN to negotiate HTTP/2, so speak it from the start
+            options["http1"] = False
+        if self.proxy:
+            options["proxy"] = self.proxy
+        return options
+
+    def _on_request(self, request: httpx.Request):
+        """Count the request and attach a trace hook to watch connection setup"""
+        with self._lock:
+            self._requests += 1
+        request.extensions["trace"] = self._on_trace
+
+    def _on_response(self, response: httpx.Response):
+        """Feed rate limit headers to the shared rate limiter and count protocol versions"""
+        with self._lock:
+            self._http_versions[response.http_version] = self._http_versions.get(response.http_version, 0) + 1
+        get_shared_rate_limiter().update_from_headers(response.headers)
+
+    def _on_trace(self, event_name: str, info: Dict[str, Any]):
+        """Count new TCP connections and TLS handshakes reported by httpcore"""
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self._new_connections += 1
+        elif event_name == "connection.start_tls.complete":
+            with self._lock:
+                self._tls_handshakes += 1
+
+    async def _on_request_async(self, request: httpx.Request):
+        """Async event hook version of _on_request"""
+        with self._lock:
+            self._requests += 1
+        request.extensions["trace"] = self._on_trace_async
+
+    async def _on_response_async(self, response: httpx.Response):
+        """Async event hook version of _on_response"""
+        self._on_response(response)
+
+    async def _on_trace_async(self, event_name: str, info: Dict[str, Any]):
+        """Async trace hook version of _on_trace"""
+        self._on_trace(event_name, info)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get connection reuse statistics"""
+        with self._lock:
+            reused = max(self._requests - self._new_connections, 0)
+            return {
+                "clients": len(self._clients),
+                "requests": self._requests,
+                "new_connections": self._new_connections,
+                "tls_handshakes": self._tls_handshakes,
+                "reused_connections": reused,
+                "reuse_ratio": round(reused / self._requests, 4) if self._requests else 0.0,
+                "max_connections": self.max_connections,
+                "max_keepalive_connections": self.max_keepalive_connections,
+                "keepalive_expiry": self.keepalive_expiry,
+                "http2": self.http2,
+                "http_versions": dict(self._http_versions),
+                "connect_timeout": self.connect_timeout,
+                "read_timeout": self.read_timeout,
+                "proxy": self.proxy is not None
+            }
+
+    def close(self):
+        """Close the shared connection pool and forget all clients"""
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            self._clients = {}
+
+
+_pool: Optional[ClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> ClientPool:
+    """Get the process-wide client pool, creating it with defaults if needed"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClientPool()
+        return _pool
+
+
+def configure_client_pool(**kwargs) -> ClientPool:
+    """
+    Replace the process-wide client pool with a newly configured one
+
+    Args:
+        **kwargs: Pool limits accepted by ClientPool
+
+    Returns:
+        The new process-wide pool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ClientPool(**kwargs)
+        return _pool
+
+
+def reset_client_pool():
+    """Close and drop the process-wide client pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
+
+
+def get_shared_client(api_key: Optional[str] = None) -> anthropic.Anthropic:
+    """
+    Get an Anthropic client from the process-wide pool
+
+    Args:
+        api_key: Your Anthropic API key. If not provided, will look for ANTHROPIC_API_KEY env var
+
+    Returns:
+        A shared Anthropic client
+    """
+    return get_client_pool().get(api_key)
@@ -0,0 +1,171 @@
+"""
+In-flight request coalescing
+Concurrent identical requests share a single upstream call ("singleflight")
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .deadline import DeadlineExceeded, remaining, wait_with_deadline
+
+T = TypeVar("T")
+
+
+class _Abandoned(Exception):
+    """Handed to the waiters of a shared call whose leader was cancelled or interrupted; they run it again"""
+
+
+class _Call:
+    """A call in flight on the threaded path"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Merge concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is still running wait and receive the same result (or the same
+    exception). Once the call finishes the key is forgotten, so later calls
+    run again. If the caller running it is cancelled or interrupted, that
+    is not passed on: the waiters elect a new leader among themselves and
+    run the call again. Threaded and asyncio callers are tracked separately
+    but share the same counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[str, "asyncio.Future[Any]"] = {}
+        self._executed = 0
+        self._merged = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key: Identity of the request
+            fn: Zero-argument callable that performs the request
+
+        Returns:
+            The shared result
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is not None:
+                    self._merged += 1
+                    leader = False
+                else:
+                    call = _Call()
+                    self._calls[key] = call
+                    self._executed += 1
+                    leader = True
+
+            if leader:
+                break
+            if not call.done.wait(remaining()):
+                raise DeadlineExceeded("shared request")
+            if isinstance(call.error, _Abandoned):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            # KeyboardInterrupt and the like belong to the leader alone
+            call.error = e if isinstance(e, Exception) else _Abandoned()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        asyncio version of do
+
+        Args:
+            key: Identity of the request
+            fn: Zero-argument coroutine function that performs the request
+
+        Returns:
+            The shared result
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                future = self._async_calls.get(key)
+                if future is not None and future.get_loop() is loop:
+                    self._merged += 1
+                    leader = False
+                else:
+                    future = loop.create_future()
+                    self._async_calls[key] = future
+                    self._executed += 1
+                    leader = True
+
+            if leader:
+                break
+            try:
+                # shield so one cancelled waiter does not cancel the shared call
+                return await wait_with_deadline(asyncio.shield(future), "shared request")
+            except _Abandoned:
+                continue
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            # A cancelled leader must not look like a cancellation to the waiters
+            future.set_exception(e if isinstance(e, Exception) else _Abandoned())
+            # mark retrieved so a leader-only call does not log "never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._async_calls.get(key) is future:
+                    del self._async_calls[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics"""
+        with self._lock:
+            total = self._executed + self._merged
+            return {
+                "calls": total,
+                "executed": self._executed,
+                "merged": self._merged,
+                "merge_ratio": round(self._merged / total, 4) if total else 0.0,
+                "in_flight": len(self._calls) + len(self._async_calls)
+            }
+
+
+_singleflight: Optional[SingleFlight] = None
+_singleflight_lock = threading.Lock()
+
+
+def get_shared_singleflight() -> SingleFlight:
+    """Get the process-wide coalescer"""
+    global _singleflight
+    with _singleflight_lock:
+        if _singleflight is None:
+            _singleflight = SingleFlight()
+        return _singleflight
+
+
+def reset_singleflight():
+    """Drop the process-wide coalescer"""
+    global _singleflight
+    with _singleflight_lock:
+        _singleflight = None
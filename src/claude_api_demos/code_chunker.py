@@ -0,0 +1,256 @@
+"""
+AST-aware chunking of Python source
+Split files too large for one prompt on class and function boundaries and analyze the parts with map-reduce
+"""
+
+import ast
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from .token_budget import split_text
+
+# Conservative ratio for code, as in split_text
+CHARS_PER_TOKEN = 3
+
+# Share of a chunk's budget the module context (imports, globals) may take
+CONTEXT_SHARE = 0.25
+
+# Room for the line-range marker CodeChunk.text puts between the context and the part
+MARKER_TOKENS = 12
+
+
+def _tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+class CodeChunk:
+    """
+    A run of consecutive definitions from one source file.
+
+    ``context`` holds the module-level code every chunk needs to make sense
+    of its part (imports, globals and, for methods of a split class, the
+    class header); ``code`` is the part itself, which starts at
+    ``start_line`` and ends at ``end_line`` of the original source. Shared
+    statements in that range are left out of ``code`` as they are in the
+    context already.
+    """
+
+    def __init__(self, code: str, start_line: int, end_line: int, names: List[str], context: str = ""):
+        self.code = code
+        self.start_line = start_line
+        self.end_line = end_line
+        self.names = names
+        self.context = context
+
+    @property
+    def text(self) -> str:
+        """The context followed by the part, ready to put in a prompt"""
+        if not self.context:
+            return self.code
+        return f"{self.context.rstrip()}\n\n# ... (lines {self.start_line}-{self.end_line})\n{self.code}"
+
+    @property
+    def label(self) -> str:
+        names = ", ".join(self.names[:5]) + (", ..." if len(self.names) > 5 else "")
+        return f"lines {self.start_line}-{self.end_line}" + (f" ({names})" if names else "")
+
+
+def _is_context(node: ast.stmt) -> bool:
+    """Module-level statements every chunk is given: imports, globals, guarded imports"""
+    if isinstance(node, (ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign, ast.AugAssign)):
+        return True
+    if isinstance(node, (ast.If, ast.Try)):
+        return bool(node.body) and all(isinstance(child, (ast.Import, ast.ImportFrom)) for child in node.body)
+    return False
+
+
+def _first_line(node: ast.stmt) -> int:
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [decorator.lineno for decorator in decorators])
+
+
+def _name(node: ast.stmt, prefix: str = "") -> Optional[str]:
+    if isinstance(node, ast.ClassDef):
+        return f"class {prefix}{node.name}"
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return f"def {prefix}{node.name}"
+    return None
+
+
+# A unit is (first line, last line, name, node); units are packed whole into chunks when they fit
+Unit = Tuple[int, int, Optional[str], ast.stmt]
+
+
+def _units(nodes: Sequence[ast.stmt], start_after: int, prefix: str = "",
+           skip: Callable[[ast.stmt], bool] = lambda node: False) -> List[Unit]:
+    """Split statements into units that also cover the comments and blank lines before each"""
+    units = []
+    previous_end = start_after
+    for node in nodes:
+        if not skip(node):
+            units.append((previous_end + 1, node.end_lineno, _name(node, prefix), node))
+        previous_end = node.end_lineno
+    return units
+
+
+def _pack(lines: List[str], units: List[Unit], budget: int, context: str) -> List[CodeChunk]:
+    """Greedily pack consecutive units into chunks of at most ``budget`` tokens"""
+    chunks: List[CodeChunk] = []
+    current: List[Unit] = []
+    size = 0
+
+    def flush():
+        if current:
+            # Only the units' own lines: shared statements between them are already in the context
+            code = "".join("".join(lines[first - 1:last]) for first, last, _, _ in current)
+            names = [unit[2] for unit in current if unit[2]]
+            chunks.append(CodeChunk(code, current[0][0], current[-1][1], names, context))
+            current.clear()
+
+    for unit in units:
+        first, last, name, node = unit
+        unit_size = _tokens("".join(lines[first - 1:last]))
+        if unit_size > budget:
+            flush()
+            chunks.extend(_split_unit(lines, unit, budget, context))
+            continue
+        if current and size + unit_size > budget:
+            flush()
+        if not current:
+            size = 0
+        current.append(unit)
+        size += unit_size
+    flush()
+    return chunks
+
+
+def _split_unit(lines: List[str], unit: Unit, budget: int, context: str) -> List[CodeChunk]:
+    """Split one definition that does not fit: a class by its members, anything else by lines"""
+    first, last, name, node = unit
+    if isinstance(node, ast.ClassDef) and node.body:
+        body_start = _first_line(node.body[0])
+        header = "".join(lines[first - 1:body_start - 1])
+        if _tokens(header) < budget // 2:
+            class_context = f"{context.rstrip()}\n\n{header.rstrip()}\n    ...\n" if context else f"{header.rstrip()}\n    ...\n"
+            members = _units(node.body, body_start - 1, prefix=f"{node.name}.")
+            return _pack(lines, members, budget - (_tokens(class_context) - _tokens(context)), class_context)
+    chunks = []
+    line = first
+    for part in split_text("".join(lines[first - 1:last]), budget, CHARS_PER_TOKEN):
+        count = part.count("\n")
+        chunks.append(CodeChunk(part, line, line + max(count - 1, 0), [name] if name else [], context))
+        line += count
+    return chunks
+
+
+def _module_context(lines: List[str], nodes: Sequence[ast.stmt], budget: int) -> Tuple[str, List[ast.stmt]]:
+    """
+    Module-level code to repeat in front of every chunk, and the statements it covers
+
+    Imports and globals if they fit in the budget, otherwise only the
+    imports (the globals are then chunked like any other code), cut to the
+    budget if even those do not fit.
+    """
+    context_nodes = [node for node in nodes if _is_context(node)]
+    imports = [node for node in context_nodes if not isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign))]
+    for candidates in (context_nodes, imports):
+        context = "".join("".join(lines[_first_line(node) - 1:node.end_lineno]) for node in candidates)
+        if _tokens(context) <= budget:
+            return context, candidates
+    return context[:budget * CHARS_PER_TOKEN] + "\n# ... (more imports omitted)\n", imports
+
+
+def chunk_python_source(source: str, max_tokens: int) -> List[CodeChunk]:
+    """
+    Split Python source into chunks of at most ``max_tokens`` each
+
+    Top-level classes and functions are kept whole and packed in order; a
+    class too large for one chunk is split between its members, and any
+    other oversized definition by lines. Imports and module globals are not
+    chunked but repeated in front of every chunk as context, within a
+    quarter of the budget. Source that does not parse is split by lines.
+
+    Args:
+        source: Python source code
+        max_tokens: Token budget per chunk, context included
+
+    Returns:
+        Chunks in source order; a single chunk with no context if the source fits
+    """
+    if _tokens(source) <= max_tokens:
+        return [CodeChunk(source, 1, max(source.count("\n"), 1), [])]
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        chunks, line = [], 1
+        for part in split_text(source, max_tokens, CHARS_PER_TOKEN):
+            count = part.count("\n")
+            chunks.append(CodeChunk(part, line, line + max(count - 1, 0), []))
+            line += count
+        return chunks
+
+    lines = source.splitlines(keepends=True)
+    context, shared = _module_context(lines, tree.body, int(max_tokens * CONTEXT_SHARE))
+    units = _units(tree.body, 0, skip=lambda node: node in shared)
+    return _pack(lines, units, max_tokens - _tokens(context) - MARKER_TOKENS, context)
+
+
+def map_reduce(chunks: Sequence[CodeChunk],
+               map_prompt: Callable[[CodeChunk], str],
+               ask: Callable[[str], str],
+               reduce_prompt: Optional[Callable[[List[str]], str]] = None,
+               reduce_tokens: int = 50_000,
+               max_workers: int = 8) -> str:
+    """
+    Analyze chunks in parallel and merge the answers
+
+    Each chunk is sent with ``map_prompt`` at the same time (up to
+    ``max_workers``), in a copy of the caller's context so deadlines and
+    traffic classes carry over. The answers are then merged by sending
+    ``reduce_prompt``; if they are too long for one merge request they are
+    merged in groups first. Without a ``reduce_prompt`` the answers are
+    joined in source order, for results that are code.
+
+    Args:
+        chunks: Chunks from chunk_python_source
+        map_prompt: Builds the prompt for one chunk
+        ask: Sends a prompt and returns the answer text (raises on failure)
+        reduce_prompt: Builds the merge prompt from partial answers, or None to join them
+        reduce_tokens: Token budget of one merge request's partial answers
+        max_workers: Chunks analyzed at the same time
+
+    Returns:
+        The merged answer
+
+    Raises:
+        Exception: The first chunk's error if every chunk failed
+    """
+    def run(chunk: CodeChunk) -> str:
+        return ask(map_prompt(chunk))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, run, chunk) for chunk in chunks]
+        partials, errors = [], []
+        for chunk, future in zip(chunks, futures):
+            try:
+                partials.append(f"## Part {chunk.label}\n\n{future.result()}")
+            except Exception as e:
+                errors.append(e)
+                partials.append(f"## Part {chunk.label}\n\n(This part could not be analyzed: {e})")
+    if errors and len(errors) == len(chunks):
+        raise errors[0]
+    if reduce_prompt is None:
+        return "\n\n".join(partials)
+
+    while True:
+        groups: List[List[str]] = [[]]
+        for partial in partials:
+            if groups[-1] and _tokens("".join(groups[-1]) + partial) > reduce_tokens:
+                groups.append([])
+            groups[-1].append(partial)
+        if len(groups) == 1:
+            return ask(reduce_prompt(groups[0]))
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, ask, reduce_prompt(group)) for group in groups]
+            partials = [f"## Merged parts {index}\n\n{future.result()}" for index, future in enumerate(futures, 1)]
@@ -0,0 +1,142 @@
+"""
+Continuation of truncated responses
+Resume answers that stopped at max_tokens instead of re-running them with a bigger limit
+"""
+
+from typing import Any, List, Optional
+
+from anthropic.types import TextBlock, Usage
+
+from .deadline import DeadlineExceeded, expired
+from .messaging import create_message
+from .token_budget import output_budget
+
+FENCE = "```"
+
+# Shortest repeated text at a seam that is treated as an overlap
+MIN_OVERLAP = 20
+
+
+class ContinuedMessage:
+    """
+    A response stitched together from a truncated answer and its continuations.
+
+    Has the attributes the demos read from a Messages API response
+    (content, usage, stop_reason, model) plus the number of continuations
+    and whether the caller's deadline stopped them early.
+    """
+
+    def __init__(self, text: str, model: str, stop_reason: Optional[str],
+                 input_tokens: int, output_tokens: int, continuations: int,
+                 deadline_exceeded: bool = False):
+        self.content = [TextBlock(type="text", text=text)]
+        self.model = model
+        self.stop_reason = stop_reason
+        self.usage = Usage(input_tokens=input_tokens, output_tokens=output_tokens)
+        self.continuations = continuations
+        self.deadline_exceeded = deadline_exceeded
+
+
+def _text(response: Any) -> Optional[str]:
+    """Text of a response, or None if it has non-text blocks"""
+    parts = []
+    for block in response.content:
+        if getattr(block, "type", "text") != "text":
+            return None
+        parts.append(block.text)
+    return "".join(parts)
+
+
+def join_continuation(previous: str, addition: str) -> str:
+    """
+    Append a continuation to the text before it
+
+    Models sometimes repeat the last few words before carrying on; a
+    repeated overlap of at least MIN_OVERLAP characters is dropped.
+
+    Args:
+        previous: Text so far (already without trailing whitespace)
+        addition: Text of the continuation
+
+    Returns:
+        The joined text
+    """
+    longest = min(len(previous), len(addition), 500)
+    for size in range(longest, MIN_OVERLAP - 1, -1):
+        if previous.endswith(addition[:size]):
+            return previous + addition[size:]
+    return previous + addition
+
+
+def close_open_fence(text: str) -> str:
+    """Close a code fence left open by an answer that was cut off"""
+    fences = sum(1 for line in text.splitlines() if line.lstrip().startswith(FENCE))
+    if fences % 2:
+        return text.rstrip() + "\n" + FENCE + "\n"
+    return text
+
+
+def create_complete_message(client: Any, *, max_output_tokens: int = 16_000, max_continuations: int = 5,
+                            task: Optional[str] = None, **request) -> Any:
+    """
+    Send a request and keep continuing it while it stops at max_tokens
+
+    Each follow-up repeats the conversation with the partial answer as a
+    prefilled assistant turn, so the model resumes exactly where it stopped.
+    The pieces are joined into one answer; if the cap is reached while a
+    code fence is open, the fence is closed. When the caller's deadline runs
+    out, the text so far is returned with ``deadline_exceeded`` set.
+
+    Args:
+        client: Anthropic client to send the requests with
+        max_output_tokens: Cap on output tokens across all pieces
+        max_continuations: Cap on follow-up requests
+        task: Kind of task, as for create_message
+        **request: Keyword arguments for messages.create
+
+    Returns:
+        The response itself if it was complete, otherwise a ContinuedMessage
+    """
+    response = create_message(client, task=task, **request)
+    if getattr(response, "stop_reason", None) != "max_tokens":
+        return response
+    text = _text(response)
+    if text is None:
+        return response
+
+    model = request["model"]
+    piece_tokens = request.get("max_tokens") or output_budget(model, task or "chat")
+    messages: List[Any] = list(request["messages"])
+    input_tokens = response.usage.input_tokens
+    output_tokens = response.usage.output_tokens
+    stop_reason = response.stop_reason
+    continuations = 0
+    out_of_time = False
+
+    while (stop_reason == "max_tokens" and continuations < max_continuations
+           and output_tokens < max_output_tokens):
+        if expired():
+            out_of_time = True
+            break
+        # The API rejects a prefilled assistant turn that ends in whitespace
+        text = text.rstrip()
+        follow_up = dict(request, messages=messages + [{"role": "assistant", "content": text}],
+                         max_tokens=min(piece_tokens, max_output_tokens - output_tokens))
+        try:
+            response = create_message(client, task=task, **follow_up)
+        except DeadlineExceeded:
+            out_of_time = True
+            break
+        addition = _text(response)
+        if addition is None:
+            break
+        text = join_continuation(text, addition)
+        input_tokens += response.usage.input_tokens
+        output_tokens += response.usage.output_tokens
+        stop_reason = response.stop_reason
+        continuations += 1
+
+    if stop_reason == "max_tokens":
+        text = close_open_fence(text)
+    return ContinuedMessage(text, model, stop_reason, input_tokens, output_tokens, continuations,
+                            deadline_exceeded=out_of_time)
@@ -0,0 +1,87 @@
+"""
+Cost tracking for Claude API calls
+Price each call's token usage and keep running totals
+"""
+
+import datetime
+from typing import Any, Dict
+
+
+class CostTracker:
+    """
+    Track and calculate costs for Claude API usage
+    Pricing as of Claude 3.5 Sonnet (20241022) - Update as needed
+    """
+    
+    # Pricing per 1M tokens (as of latest pricing)
+    PRICING = {
+        "claude-3-5-sonnet-20241022": {
+            "input": 3.00,   # $3.00 per 1M input tokens
+            "output": 15.00  # $15.00 per 1M output tokens
+        },
+        "claude-3-5-haiku-20241022": {
+            "input": 0.25,   # $0.25 per 1M input tokens
+            "output": 1.25   # $1.25 per 1M output tokens
+        },
+        "claude-3-opus-20240229": {
+            "input": 15.00,  # $15.00 per 1M input tokens
+            "output": 75.00  # $75.00 per 1M output tokens
+        }
+    }
+    
+    def __init__(self):
+        self.total_input_tokens = 0
+        self.total_output_tokens = 0
+        self.total_cost = 0.0
+        self.api_calls = []
+    
+    def track_usage(self, model: str, input_tokens: int, output_tokens: int, operation: str = "unknown"):
+        """Track token usage and calculate cost for an API call"""
+        if model not in self.PRICING:
+            print(f"⚠️ Warning: Pricing not available for model {model}")
+            return 0.0
+        
+        pricing = self.PRICING[model]
+        input_cost = (input_tokens / 1_000_000) * pricing["input"]
+        output_cost = (output_tokens / 1_000_000) * pricing["output"]
+        call_cost = input_cost + output_cost
+        
+        # Track totals
+        self.total_input_tokens += input_tokens
+        self.total_output_tokens += output_tokens
+        self.total_cost += call_cost
+        
+        # Record individual call
+        call_record = {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "operation": operation,
+            "model": model,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "input_cost": round(input_cost, 6),
+            "output_cost": round(output_cost, 6),
+            "total_cost": round(call_cost, 6)
+        }
+        self.api_calls.append(call_record)
+        
+        return call_cost
+    
+    def get_summary(self) -> Dict[str, Any]:
+        """Get cost summary"""
+        return {
+            "total_api_calls": len(self.api_calls),
+            "total_input_tokens": self.total_input_tokens,
+            "total_output_tokens": self.total_output_tokens,
+            "total_tokens": self.total_input_tokens + self.total_output_tokens,
+            "total_cost": round(self.total_cost, 6),
+            "average_cost_per_call": round(self.total_cost / len(self.api_calls), 6) if self.api_calls else 0,
+            "calls": self.api_calls
+        }
+    
+    def print_call_summary(self, operation: str, cost: float, input_tokens: int, output_tokens: int):
+        """Print a formatted summary of the API call cost"""
+        print(f"💰 Cost Summary for {operation}:")
+        print(f"   Input tokens: {input_tokens:,} (${(input_tokens/1_000_000)*3.00:.6f})")
+        print(f"   Output tokens: {output_tokens:,} (${(output_tokens/1_000_000)*15.00:.6f})")
+        print(f"   Total cost: ${cost:.6f}")
+        print(f"   Running total: ${self.total_cost:.6f}")
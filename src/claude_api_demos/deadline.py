@@ -0,0 +1,203 @@
+"""
+Deadlines for Claude API calls
+A time budget that follows a call through queues, retries and continuations
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Key set on dict results (and attribute set on text results) cut short by a deadline
+PARTIAL_FLAG = "deadline_exceeded"
+
+# Shortest HTTP timeout handed to the SDK while some budget is left
+MIN_REQUEST_TIMEOUT = 0.05
+
+
+class _Scope:
+    """One deadline_scope: its absolute deadline and whether work inside it was cut short"""
+
+    def __init__(self, until: float, parent: Optional["_Scope"]):
+        self.until = until if parent is None else min(until, parent.until)
+        self.parent = parent
+        self.cut_short = False
+
+    def mark_cut_short(self):
+        scope: Optional[_Scope] = self
+        while scope is not None:
+            scope.cut_short = True
+            scope = scope.parent
+
+
+_scope: "contextvars.ContextVar[Optional[_Scope]]" = contextvars.ContextVar("deadline_scope", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised instead of starting or waiting for work the deadline leaves no time for.
+
+    Creating one marks the enclosing deadline scopes as cut short, so the
+    public method that owns the scope flags its result as partial even if
+    the error is caught on the way up.
+    """
+
+    def __init__(self, what: str = "request"):
+        self.what = what
+        super().__init__(f"Deadline exceeded before the {what} could finish")
+        note_cut_short()
+
+
+class PartialText(str):
+    """Text result of a call that ran out of time; ``deadline_exceeded`` is always True"""
+
+    deadline_exceeded = True
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Give the enclosed calls a time budget
+
+    Scopes nest: an inner scope can only shorten the deadline, never extend
+    it. The deadline is a context variable, so it follows asyncio tasks and
+    threads started with a copied context.
+
+    Args:
+        seconds: Budget from now, or None to keep the current deadline
+    """
+    parent = _scope.get()
+    if seconds is None and parent is None:
+        yield
+        return
+    until = parent.until if seconds is None else time.monotonic() + seconds
+    token = _scope.set(_Scope(until, parent))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline (0 once it has passed), or None if there is none"""
+    scope = _scope.get()
+    if scope is None:
+        return None
+    return max(scope.until - time.monotonic(), 0.0)
+
+
+def expired() -> bool:
+    """Whether the current deadline has passed"""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def note_cut_short():
+    """Record that work in the current deadline scope was skipped or stopped early"""
+    scope = _scope.get()
+    if scope is not None:
+        scope.mark_cut_short()
+
+
+def check_deadline(what: str = "request"):
+    """
+    Fail fast if the current deadline has passed
+
+    Raises:
+        DeadlineExceeded: If there is no time left
+    """
+    if expired():
+        raise DeadlineExceeded(what)
+
+
+def request_timeout() -> Dict[str, float]:
+    """Keyword arguments that cap an SDK call's HTTP timeout at the time left"""
+    left = remaining()
+    if left is None:
+        return {}
+    return {"timeout": max(left, MIN_REQUEST_TIMEOUT)}
+
+
+def mark_partial(result: Any) -> Any:
+    """Flag a result that was cut short by a deadline"""
+    if isinstance(result, dict):
+        result[PARTIAL_FLAG] = True
+        return result
+    if isinstance(result, str):
+        return PartialText(result)
+    return result
+
+
+def is_partial(result: Any) -> bool:
+    """Whether a result was cut short by a deadline"""
+    if isinstance(result, dict):
+        return bool(result.get(PARTIAL_FLAG))
+    return bool(getattr(result, PARTIAL_FLAG, False))
+
+
+def _finish(result: Any) -> Any:
+    """Flag the result of the current scope if anything in it was cut short"""
+    scope = _scope.get()
+    if scope is not None and (scope.cut_short or expired()):
+        return mark_partial(result)
+    return result
+
+
+def with_deadline(fn: F) -> F:
+    """
+    Let a public method take a ``deadline`` keyword argument
+
+    ``deadline`` is a budget in seconds for the whole call, on top of any
+    deadline already set by the caller. When the budget runs out the method
+    returns what it has, flagged with mark_partial, instead of blocking.
+    Generators stop yielding once the budget is spent.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, deadline: Optional[float] = None, **kwargs):
+            with deadline_scope(deadline):
+                return _finish(await fn(*args, **kwargs))
+        return async_wrapper  # type: ignore[return-value]
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def generator_wrapper(*args, deadline: Optional[float] = None, **kwargs):
+            with deadline_scope(deadline):
+                scope = _scope.get()
+            generator = fn(*args, **kwargs)
+            try:
+                while scope is None or time.monotonic() < scope.until:
+                    # Only set the scope while the generator runs, not while the caller holds it
+                    token = _scope.set(scope)
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        _scope.reset(token)
+                    yield item
+            finally:
+                generator.close()
+        return generator_wrapper  # type: ignore[return-value]
+
+    @functools.wraps(fn)
+    def wrapper(*args, deadline: Optional[float] = None, **kwargs):
+        with deadline_scope(deadline):
+            return _finish(fn(*args, **kwargs))
+    return wrapper  # type: ignore[return-value]
+
+
+async def wait_with_deadline(awaitable: Any, what: str = "request") -> Any:
+    """Await something for at most the time left before the current deadline"""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(what) from None
@@ -0,0 +1,254 @@
+"""
+Diff-only code review support
+Turn a git diff into annotated hunks with their enclosing definitions and pack them into requests
+"""
+
+import ast
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .code_chunker import CHARS_PER_TOKEN
+from .repo_review import run_git
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# Tool the diff review must report its findings with
+FINDINGS_TOOL = {
+    "name": "report_findings",
+    "description": "Report the problems found in the change, or an empty list if there are none.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "findings": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "path": {"type": "string", "description": "File the problem is in, as shown in the diff"},
+                        "line": {"type": "integer", "description": "Line number in the new version of the file"},
+                        "severity": {"type": "string", "enum": ["error", "warning", "suggestion"]},
+                        "message": {"type": "string", "description": "What is wrong and how to fix it"}
+                    },
+                    "required": ["path", "line", "severity", "message"]
+                }
+            }
+        },
+        "required": ["findings"]
+    }
+}
+
+
+class DiffHunk:
+    """
+    One hunk of a unified diff.
+
+    ``lines`` keeps the diff lines with their leading ``+``, ``-`` or space;
+    ``enclosing`` lists the signatures of the classes and functions the
+    hunk sits in, outermost first.
+    """
+
+    def __init__(self, path: str, old_start: int, old_count: int, new_start: int, new_count: int,
+                 lines: Optional[List[str]] = None):
+        self.path = path
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        self.lines = lines or []
+        self.enclosing: List[str] = []
+
+    @property
+    def new_lines(self) -> Tuple[int, int]:
+        """First and last line of the hunk in the new file"""
+        return self.new_start, self.new_start + max(self.new_count, 1) - 1
+
+    @property
+    def text(self) -> str:
+        """
+        The hunk for a prompt: each line is prefixed with its line number in
+        the new file (removed lines get none), after the enclosing signatures
+        """
+        out = [f"@@ {self.path} lines {self.new_lines[0]}-{self.new_lines[1]} @@"]
+        out.extend(f"      {signature}  # enclosing" for signature in self.enclosing)
+        line = self.new_start
+        for diff_line in self.lines:
+            if diff_line.startswith("-"):
+                out.append(f"     {diff_line}")
+            else:
+                out.append(f"{line:>5}{diff_line}")
+                line += 1
+        return "\n".join(out) + "\n"
+
+
+def parse_unified_diff(diff: str) -> List[DiffHunk]:
+    """
+    Split ``git diff`` output into hunks
+
+    Args:
+        diff: Unified diff text
+
+    Returns:
+        Hunks in diff order; deleted files are left out
+    """
+    hunks: List[DiffHunk] = []
+    path: Optional[str] = None
+    current: Optional[DiffHunk] = None
+    # Lines of the current hunk still to come; until both run out, "--- " and
+    # "+++ " are removed and added lines, not file headers
+    old_left = new_left = 0
+    for line in diff.splitlines():
+        tag = line[:1]
+        if (old_left > 0 or new_left > 0) and tag in ("+", "-", " "):
+            if tag != "+":
+                old_left -= 1
+            if tag != "-":
+                new_left -= 1
+            if current is not None:
+                current.lines.append(line)
+        elif line.startswith("diff --git"):
+            path, current, old_left, new_left = None, None, 0, 0
+        elif line.startswith("+++ "):
+            target = line[4:].strip()
+            path = None if target == "/dev/null" else target[2:] if target.startswith("b/") else target
+        elif line.startswith("--- "):
+            continue
+        elif line.startswith("@@"):
+            match = HUNK_HEADER.match(line)
+            current = None
+            if match:
+                old_start, old_count, new_start, new_count = match.groups()
+                old_left, new_left = int(old_count or 1), int(new_count or 1)
+                if path is not None:
+                    current = DiffHunk(path, int(old_start), old_left, int(new_start), new_left)
+                    hunks.append(current)
+    return hunks
+
+
+def _signature(lines: List[str], node: ast.stmt) -> str:
+    """Source of a definition's header, up to the start of its body"""
+    end = max(node.body[0].lineno - 1, node.lineno)
+    return " ".join(line.strip() for line in lines[node.lineno - 1:end])
+
+
+def enclosing_signatures(source: str, first_line: int, last_line: int) -> List[str]:
+    """
+    Signatures of the classes and functions that contain a range of lines
+
+    Args:
+        source: Python source of the new file
+        first_line: First line of the range
+        last_line: Last line of the range
+
+    Returns:
+        Signatures, outermost first; empty if the source does not parse
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return []
+    lines = source.splitlines()
+    signatures = []
+    nodes: Sequence[ast.stmt] = tree.body
+    while True:
+        container = next((node for node in nodes
+                          if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef))
+                          and node.lineno < first_line and last_line <= node.end_lineno), None)
+        if container is None:
+            return signatures
+        signatures.append(_signature(lines, container))
+        nodes = container.body
+
+
+def diff_hunks(root: Union[str, Path], base_ref: str, head_ref: Optional[str] = None,
+               context_lines: int = 3, pathspec: Sequence[str] = ("*.py",),
+               sources: Optional[Dict[str, str]] = None) -> List[DiffHunk]:
+    """
+    Hunks changed between two refs, with their enclosing signatures filled in
+
+    Args:
+        root: Directory inside a git work tree; paths are relative to it
+        base_ref: Ref to compare from
+        head_ref: Ref to compare to, or None for the working tree
+        context_lines: Unchanged lines kept around each change
+        pathspec: Files to include
+        sources: Filled with the new source of each changed file, if given
+
+    Returns:
+        Hunks in diff order
+
+    Raises:
+        RuntimeError: If git fails
+    """
+    refs = [base_ref] + ([head_ref] if head_ref else [])
+    diff = run_git(root, "diff", "--no-color", "--relative", f"-U{context_lines}", *refs, "--", *pathspec)
+    hunks = parse_unified_diff(diff)
+    sources = {} if sources is None else sources
+    for hunk in hunks:
+        if hunk.path not in sources:
+            if head_ref:
+                sources[hunk.path] = run_git(root, "show", f"{head_ref}:./{hunk.path}")
+            else:
+                sources[hunk.path] = (Path(root) / hunk.path).read_text(encoding="utf-8", errors="replace")
+        hunk.enclosing = enclosing_signatures(sources[hunk.path], *hunk.new_lines)
+    return hunks
+
+
+def pack_hunks(hunks: Sequence[DiffHunk], max_tokens: int) -> List[List[DiffHunk]]:
+    """
+    Group hunks into requests of at most ``max_tokens`` each
+
+    Hunks stay in diff order so a file's hunks usually share a request; a
+    hunk larger than the budget is sent on its own.
+    """
+    batches: List[List[DiffHunk]] = []
+    size = 0
+    for hunk in hunks:
+        tokens = len(hunk.text) // CHARS_PER_TOKEN
+        if not batches or size + tokens > max_tokens:
+            batches.append([])
+            size = 0
+        batches[-1].append(hunk)
+        size += tokens
+    return batches
+
+
+def map_findings(findings: Any, hunks: Sequence[DiffHunk]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Check reported findings against the hunks they were reported for
+
+    A finding on a line inside one of its file's hunks is kept as is; one
+    on another line of a file in the request is moved to the nearest hunk
+    and marked ``approximate``. Findings for files not in the request, or
+    that are not well-formed, are dropped.
+
+    Args:
+        findings: ``findings`` from the report_findings tool input
+        hunks: Hunks that were sent in the request
+
+    Returns:
+        The mapped findings and the number dropped
+    """
+    ranges: Dict[str, List[Tuple[int, int]]] = {}
+    for hunk in hunks:
+        ranges.setdefault(hunk.path, []).append(hunk.new_lines)
+    mapped, dropped = [], 0
+    for finding in findings if isinstance(findings, list) else []:
+        if not (isinstance(finding, dict) and finding.get("path") in ranges
+                and isinstance(finding.get("line"), int) and isinstance(finding.get("message"), str)):
+            dropped += 1
+            continue
+        line = finding["line"]
+        spans = ranges[finding["path"]]
+        result = {
+            "path": finding["path"],
+            "line": line,
+            "severity": finding.get("severity", "warning"),
+            "message": finding["message"]
+        }
+        if not any(first <= line <= last for first, last in spans):
+            first, last = min(spans, key=lambda span: min(abs(line - span[0]), abs(line - span[1])))
+            result["line"] = min(max(line, first), last)
+            result["approximate"] = True
+        mapped.append(result)
+    return mapped, dropped
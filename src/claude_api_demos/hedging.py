@@ -0,0 +1,232 @@
+"""
+Hedged requests
+Send a duplicate when a request is slow to start and keep whichever finishes first
+"""
+
+import contextvars
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from .cost_tracker import CostTracker
+from .messaging import stream_message
+from .rate_limiter import estimate_request_tokens, estimate_tokens
+
+
+class _Attempt:
+    """One of the concurrent copies of a hedged request"""
+
+    def __init__(self, hedge: bool, estimated_input_tokens: int):
+        self.hedge = hedge
+        self.estimated_input_tokens = estimated_input_tokens
+        self.started = time.monotonic()
+        self.first_token = threading.Event()
+        self.first_token_at: Optional[float] = None
+        self.cancelled = False
+        self.stream: Any = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def cancel(self):
+        """Stop reading and close the connection so generation stops"""
+        self.cancelled = True
+        stream = self.stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def usage_so_far(self) -> Dict[str, int]:
+        """
+        Tokens this attempt has consumed, estimating output for a cut-off stream
+
+        The request is billed once it has been sent, so an attempt cancelled
+        before its stream reports usage is charged its estimated input tokens.
+        """
+        if self.result is not None:
+            usage = self.result.usage
+            return {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens}
+        snapshot = getattr(self.stream, "current_message_snapshot", None)
+        usage = getattr(snapshot, "usage", None)
+        input_tokens = getattr(usage, "input_tokens", 0)
+        text = "".join(getattr(block, "text", "") for block in getattr(snapshot, "content", None) or []
+                       if isinstance(getattr(block, "text", None), str))
+        return {
+            "input_tokens": input_tokens if isinstance(input_tokens, int) and input_tokens
+            else self.estimated_input_tokens,
+            "output_tokens": estimate_tokens(text) if text else 0
+        }
+
+
+class HedgePolicy:
+    """
+    Hedge slow requests with a duplicate, within a budget.
+
+    Each request is streamed. If no text has arrived after the chosen
+    percentile of recent time-to-first-token, a second copy is sent and the
+    first copy to finish is returned; the other stream is closed. At most
+    ``budget`` extra requests per request are sent, and the tokens spent on
+    cancelled copies are counted and priced with CostTracker.PRICING.
+    """
+
+    def __init__(self,
+                 percentile: float = 0.95,
+                 budget: float = 0.05,
+                 min_samples: int = 20,
+                 min_delay: float = 0.05,
+                 window: int = 200):
+        """
+        Initialize the policy
+
+        Args:
+            percentile: Latency percentile after which a duplicate is sent
+            budget: Maximum ratio of hedged requests to requests
+            min_samples: Latency samples needed before hedging starts
+            min_delay: Lower bound for the hedge delay in seconds
+            window: Number of recent latency samples kept
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+
+        self._lock = threading.Lock()
+        self._latencies: "deque[float]" = deque(maxlen=window)
+        self._calls = 0
+        self._hedged = 0
+        self._hedge_wins = 0
+        self._cancelled = 0
+        self._extra_input_tokens = 0
+        self._extra_output_tokens = 0
+        self._extra_cost = 0.0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for a first token before hedging, or None if there is too little data"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return max(self.min_delay, ordered[min(int(len(ordered) * self.percentile), len(ordered) - 1)])
+
+    def record_latency(self, seconds: float):
+        """Add a time-to-first-token sample"""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _take_hedge(self) -> bool:
+        """Spend one hedge from the budget if there is one left"""
+        with self._lock:
+            if self._hedged + 1 > self.budget * self._calls:
+                return False
+            self._hedged += 1
+            return True
+
+    def _charge(self, model: str, attempt: _Attempt):
+        """Count the tokens of a cancelled copy as hedging overhead"""
+        usage = attempt.usage_so_far()
+        pricing = CostTracker.PRICING.get(model)
+        cost = 0.0
+        if pricing:
+            cost = (usage["input_tokens"] * pricing["input"] + usage["output_tokens"] * pricing["output"]) / 1_000_000
+        with self._lock:
+            self._cancelled += 1
+            self._extra_input_tokens += usage["input_tokens"]
+            self._extra_output_tokens += usage["output_tokens"]
+            self._extra_cost += cost
+
+    def _start(self, client: Any, request: Dict[str, Any], hedge: bool,
+               finished: "queue.Queue[_Attempt]") -> _Attempt:
+        attempt = _Attempt(hedge, estimate_request_tokens(request))
+
+        def run():
+            try:
+                with stream_message(client, **request) as stream:
+                    attempt.stream = stream
+                    if attempt.cancelled:
+                        return
+                    for _ in stream.text_stream:
+                        if attempt.cancelled:
+                            break
+                        if attempt.first_token_at is None:
+                            attempt.first_token_at = time.monotonic()
+                            attempt.first_token.set()
+                    if not attempt.cancelled:
+                        attempt.result = stream.get_final_message()
+            except BaseException as e:
+                attempt.error = e
+            finally:
+                attempt.first_token.set()
+                finished.put(attempt)
+
+        # Copy the context so the copies keep the caller's deadline and traffic class
+        threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+        return attempt
+
+    def create(self, client: Any, **request) -> Any:
+        """
+        Send a request, hedging it if it is slow to start
+
+        Takes the same arguments as create_message (including ``task``).
+
+        Returns:
+            The final message of the copy that finished first
+        """
+        with self._lock:
+            self._calls += 1
+        delay = self.hedge_delay()
+        finished: "queue.Queue[_Attempt]" = queue.Queue()
+        primary = self._start(client, request, False, finished)
+        attempts: List[_Attempt] = [primary]
+
+        if delay is not None and not primary.first_token.wait(delay) and self._take_hedge():
+            attempts.append(self._start(client, request, True, finished))
+
+        winner: Optional[_Attempt] = None
+        for _ in attempts:
+            attempt = finished.get()
+            if attempt.error is None:
+                winner = attempt
+                break
+        for attempt in attempts:
+            if attempt is not winner and attempt.error is None:
+                attempt.cancel()
+                self._charge(request.get("model", ""), attempt)
+
+        if primary.first_token_at is not None:
+            self.record_latency(primary.first_token_at - primary.started)
+        elif winner is not None:
+            self.record_latency((winner.first_token_at or time.monotonic()) - primary.started)
+
+        if winner is None:
+            raise attempts[0].error
+        if winner.hedge:
+            with self._lock:
+                self._hedge_wins += 1
+        return winner.result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hedging statistics"""
+        with self._lock:
+            ordered = sorted(self._latencies)
+            calls = self._calls
+
+            def percentile(pct: float) -> Optional[float]:
+                if not ordered:
+                    return None
+                return round(ordered[min(int(len(ordered) * pct), len(ordered) - 1)], 4)
+
+            return {
+                "calls": calls,
+                "hedged": self._hedged,
+                "hedge_rate": round(self._hedged / calls, 4) if calls else 0.0,
+                "hedge_wins": self._hedge_wins,
+                "cancelled": self._cancelled,
+                "extra_input_tokens": self._extra_input_tokens,
+                "extra_output_tokens": self._extra_output_tokens,
+                "extra_cost": round(self._extra_cost, 6),
+                "ttft_p50": percentile(0.50),
+                "ttft_p99": percentile(0.99)
+            }
@@ -3,18 +3,29 @@ Interactive Claude Development Assistant
 Similar to the DataCamp tutorial's hands-on approach
 """
 
-import anthropic
 import os
 from typing import Optional, List, Dict
 import sys
 import traceback
 
+from .client_pool import get_shared_client
+from .code_chunker import chunk_python_source, map_reduce
+from .deadline import is_partial, with_deadline
+from .messaging import create_message
+from .model_router import get_shared_router
+from .prompt_cache import place_cache_breakpoints
+from .speedup import format_measurements, verify_optimization
+from .token_budget import ContextWindowExceeded
+
 class ClaudeDeveloperAssistant:
+    # Files larger than this are analyzed in parts, leaving room for the history
+    FILE_PART_TOKENS = 50_000
+    # Seconds a command typed in the interactive session may take
+    COMMAND_DEADLINE = 120.0
+    
     def __init__(self, api_key: Optional[str] = None):
         """Initialize the developer assistant"""
-        self.client = anthropic.Anthropic(
-            api_key=api_key or os.getenv("ANTHROPIC_API_KEY")
-        )
+        self.client = get_shared_client(api_key)
         self.conversation_history = []
     
     def interactive_session(self):
@@ -26,7 +37,7 @@ class ClaudeDeveloperAssistant:
         print("• 'refactor [code]' - Refactor code snippet")
         print("• 'debug [error]' - Help debug an error")
         print("• 'explain [concept]' - Explain programming concept")
-        print("• 'optimize [code]' - Optimize code performance")
+        print("• 'optimize [--verify] [code]' - Optimize code performance (--verify runs and times it locally)")
         print("• 'test [function]' - Generate tests for function")
         print("• 'quit' - Exit the session")
         print("=" * 50)
@@ -43,8 +54,10 @@ class ClaudeDeveloperAssistant:
                     continue
                 
                 # Process the command
-                response = self.process_command(user_input)
+                response = self.process_command(user_input, deadline=self.COMMAND_DEADLINE)
                 print(f"\n🤖 Claude: {response}")
+                if is_partial(response):
+                    print("⏱️ Stopped early: the command ran out of time")
                 
             except KeyboardInterrupt:
                 print("\n👋 Session interrupted. Goodbye!")
@@ -52,6 +65,7 @@ class ClaudeDeveloperAssistant:
             except Exception as e:
                 print(f"❌ Error: {e}")
     
+    @with_deadline
     def process_command(self, command: str) -> str:
         """Process user commands"""
         parts = command.split(' ', 1)
@@ -67,13 +81,18 @@ class ClaudeDeveloperAssistant:
         elif cmd == 'explain':
             return self.explain_concept(content)
         elif cmd == 'optimize':
-            return self.optimize_code(content)
+            # Verifying runs the generated code here, so only on request
+            verify = content == '--verify' or content.startswith('--verify ')
+            if verify:
+                content = content[len('--verify'):].strip()
+            return self.optimize_code(content, verify=verify)
         elif cmd == 'test':
             return self.generate_tests(content)
         else:
             # General conversation
             return self.chat(command)
     
+    @with_deadline
     def analyze_file(self, filename: str) -> str:
         """Analyze a Python file"""
         try:
@@ -86,7 +105,44 @@ class ClaudeDeveloperAssistant:
             with open(filename, 'r', encoding='utf-8') as f:
                 code = f.read()
             
-            prompt = f"""
+            chunks = chunk_python_source(code, self.FILE_PART_TOKENS)
+            if len(chunks) == 1:
+                return self.chat(self._file_analysis_prompt(filename, code))
+            
+            # Too large for one request: analyze the parts in parallel, merge
+            # them into one answer and keep only that in the conversation history
+            print(f"📄 {filename} is large; analyzing it in {len(chunks)} parts...")
+            
+            def ask(prompt: str) -> str:
+                response = create_message(
+                    self.client,
+                    model="claude-3-5-sonnet-20241022",
+                    task="analysis",
+                    messages=[{"role": "user", "content": prompt}]
+                )
+                return response.content[0].text
+            
+            analysis = map_reduce(
+                chunks,
+                lambda chunk: self._file_analysis_prompt(f"{filename} ({chunk.label})", chunk.text),
+                ask,
+                lambda partials: (
+                    f"These are analyses of consecutive parts of {filename}. Merge them into one "
+                    f"analysis of the whole file under the same four headings, without repeating "
+                    f"findings, and keep the line ranges they refer to.\n\n" + "\n\n".join(partials)
+                )
+            )
+            self.conversation_history.append({"role": "user", "content": f"Analyze the file {filename}"})
+            self.conversation_history.append({"role": "assistant", "content": analysis})
+            return analysis
+            
+        except Exception as e:
+            return f"Error analyzing file: {e}"
+    
+    @staticmethod
+    def _file_analysis_prompt(filename: str, code: str) -> str:
+        """Build the analyze_file prompt for a file or part of one"""
+        return f"""
             Analyze this Python file and provide insights about:
             1. Code structure and organization
             2. Potential improvements
@@ -98,12 +154,8 @@ class ClaudeDeveloperAssistant:
             {code}
             ```
             """
-            
-            return self.chat(prompt)
-            
-        except Exception as e:
-            return f"Error analyzing file: {e}"
     
+    @with_deadline
     def refactor_code(self, code: str) -> str:
         """Refactor code for better quality"""
         if not code:
@@ -126,6 +178,7 @@ class ClaudeDeveloperAssistant:
         
         return self.chat(prompt)
     
+    @with_deadline
     def debug_help(self, error_info: str) -> str:
         """Help debug errors"""
         if not error_info:
@@ -144,6 +197,7 @@ class ClaudeDeveloperAssistant:
         
         return self.chat(prompt)
     
+    @with_deadline
     def explain_concept(self, concept: str) -> str:
         """Explain programming concepts"""
         if not concept:
@@ -161,8 +215,19 @@ class ClaudeDeveloperAssistant:
         
         return self.chat(prompt)
     
-    def optimize_code(self, code: str) -> str:
-        """Optimize code performance"""
+    @with_deadline
+    def optimize_code(self, code: str, verify: bool = False) -> str:
+        """
+        Optimize code performance
+        
+        Args:
+            code: Code to optimize
+            verify: Check the optimized functions against the originals, time
+                both and append the measured speedups (see speedup.measure_speedup)
+            
+        Returns:
+            The optimization, followed by the measurements with ``verify``
+        """
         if not code:
             return "Please provide code to optimize."
         
@@ -178,10 +243,19 @@ class ClaudeDeveloperAssistant:
         2. Bottlenecks identification
         3. Optimized version
         4. Performance comparison
+        
+        Keep each function's name and signature so the optimized version is a drop-in replacement.
         """
         
-        return self.chat(prompt)
+        answer = self.chat(prompt)
+        if not verify or answer.startswith("Error:"):
+            return answer
+        verified = verify_optimization(code, answer)
+        verdict = ("All optimized functions give the same output and are faster." if verified["accepted"]
+                   else "⚠️ Rejected: the optimized code is slower or changes the output; keep the original.")
+        return f"{answer}\n\n## Measured\n\n{format_measurements(verified['measurements'])}\n\n{verdict}"
     
+    @with_deadline
     def generate_tests(self, function_code: str) -> str:
         """Generate test cases"""
         if not function_code:
@@ -203,6 +277,7 @@ class ClaudeDeveloperAssistant:
         
         return self.chat(prompt)
     
+    @with_deadline
     def chat(self, message: str) -> str:
         """General chat with Claude"""
         try:
@@ -213,10 +288,14 @@ class ClaudeDeveloperAssistant:
             if len(self.conversation_history) > 20:
                 self.conversation_history = self.conversation_history[-20:]
             
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=2000,
-                messages=self.conversation_history
+            # Simple questions go to the cheaper model; the router escalates
+            # when an answer comes back truncated
+            response = get_shared_router().send(
+                self.client,
+                task="analysis",
+                # Breakpoints on the newest turns let each call read the
+                # history prefix cached by the previous one
+                messages=place_cache_breakpoints(self.conversation_history)
             )
             
             assistant_response = response.content[0].text
@@ -224,6 +303,10 @@ class ClaudeDeveloperAssistant:
             
             return assistant_response
             
+        except ContextWindowExceeded as e:
+            # Rejected before sending; keep the oversized message out of the history
+            self.conversation_history.pop()
+            return f"Error: {e}"
         except Exception as e:
             return f"Error: {e}"
 
@@ -0,0 +1,267 @@
+"""
+Client-layer request path
+Every Messages API call made by the demo classes goes through here
+"""
+
+from contextlib import ExitStack, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, NoReturn, Optional, TypeVar
+
+import anthropic
+
+from .bulkhead import get_shared_bulkheads
+from .circuit_breaker import CircuitOpenError, get_shared_breakers
+from .coalescing import get_shared_singleflight
+from .deadline import DeadlineExceeded, check_deadline, expired, remaining, request_timeout
+from .prompt_cache import get_prompt_cache_stats
+from .rate_limiter import estimate_request_tokens, get_shared_rate_limiter
+from .response_cache import request_cache_key
+from .retry import get_shared_retry_policy
+from .scheduler import get_shared_scheduler
+from .token_budget import budget_request, budget_request_async
+
+T = TypeVar("T")
+
+
+def _flight_key(client: Any, request: Dict[str, Any]) -> str:
+    """Identity of a request for coalescing: same client, same request body"""
+    return f"{id(client)}:{request_cache_key(request)}"
+
+
+def _with_failover(request: Dict[str, Any], send: Callable[[Dict[str, Any]], T]) -> T:
+    """Send a request, switching to the configured fallback model if its breaker is open"""
+    try:
+        return send(request)
+    except CircuitOpenError:
+        fallback = get_shared_breakers().fallback_for(request["model"])
+        if fallback is None:
+            raise
+        return send(dict(request, model=fallback))
+
+
+def _raise_failure(breaker: Any, error: Exception) -> NoReturn:
+    """
+    Report a failed attempt to the breaker and re-raise it
+
+    A timeout caused by the caller's own deadline says nothing about the
+    backend, so it gives the breaker permission back and becomes DeadlineExceeded.
+    """
+    if isinstance(error, anthropic.APITimeoutError) and expired():
+        breaker.release()
+        raise DeadlineExceeded() from error
+    breaker.record_failure(error)
+    raise error
+
+
+def _acquire_capacity(limiter: Any, breaker: Any, input_tokens: int, output_tokens: int) -> Dict[str, Any]:
+    """Wait for rate-limit capacity within the deadline, releasing the breaker permission if there is none"""
+    try:
+        return limiter.acquire(input_tokens, output_tokens, max_wait=remaining())
+    except BaseException:
+        # Out of time, or interrupted while waiting: the call is never sent
+        breaker.release()
+        raise
+
+
+async def _acquire_capacity_async(limiter: Any, breaker: Any, input_tokens: int, output_tokens: int) -> Dict[str, Any]:
+    """asyncio version of _acquire_capacity"""
+    try:
+        return await limiter.acquire_async(input_tokens, output_tokens, max_wait=remaining())
+    except BaseException:
+        breaker.release()
+        raise
+
+
+def _abandon(limiter: Any, breaker: Any, reservation: Dict[str, Any]):
+    """
+    Give back the capacity and breaker permission of a call that was cancelled or interrupted
+
+    CancelledError and KeyboardInterrupt are not Exceptions, so without this
+    a half-open breaker would keep its probe claimed for good.
+    """
+    limiter.release(reservation)
+    breaker.release()
+
+
+async def _with_failover_async(request: Dict[str, Any],
+                               send: Callable[[Dict[str, Any]], Awaitable[T]]) -> T:
+    """asyncio version of _with_failover"""
+    try:
+        return await send(request)
+    except CircuitOpenError:
+        fallback = get_shared_breakers().fallback_for(request["model"])
+        if fallback is None:
+            raise
+        return await send(dict(request, model=fallback))
+
+
+def create_message(client: Any, *, coalesce: bool = True, task: Optional[str] = None, **request) -> Any:
+    """
+    Send a messages.create request through the shared client-layer policies
+
+    Args:
+        client: Anthropic client to send the request with
+        coalesce: Share one upstream call with identical requests already in flight
+        task: Kind of task; when given, the input is counted first and
+            max_tokens is picked from the task's budget and the room left
+        **request: Keyword arguments for messages.create
+
+    Returns:
+        The Messages API response
+
+    Raises:
+        ContextWindowExceeded: If a budgeted request cannot fit its answer
+        CircuitOpenError: If the model's breaker is open and no fallback is configured
+        BulkheadFullError: If the caller's traffic class has no free slot
+        QueueFullError: If too many requests of the caller's class are queued
+        DeadlineExceeded: If the caller's deadline leaves no time to send or finish the request
+    """
+    if task is not None:
+        request = budget_request(client, request, task)
+    limiter = get_shared_rate_limiter()
+    scheduler = get_shared_scheduler()
+    bulkhead = get_shared_bulkheads().for_class()
+
+    def send_to(routed: Dict[str, Any]) -> Any:
+        breaker = get_shared_breakers().get("messages", routed["model"])
+        input_tokens = estimate_request_tokens(routed)
+
+        def attempt() -> Any:
+            check_deadline()
+            with scheduler.slot(input_tokens + routed.get("max_tokens", 0)), bulkhead.slot():
+                breaker.allow()
+                reservation = _acquire_capacity(limiter, breaker, input_tokens, routed.get("max_tokens", 0))
+                try:
+                    response = client.messages.create(**routed, **request_timeout())
+                except Exception as e:
+                    limiter.release(reservation)
+                    _raise_failure(breaker, e)
+                except BaseException:
+                    _abandon(limiter, breaker, reservation)
+                    raise
+                breaker.record_success()
+            limiter.record_usage(reservation, getattr(response, "usage", None))
+            get_prompt_cache_stats().record(getattr(response, "usage", None))
+            return response
+
+        return get_shared_retry_policy().call(attempt)
+
+    def send() -> Any:
+        return _with_failover(request, send_to)
+
+    if not coalesce:
+        return send()
+    return get_shared_singleflight().do(_flight_key(client, request), send)
+
+
+@contextmanager
+def stream_message(client: Any, *, task: Optional[str] = None, **request) -> Iterator[Any]:
+    """
+    Open a messages.stream request through the shared client-layer policies
+
+    Only opening the stream is retried; a stream that fails part-way is not
+    replayed because its text has already been handed to the caller. The
+    scheduler and bulkhead slots are held until the stream is closed.
+
+    Args:
+        client: Anthropic client to send the request with
+        task: Kind of task, as for create_message
+        **request: Keyword arguments for messages.stream
+
+    Yields:
+        The SDK message stream
+    """
+    if task is not None:
+        request = budget_request(client, request, task)
+    limiter = get_shared_rate_limiter()
+    scheduler = get_shared_scheduler()
+    bulkhead = get_shared_bulkheads().for_class()
+
+    def open_stream(routed: Dict[str, Any]) -> Any:
+        breaker = get_shared_breakers().get("messages", routed["model"])
+        input_tokens = estimate_request_tokens(routed)
+
+        def attempt() -> Any:
+            check_deadline()
+            stack = ExitStack()
+            try:
+                stack.enter_context(scheduler.slot(input_tokens + routed.get("max_tokens", 0)))
+                stack.enter_context(bulkhead.slot())
+                breaker.allow()
+                reservation = _acquire_capacity(limiter, breaker, input_tokens, routed.get("max_tokens", 0))
+            except BaseException:
+                stack.close()
+                raise
+            try:
+                stream = stack.enter_context(client.messages.stream(**routed, **request_timeout()))
+            except Exception as e:
+                limiter.release(reservation)
+                stack.close()
+                _raise_failure(breaker, e)
+            except BaseException:
+                _abandon(limiter, breaker, reservation)
+                stack.close()
+                raise
+            breaker.record_success()
+            return stack, stream, reservation
+
+        return get_shared_retry_policy().call(attempt)
+
+    stack, stream, reservation = _with_failover(request, open_stream)
+    with stack:
+        yield stream
+        snapshot = getattr(stream, "current_message_snapshot", None)
+    limiter.record_usage(reservation, getattr(snapshot, "usage", None))
+    get_prompt_cache_stats().record(getattr(snapshot, "usage", None))
+
+
+async def create_message_async(client: Any, *, coalesce: bool = True, task: Optional[str] = None,
+                               **request) -> Any:
+    """
+    asyncio version of create_message for ``anthropic.AsyncAnthropic`` clients
+
+    Args:
+        client: Async Anthropic client to send the request with
+        coalesce: Share one upstream call with identical requests already in flight
+        task: Kind of task, as for create_message
+        **request: Keyword arguments for messages.create
+
+    Returns:
+        The Messages API response
+    """
+    if task is not None:
+        request = await budget_request_async(client, request, task)
+    limiter = get_shared_rate_limiter()
+    scheduler = get_shared_scheduler()
+    bulkhead = get_shared_bulkheads().for_class()
+
+    async def send_to(routed: Dict[str, Any]) -> Any:
+        breaker = get_shared_breakers().get("messages", routed["model"])
+        input_tokens = estimate_request_tokens(routed)
+
+        async def attempt() -> Any:
+            check_deadline()
+            async with scheduler.slot_async(input_tokens + routed.get("max_tokens", 0)), bulkhead.slot_async():
+                breaker.allow()
+                reservation = await _acquire_capacity_async(limiter, breaker, input_tokens,
+                                                            routed.get("max_tokens", 0))
+                try:
+                    response = await client.messages.create(**routed, **request_timeout())
+                except Exception as e:
+                    limiter.release(reservation)
+                    _raise_failure(breaker, e)
+                except BaseException:
+                    _abandon(limiter, breaker, reservation)
+                    raise
+                breaker.record_success()
+            limiter.record_usage(reservation, getattr(response, "usage", None))
+            get_prompt_cache_stats().record(getattr(response, "usage", None))
+            return response
+
+        return await get_shared_retry_policy().call_async(attempt)
+
+    async def send() -> Any:
+        return await _with_failover_async(request, send_to)
+
+    if not coalesce:
+        return await send()
+    return await get_shared_singleflight().do_async(_flight_key(client, request), send)
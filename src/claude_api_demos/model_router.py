@@ -0,0 +1,261 @@
+"""
+Cost- and complexity-aware model routing
+Send each request to the cheapest model likely to handle it and escalate on bad answers
+"""
+
+import re
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .deadline import expired
+from .messaging import create_message, create_message_async
+from .rate_limiter import estimate_request_tokens
+from .token_budget import model_limits, output_budget
+
+# Cheapest first; prices are listed in CostTracker.PRICING
+MODEL_TIERS = [
+    "claude-3-5-haiku-20241022",
+    "claude-3-5-sonnet-20241022",
+    "claude-3-opus-20240229",
+]
+
+# Starting tier per task type (an index into the tiers)
+TASK_TIERS = {
+    "chat": 0,
+    "explanation": 0,
+    "analysis": 0,
+    "code": 1,
+    "report": 1,
+}
+
+# Words that usually mean the request needs careful reasoning
+COMPLEX_KEYWORDS = (
+    "architecture", "concurren", "security", "vulnerab", "optimi", "refactor",
+    "prove", "trade-off", "tradeoff", "distributed", "race condition", "design",
+)
+
+# Returns a description of what is wrong with an answer, or None if it is fine
+Validator = Callable[[str], Optional[str]]
+
+
+def complexity_score(text: str) -> int:
+    """
+    Cheap estimate of how hard a prompt is
+
+    One point each for a long prompt, a sizeable code block and each
+    distinct complexity keyword (up to three).
+
+    Args:
+        text: Prompt text
+
+    Returns:
+        Score from 0 upwards; 2 or more is treated as complex
+    """
+    score = 0
+    if len(text) > 6000:
+        score += 1
+    code_lines = sum(block.count("\n") for block in re.findall(r"```.*?```", text, re.DOTALL))
+    if code_lines > 60:
+        score += 1
+    lowered = text.lower()
+    score += min(3, sum(1 for keyword in COMPLEX_KEYWORDS if keyword in lowered))
+    return score
+
+
+def _response_text(response: Any) -> str:
+    return "".join(getattr(block, "text", "") for block in response.content
+                   if isinstance(getattr(block, "text", None), str))
+
+
+def _last_user_text(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content", "")
+            if isinstance(content, str):
+                return content
+            return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return ""
+
+
+class ModelRouter:
+    """
+    Pick a model per request and escalate when the answer is not usable.
+
+    The starting model follows from the task type, the input size and
+    complexity_score of the newest user message. If the answer was cut off
+    at max_tokens, or the caller's validator rejects it, the request is sent
+    again to the next stronger model, up to ``max_escalations`` times. A
+    truncated answer is resent with twice the output room, so the stronger
+    model is not cut off at the same point.
+    """
+
+    def __init__(self,
+                 tiers: Optional[List[str]] = None,
+                 large_input_tokens: int = 20_000,
+                 complex_score: int = 2,
+                 max_escalations: int = 1,
+                 history: int = 100):
+        """
+        Initialize the router
+
+        Args:
+            tiers: Models from cheapest to strongest
+            large_input_tokens: Inputs at least this large skip the cheapest tier
+            complex_score: complexity_score from which the cheapest tier is skipped
+            max_escalations: How many stronger models to try after the first answer
+            history: Number of recent routing decisions to keep
+        """
+        self.tiers = list(tiers or MODEL_TIERS)
+        self.large_input_tokens = large_input_tokens
+        self.complex_score = complex_score
+        self.max_escalations = max_escalations
+
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._escalations = 0
+        self._routes: Dict[str, int] = {}
+        self._reasons: Dict[str, int] = {}
+        self._recent: "deque[Dict[str, Any]]" = deque(maxlen=history)
+
+    def choose(self, task: str, request: Dict[str, Any]) -> Tuple[int, str]:
+        """
+        Pick the starting tier for a request
+
+        Args:
+            task: Kind of task (see TASK_TIERS)
+            request: Keyword arguments for messages.create, without a model
+
+        Returns:
+            Index into ``tiers`` and the reason for the choice
+        """
+        tier, reason = TASK_TIERS.get(task, 1), f"task:{task}"
+        if tier == 0:
+            if estimate_request_tokens(request) >= self.large_input_tokens:
+                tier, reason = 1, "large-input"
+            elif complexity_score(_last_user_text(request.get("messages", []))) >= self.complex_score:
+                tier, reason = 1, "complex"
+        return min(tier, len(self.tiers) - 1), reason
+
+    def check(self, response: Any, validate: Optional[Validator] = None) -> Optional[str]:
+        """Why an answer should be escalated, or None if it is usable"""
+        if getattr(response, "stop_reason", None) == "max_tokens":
+            return "truncated"
+        if validate is None:
+            return None
+        try:
+            return validate(_response_text(response))
+        except Exception as e:
+            return f"validator failed: {e}"
+
+    def _escalate_to(self, tier: int, start: int, problem: Optional[str]) -> bool:
+        # Past the caller's deadline the answer in hand is better than none
+        return (problem is not None and tier + 1 < len(self.tiers)
+                and tier - start < self.max_escalations and not expired())
+
+    def _escalated_request(self, request: Dict[str, Any], response: Any, problem: str,
+                           task: str, tier: int) -> Dict[str, Any]:
+        """The request for ``tier``: twice the output room if the answer of the tier below was truncated"""
+        if problem != "truncated":
+            return request
+        used = getattr(getattr(response, "usage", None), "output_tokens", None)
+        if not isinstance(used, int) or used <= 0:
+            used = request.get("max_tokens") or output_budget(self.tiers[tier - 1], task)
+        return dict(request, max_tokens=min(used * 2, model_limits(self.tiers[tier])[1]))
+
+    def _record(self, task: str, reason: str, models: List[str], problems: List[str]):
+        with self._lock:
+            self._calls += 1
+            route = f"{task} -> {models[-1]}"
+            self._routes[route] = self._routes.get(route, 0) + 1
+            if len(models) > 1:
+                self._escalations += 1
+            for problem in problems:
+                kind = problem.split(":")[0]
+                self._reasons[kind] = self._reasons.get(kind, 0) + 1
+            self._recent.append({"task": task, "reason": reason, "models": models, "problems": problems})
+
+    def send(self, client: Any, task: str, validate: Optional[Validator] = None,
+             sender: Callable[..., Any] = create_message, **request) -> Any:
+        """
+        Send a request to the routed model, escalating if needed
+
+        Args:
+            client: Anthropic client to send the request with
+            task: Kind of task; also used for max_tokens budgeting
+            validate: Optional check of the answer text
+            sender: Function that sends one request, with create_message's signature
+            **request: Keyword arguments for messages.create, without a model
+
+        Returns:
+            The last Messages API response
+        """
+        start, reason = self.choose(task, request)
+        tier, models, problems = start, [], []
+        while True:
+            models.append(self.tiers[tier])
+            response = sender(client, model=self.tiers[tier], task=task, **request)
+            problem = self.check(response, validate)
+            if not self._escalate_to(tier, start, problem):
+                break
+            problems.append(problem)
+            tier += 1
+            request = self._escalated_request(request, response, problem, task, tier)
+        self._record(task, reason, models, problems)
+        return response
+
+    async def send_async(self, client: Any, task: str, validate: Optional[Validator] = None, **request) -> Any:
+        """asyncio version of send for ``anthropic.AsyncAnthropic`` clients"""
+        start, reason = self.choose(task, request)
+        tier, models, problems = start, [], []
+        while True:
+            models.append(self.tiers[tier])
+            response = await create_message_async(client, model=self.tiers[tier], task=task, **request)
+            problem = self.check(response, validate)
+            if not self._escalate_to(tier, start, problem):
+                break
+            problems.append(problem)
+            tier += 1
+            request = self._escalated_request(request, response, problem, task, tier)
+        self._record(task, reason, models, problems)
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get routing statistics"""
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "escalations": self._escalations,
+                "escalation_rate": round(self._escalations / self._calls, 4) if self._calls else 0.0,
+                "escalation_reasons": dict(self._reasons),
+                "routes": dict(self._routes),
+                "recent": list(self._recent)
+            }
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_shared_router() -> ModelRouter:
+    """Get the process-wide model router"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
+
+
+def configure_router(**kwargs) -> ModelRouter:
+    """Replace the process-wide model router with one built from kwargs"""
+    global _router
+    with _router_lock:
+        _router = ModelRouter(**kwargs)
+        return _router
+
+
+def reset_router():
+    """Drop the process-wide model router"""
+    global _router
+    with _router_lock:
+        _router = None
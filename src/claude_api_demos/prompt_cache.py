@@ -0,0 +1,148 @@
+"""
+Prompt caching helpers
+Mark large static prefixes with cache_control and track cache usage
+"""
+
+import copy
+import threading
+from typing import Any, Dict, List, Optional
+
+EPHEMERAL = {"type": "ephemeral"}
+
+# The API accepts at most four cache breakpoints per request
+MAX_BREAKPOINTS = 4
+
+# Shorter prefixes are not cached (the minimum for Sonnet and Opus models)
+MIN_CACHEABLE_TOKENS = 1024
+
+
+def cached_text_block(text: str) -> Dict[str, Any]:
+    """Text content block marked as the end of a cacheable prefix"""
+    return {"type": "text", "text": text, "cache_control": dict(EPHEMERAL)}
+
+
+def build_cached_content(shared: str, instruction: str) -> List[Dict[str, Any]]:
+    """
+    Build user content with the large shared part first and cached
+
+    Requests that differ only in ``instruction`` then reuse the cached
+    ``shared`` prefix instead of paying for it again.
+
+    Args:
+        shared: Large part reused across calls (e.g. a source file)
+        instruction: Part that changes from call to call
+
+    Returns:
+        Content blocks for a user message
+    """
+    return [cached_text_block(shared), {"type": "text", "text": instruction}]
+
+
+def _as_blocks(content: Any) -> List[Dict[str, Any]]:
+    """Convert message content to a list of content blocks"""
+    if isinstance(content, str):
+        return [{"type": "text", "text": content}]
+    return copy.deepcopy(list(content))
+
+
+def place_cache_breakpoints(messages: List[Dict[str, Any]], breakpoints: int = 2) -> List[Dict[str, Any]]:
+    """
+    Mark the stable prefix of a conversation for prompt caching
+
+    The last block of the newest message gets a breakpoint so this turn's
+    prefix is written to the cache, and the last block of the previous user
+    turn gets one so the prefix written on the previous call is read back.
+    The input list is left untouched.
+
+    Args:
+        messages: Conversation messages ('role' / 'content')
+        breakpoints: How many user turns, newest first, to mark
+
+    Returns:
+        A copy of the messages with cache_control breakpoints added
+    """
+    marked = [dict(message) for message in messages]
+    for message in marked:
+        if not isinstance(message["content"], str):
+            message["content"] = [
+                {key: value for key, value in block.items() if key != "cache_control"}
+                if isinstance(block, dict) else block
+                for block in message["content"]
+            ]
+
+    placed = 0
+    limit = min(breakpoints, MAX_BREAKPOINTS)
+    for message in reversed(marked):
+        if placed >= limit:
+            break
+        if message["role"] != "user":
+            continue
+        blocks = _as_blocks(message["content"])
+        if not blocks:
+            continue
+        blocks[-1] = dict(blocks[-1], cache_control=dict(EPHEMERAL))
+        message["content"] = blocks
+        placed += 1
+    return marked
+
+
+class PromptCacheStats:
+    """Running totals of prompt cache writes and reads reported in response.usage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._input_tokens = 0
+        self._cache_creation_input_tokens = 0
+        self._cache_read_input_tokens = 0
+
+    def record(self, usage: Any):
+        """
+        Add one response's usage
+
+        Args:
+            usage: ``response.usage`` from the Messages API
+        """
+        if usage is None:
+            return
+        values = {}
+        for name in ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+            value = getattr(usage, name, None)
+            values[name] = value if isinstance(value, int) else 0
+        with self._lock:
+            self._calls += 1
+            self._input_tokens += values["input_tokens"]
+            self._cache_creation_input_tokens += values["cache_creation_input_tokens"]
+            self._cache_read_input_tokens += values["cache_read_input_tokens"]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get prompt cache statistics"""
+        with self._lock:
+            prompt_tokens = self._input_tokens + self._cache_creation_input_tokens + self._cache_read_input_tokens
+            return {
+                "calls": self._calls,
+                "input_tokens": self._input_tokens,
+                "cache_creation_input_tokens": self._cache_creation_input_tokens,
+                "cache_read_input_tokens": self._cache_read_input_tokens,
+                "cache_read_ratio": round(self._cache_read_input_tokens / prompt_tokens, 4) if prompt_tokens else 0.0
+            }
+
+
+_stats: Optional[PromptCacheStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_prompt_cache_stats() -> PromptCacheStats:
+    """Get the process-wide prompt cache statistics"""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = PromptCacheStats()
+        return _stats
+
+
+def reset_prompt_cache_stats():
+    """Drop the process-wide prompt cache statistics"""
+    global _stats
+    with _stats_lock:
+        _stats = None
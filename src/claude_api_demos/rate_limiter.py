@@ -0,0 +1,404 @@
+"""
+Client-side rate limiting
+Token buckets for requests, input tokens and output tokens per minute
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional
+
+from .bulkhead import BATCH, INTERACTIVE, current_traffic_class
+from .deadline import DeadlineExceeded
+
+# Order in which traffic classes get rate-limit capacity (lowest first; unknown classes rank with batch)
+DEFAULT_PRIORITIES = {INTERACTIVE: 0, BATCH: 1}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate for text (about 4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def estimate_request_tokens(request: Dict[str, Any]) -> int:
+    """
+    Estimate the input tokens of a Messages API request before sending it
+
+    Args:
+        request: Keyword arguments for messages.create
+
+    Returns:
+        Estimated input token count
+    """
+    parts = [json.dumps(request.get("system", ""), ensure_ascii=False)]
+    for message in request.get("messages", []):
+        content = message.get("content", "")
+        parts.append(content if isinstance(content, str) else json.dumps(content, ensure_ascii=False))
+    return estimate_tokens("".join(parts))
+
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously up to a per-minute limit.
+
+    Reservations may drive the level negative; the caller then waits until
+    the debt is repaid. RateLimiter instead takes tokens only once they are
+    there (shortfall, then take), so it can choose who goes next. A bucket
+    without a limit never throttles.
+    """
+
+    def __init__(self, per_minute: Optional[float] = None):
+        self.per_minute = per_minute
+        self._level = float(per_minute or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Add the tokens accrued since the last update (caller holds the lock)"""
+        now = time.monotonic()
+        if self.per_minute:
+            accrued = (now - self._updated) * self.per_minute / 60.0
+            self._level = min(float(self.per_minute), self._level + accrued)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take tokens from the bucket
+
+        Args:
+            amount: Tokens to take; a single reservation never exceeds the limit
+
+        Returns:
+            Seconds to wait before the reservation is covered
+        """
+        with self._lock:
+            if not self.per_minute:
+                return 0.0
+            self._refill()
+            self._level -= min(amount, self.per_minute)
+            if self._level >= 0:
+                return 0.0
+            return -self._level * 60.0 / self.per_minute
+
+    def shortfall(self, amount: float) -> float:
+        """Seconds until ``amount`` tokens are available (0.0 if they are now)"""
+        with self._lock:
+            if not self.per_minute:
+                return 0.0
+            self._refill()
+            missing = min(amount, self.per_minute) - self._level
+            return max(missing, 0.0) * 60.0 / self.per_minute
+
+    def take(self, amount: float):
+        """Take tokens without waiting for them"""
+        with self._lock:
+            if not self.per_minute:
+                return
+            self._refill()
+            self._level -= min(amount, self.per_minute)
+
+    def refund(self, amount: float):
+        """Give tokens back (a negative amount takes more)"""
+        with self._lock:
+            if not self.per_minute:
+                return
+            self._refill()
+            self._level = min(float(self.per_minute), self._level + amount)
+
+    def update(self, per_minute: Optional[float] = None, remaining: Optional[float] = None):
+        """
+        Sync the bucket with the limits reported by the server
+
+        Args:
+            per_minute: New per-minute limit
+            remaining: Tokens the server says are left; the local level never
+                rises above this value
+        """
+        with self._lock:
+            self._refill()
+            if per_minute:
+                if not self.per_minute:
+                    self._level = float(per_minute)
+                self.per_minute = per_minute
+                self._level = min(self._level, float(per_minute))
+            if remaining is not None and self.per_minute:
+                self._level = min(self._level, float(remaining))
+
+    @property
+    def level(self) -> float:
+        """Tokens currently available (negative while callers are waiting)"""
+        with self._lock:
+            self._refill()
+            return self._level
+
+
+class _Waiter:
+    """A request waiting for rate-limit capacity"""
+
+    def __init__(self, rank: int, order: int, amounts: Dict[str, int]):
+        self.rank = rank
+        self.order = order
+        self.amounts = amounts
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.rank, self.order) < (other.rank, other.order)
+
+
+class RateLimiter:
+    """
+    Client-side limiter for requests, input tokens and output tokens per minute.
+
+    Input tokens are reserved from an estimate before each call and output
+    tokens from ``max_tokens``; both are corrected from ``response.usage``
+    afterwards. Limits can be configured up front or learned from the
+    ``anthropic-ratelimit-*`` response headers.
+
+    Capacity is handed out in priority order rather than arrival order:
+    waiting requests line up by the rank of their traffic class, then by
+    arrival, and only the first in line may take capacity once it is there.
+    Under rate-limit pressure an interactive call therefore overtakes
+    every batch call still waiting.
+    """
+
+    HEADER_PREFIX = "anthropic-ratelimit-"
+    BUCKET_NAMES = ("requests", "input-tokens", "output-tokens")
+
+    # Longest sleep between checks of the buckets, so refunds and header updates are noticed
+    POLL_INTERVAL = 0.25
+    # Seconds between checks for asyncio callers that are not first in line
+    ASYNC_POLL_INTERVAL = 0.01
+
+    def __init__(self,
+                 requests_per_minute: Optional[int] = None,
+                 input_tokens_per_minute: Optional[int] = None,
+                 output_tokens_per_minute: Optional[int] = None,
+                 priorities: Optional[Dict[str, int]] = None):
+        """
+        Initialize the limiter
+
+        Args:
+            requests_per_minute: Request limit, or None to learn it from headers
+            input_tokens_per_minute: Input token limit, or None to learn it from headers
+            output_tokens_per_minute: Output token limit, or None to learn it from headers
+            priorities: Rank per traffic class, lowest served first (DEFAULT_PRIORITIES if None)
+        """
+        self.buckets = {
+            "requests": TokenBucket(requests_per_minute),
+            "input-tokens": TokenBucket(input_tokens_per_minute),
+            "output-tokens": TokenBucket(output_tokens_per_minute)
+        }
+        self.priorities = dict(DEFAULT_PRIORITIES if priorities is None else priorities)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._waiters: List[_Waiter] = []
+        self._order = itertools.count()
+        self._acquired = 0
+        self._throttled = 0
+        self._total_wait = 0.0
+
+    def _enter(self, input_tokens: int, output_tokens: int, priority: Optional[str]) -> _Waiter:
+        """Join the line for capacity"""
+        priority = priority or current_traffic_class()
+        rank = self.priorities.get(priority, max(self.priorities.values(), default=0))
+        amounts = {"requests": 1, "input-tokens": input_tokens, "output-tokens": output_tokens}
+        with self._lock:
+            waiter = _Waiter(rank, next(self._order), amounts)
+            self._waiters.append(waiter)
+        return waiter
+
+    def _poll(self, waiter: _Waiter) -> Optional[float]:
+        """
+        Give a waiter its capacity if it is first in line and the capacity is there (caller holds the lock)
+
+        Returns:
+            0.0 once taken, the seconds until it is covered for the first in
+            line, or None while others go first
+        """
+        if min(self._waiters) is not waiter:
+            return None
+        wait = max(self.buckets[name].shortfall(amount) for name, amount in waiter.amounts.items())
+        if wait > 0:
+            return wait
+        for name, amount in waiter.amounts.items():
+            self.buckets[name].take(amount)
+        self._waiters.remove(waiter)
+        self._changed.notify_all()
+        return 0.0
+
+    def _next_check(self, waiter: _Waiter, until: Optional[float], poll: float) -> Optional[float]:
+        """
+        Seconds to sleep before polling again, or None once the capacity is taken (caller holds the lock)
+
+        Raises:
+            DeadlineExceeded: If the capacity cannot be had before ``until``
+        """
+        wait = self._poll(waiter)
+        if wait == 0.0:
+            return None
+        left = None if until is None else until - time.monotonic()
+        if left is not None and (left <= 0 or (wait is not None and wait > left)):
+            raise DeadlineExceeded("rate limit wait")
+        return min(delay for delay in (wait, left, poll) if delay is not None)
+
+    def _leave(self, waiter: _Waiter):
+        """Leave the line without capacity"""
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._changed.notify_all()
+
+    def _granted(self, waiter: _Waiter, waited: Optional[float]) -> Dict[str, Any]:
+        """Record a granted request and return its reservation"""
+        with self._lock:
+            self._acquired += 1
+            if waited is not None:
+                self._throttled += 1
+                self._total_wait += waited
+        return dict(waiter.amounts, wait=waited or 0.0)
+
+    def acquire(self, input_tokens: int, output_tokens: int, max_wait: Optional[float] = None,
+                priority: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Block until a request of this size fits within the limits and its turn has come
+
+        Args:
+            input_tokens: Estimated input tokens
+            output_tokens: Output tokens requested (max_tokens)
+            max_wait: Longest acceptable wait in seconds, or None for no limit
+            priority: Traffic class (the caller's current class by default)
+
+        Returns:
+            Reservation to pass to record_usage or release
+
+        Raises:
+            DeadlineExceeded: If the request cannot be let through within max_wait
+        """
+        waiter = self._enter(input_tokens, output_tokens, priority)
+        started = time.monotonic()
+        until = None if max_wait is None else started + max_wait
+        waited = None
+        try:
+            with self._lock:
+                while True:
+                    delay = self._next_check(waiter, until, self.POLL_INTERVAL)
+                    if delay is None:
+                        break
+                    self._changed.wait(delay)
+                    waited = time.monotonic() - started
+        except BaseException:
+            self._leave(waiter)
+            raise
+        return self._granted(waiter, waited)
+
+    async def acquire_async(self, input_tokens: int, output_tokens: int,
+                            max_wait: Optional[float] = None, priority: Optional[str] = None) -> Dict[str, Any]:
+        """asyncio version of acquire"""
+        waiter = self._enter(input_tokens, output_tokens, priority)
+        started = time.monotonic()
+        until = None if max_wait is None else started + max_wait
+        waited = None
+        try:
+            while True:
+                # Poll rather than block the event loop on the condition
+                with self._lock:
+                    delay = self._next_check(waiter, until, self.ASYNC_POLL_INTERVAL)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+                waited = time.monotonic() - started
+        except BaseException:
+            # Cancelled or out of time
+            self._leave(waiter)
+            raise
+        return self._granted(waiter, waited)
+
+    def record_usage(self, reservation: Dict[str, Any], usage: Any):
+        """
+        Correct a reservation with the actual token usage
+
+        Args:
+            reservation: Value returned by acquire
+            usage: ``response.usage`` from the Messages API
+        """
+        for name, attribute in (("input-tokens", "input_tokens"), ("output-tokens", "output_tokens")):
+            actual = getattr(usage, attribute, None)
+            if isinstance(actual, int):
+                self.buckets[name].refund(reservation[name] - actual)
+
+    def release(self, reservation: Dict[str, Any]):
+        """Return the output tokens of a request that failed before generating anything"""
+        self.buckets["output-tokens"].refund(reservation["output-tokens"])
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """
+        Update limits from ``anthropic-ratelimit-*`` response headers
+
+        Args:
+            headers: HTTP response headers
+        """
+        for name in self.BUCKET_NAMES:
+            limit = _parse_number(headers.get(f"{self.HEADER_PREFIX}{name}-limit"))
+            remaining = _parse_number(headers.get(f"{self.HEADER_PREFIX}{name}-remaining"))
+            if limit is not None or remaining is not None:
+                self.buckets[name].update(per_minute=limit, remaining=remaining)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter statistics"""
+        with self._lock:
+            stats = {
+                "acquired": self._acquired,
+                "throttled": self._throttled,
+                "waiting": len(self._waiters),
+                "total_wait_seconds": round(self._total_wait, 3)
+            }
+        for name, bucket in self.buckets.items():
+            key = name.replace("-", "_")
+            stats[f"{key}_per_minute"] = bucket.per_minute
+            stats[f"{key}_available"] = round(bucket.level, 1) if bucket.per_minute else None
+        return stats
+
+
+def _parse_number(value: Optional[str]) -> Optional[float]:
+    """Parse a numeric header value, ignoring anything malformed"""
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """Get the process-wide rate limiter, creating an unconfigured one if needed"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def configure_rate_limiter(**kwargs) -> RateLimiter:
+    """
+    Replace the process-wide rate limiter
+
+    Args:
+        **kwargs: Limits accepted by RateLimiter
+
+    Returns:
+        The new process-wide limiter
+    """
+    global _limiter
+    with _limiter_lock:
+        _limiter = RateLimiter(**kwargs)
+        return _limiter
+
+
+def reset_rate_limiter():
+    """Drop the process-wide rate limiter"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = None
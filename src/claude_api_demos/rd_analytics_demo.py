@@ -9,15 +9,22 @@ Specialized demonstrations for Research & Development engineers focusing on:
 - Technical report generation
 """
 
-import os
 import json
 import csv
 import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union
-import anthropic
+from typing import Callable, Dict, List, Any, Optional, Union
 from anthropic.types import TextBlock
 
+from .client_pool import get_shared_client
+from .continuation import create_complete_message
+from .cost_tracker import CostTracker
+from .deadline import PARTIAL_FLAG, deadline_scope, expired, is_partial, with_deadline
+from .messaging import create_message
+
+# Seconds the demo pipeline may take from the first step to the last
+PIPELINE_DEADLINE = 90.0
+
 
 def extract_text_from_content(content_blocks):
     """
@@ -30,86 +37,6 @@ def extract_text_from_content(content_blocks):
     return "No text content found in response"
 
 
-class CostTracker:
-    """
-    Track and calculate costs for Claude API usage
-    Pricing as of Claude 3.5 Sonnet (20241022) - Update as needed
-    """
-    
-    # Pricing per 1M tokens (as of latest pricing)
-    PRICING = {
-        "claude-3-5-sonnet-20241022": {
-            "input": 3.00,   # $3.00 per 1M input tokens
-            "output": 15.00  # $15.00 per 1M output tokens
-        },
-        "claude-3-5-haiku-20241022": {
-            "input": 0.25,   # $0.25 per 1M input tokens
-            "output": 1.25   # $1.25 per 1M output tokens
-        },
-        "claude-3-opus-20240229": {
-            "input": 15.00,  # $15.00 per 1M input tokens
-            "output": 75.00  # $75.00 per 1M output tokens
-        }
-    }
-    
-    def __init__(self):
-        self.total_input_tokens = 0
-        self.total_output_tokens = 0
-        self.total_cost = 0.0
-        self.api_calls = []
-    
-    def track_usage(self, model: str, input_tokens: int, output_tokens: int, operation: str = "unknown"):
-        """Track token usage and calculate cost for an API call"""
-        if model not in self.PRICING:
-            print(f"⚠️ Warning: Pricing not available for model {model}")
-            return 0.0
-        
-        pricing = self.PRICING[model]
-        input_cost = (input_tokens / 1_000_000) * pricing["input"]
-        output_cost = (output_tokens / 1_000_000) * pricing["output"]
-        call_cost = input_cost + output_cost
-        
-        # Track totals
-        self.total_input_tokens += input_tokens
-        self.total_output_tokens += output_tokens
-        self.total_cost += call_cost
-        
-        # Record individual call
-        call_record = {
-            "timestamp": datetime.datetime.now().isoformat(),
-            "operation": operation,
-            "model": model,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "input_cost": round(input_cost, 6),
-            "output_cost": round(output_cost, 6),
-            "total_cost": round(call_cost, 6)
-        }
-        self.api_calls.append(call_record)
-        
-        return call_cost
-    
-    def get_summary(self) -> Dict[str, Any]:
-        """Get cost summary"""
-        return {
-            "total_api_calls": len(self.api_calls),
-            "total_input_tokens": self.total_input_tokens,
-            "total_output_tokens": self.total_output_tokens,
-            "total_tokens": self.total_input_tokens + self.total_output_tokens,
-            "total_cost": round(self.total_cost, 6),
-            "average_cost_per_call": round(self.total_cost / len(self.api_calls), 6) if self.api_calls else 0,
-            "calls": self.api_calls
-        }
-    
-    def print_call_summary(self, operation: str, cost: float, input_tokens: int, output_tokens: int):
-        """Print a formatted summary of the API call cost"""
-        print(f"💰 Cost Summary for {operation}:")
-        print(f"   Input tokens: {input_tokens:,} (${(input_tokens/1_000_000)*3.00:.6f})")
-        print(f"   Output tokens: {output_tokens:,} (${(output_tokens/1_000_000)*15.00:.6f})")
-        print(f"   Total cost: ${cost:.6f}")
-        print(f"   Running total: ${self.total_cost:.6f}")
-
-
 class RDAnalyticsAssistant:
     """
     R&D Analytics Assistant powered by Claude API
@@ -117,7 +44,7 @@ class RDAnalyticsAssistant:
     """
     
     def __init__(self):
-        self.client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        self.client = get_shared_client()
         self.model = "claude-3-5-sonnet-20241022"
         self.results_log = []
         self.session_id = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -146,6 +73,7 @@ class RDAnalyticsAssistant:
         self.info_th_dir = self.info_dir / "th"
         self.info_th_dir.mkdir(exist_ok=True)
 
+    @with_deadline
     def analyze_experimental_data(self, data: Union[str, Dict, List], 
                                 context: str = "", 
                                 analysis_type: str = "general") -> Dict[str, Any]:
@@ -187,9 +115,10 @@ class RDAnalyticsAssistant:
         """
         
         try:
-            response = self.client.messages.create(
+            response = create_message(
+                self.client,
                 model=self.model,
-                max_tokens=4000,
+                task="report",
                 messages=[{"role": "user", "content": prompt}]
             )
             
@@ -237,6 +166,7 @@ class RDAnalyticsAssistant:
             print(f"❌ {error_msg}")
             return {"error": error_msg, "timestamp": datetime.datetime.now().isoformat()}
 
+    @with_deadline
     def interpret_results(self, results: Dict[str, Any], 
                          hypothesis: str = "", 
                          success_criteria: str = "") -> Dict[str, Any]:
@@ -270,9 +200,10 @@ class RDAnalyticsAssistant:
         """
         
         try:
-            response = self.client.messages.create(
+            response = create_message(
+                self.client,
                 model=self.model,
-                max_tokens=4000,
+                task="report",
                 messages=[{"role": "user", "content": prompt}]
             )
             
@@ -317,6 +248,7 @@ class RDAnalyticsAssistant:
             print(f"❌ {error_msg}")
             return {"error": error_msg, "timestamp": datetime.datetime.now().isoformat()}
 
+    @with_deadline
     def generate_decision_matrix(self, options: List[str], 
                                criteria: List[str], 
                                context: str = "") -> Dict[str, Any]:
@@ -351,9 +283,10 @@ class RDAnalyticsAssistant:
         """
         
         try:
-            response = self.client.messages.create(
+            response = create_message(
+                self.client,
                 model=self.model,
-                max_tokens=4000,
+                task="report",
                 messages=[{"role": "user", "content": prompt}]
             )
             
@@ -401,6 +334,7 @@ class RDAnalyticsAssistant:
             print(f"❌ {error_msg}")
             return {"error": error_msg, "timestamp": datetime.datetime.now().isoformat()}
 
+    @with_deadline
     def design_experiment(self, objective: str, 
                          variables: List[str], 
                          constraints: str = "",
@@ -438,9 +372,10 @@ class RDAnalyticsAssistant:
         """
         
         try:
-            response = self.client.messages.create(
+            response = create_message(
+                self.client,
                 model=self.model,
-                max_tokens=4000,
+                task="report",
                 messages=[{"role": "user", "content": prompt}]
             )
             
@@ -486,6 +421,7 @@ class RDAnalyticsAssistant:
             print(f"❌ {error_msg}")
             return {"error": error_msg, "timestamp": datetime.datetime.now().isoformat()}
 
+    @with_deadline
     def generate_technical_report(self, data: Dict[str, Any], 
                                 audience: str = "technical",
                                 report_type: str = "progress") -> Dict[str, Any]:
@@ -521,9 +457,11 @@ class RDAnalyticsAssistant:
         """
         
         try:
-            response = self.client.messages.create(
+            # Long reports are continued where they stop; usage covers every piece
+            response = create_complete_message(
+                self.client,
                 model=self.model,
-                max_tokens=4000,
+                task="report",
                 messages=[{"role": "user", "content": prompt}]
             )
             
@@ -571,6 +509,7 @@ class RDAnalyticsAssistant:
             print(f"❌ {error_msg}")
             return {"error": error_msg, "timestamp": datetime.datetime.now().isoformat()}
 
+    @with_deadline
     def track_project_metrics(self, metrics: Dict[str, Any], 
                             targets: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
@@ -605,9 +544,10 @@ class RDAnalyticsAssistant:
         """
         
         try:
-            response = self.client.messages.create(
+            response = create_message(
+                self.client,
                 model=self.model,
-                max_tokens=3000,
+                task="report",
                 messages=[{"role": "user", "content": prompt}]
             )
             
@@ -654,6 +594,7 @@ class RDAnalyticsAssistant:
             print(f"❌ {error_msg}")
             return {"error": error_msg, "timestamp": datetime.datetime.now().isoformat()}
 
+    @with_deadline
     def generate_multilingual_summary(self, session_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate summary reports in both English and Thai
@@ -711,9 +652,10 @@ class RDAnalyticsAssistant:
         try:
             # Generate English summary
             print("📝 Generating English summary...")
-            en_response = self.client.messages.create(
+            en_response = create_message(
+                self.client,
                 model=self.model,
-                max_tokens=4000,
+                task="report",
                 messages=[{"role": "user", "content": english_prompt}]
             )
             
@@ -738,9 +680,10 @@ class RDAnalyticsAssistant:
             
             # Generate Thai summary
             print("📝 Generating Thai summary...")
-            th_response = self.client.messages.create(
+            th_response = create_message(
+                self.client,
                 model=self.model,
-                max_tokens=4000,
+                task="report",
                 messages=[{"role": "user", "content": thai_prompt}]
             )
             
@@ -1040,12 +983,37 @@ class RDAnalyticsAssistant:
         return summary
 
 
-def demonstrate_rd_analytics():
-    """Demonstrate R&D Analytics capabilities"""
+def demonstrate_rd_analytics(deadline: Optional[float] = PIPELINE_DEADLINE) -> Dict[str, Any]:
+    """
+    Demonstrate R&D Analytics capabilities
+
+    Args:
+        deadline: Seconds for the whole pipeline, or None for no limit. Every
+            call gets only the time left, and steps that would start after
+            the deadline are skipped.
+
+    Returns:
+        Result of each step, with "deadline_exceeded" set if any was cut short
+    """
+    with deadline_scope(deadline):
+        return _run_rd_pipeline()
+
+
+def _run_rd_pipeline() -> Dict[str, Any]:
+    """Run the demo steps within the current deadline"""
     print("🔬 R&D Analytics Demo - Advanced Decision Support")
     print("=" * 70)
     
     rd = RDAnalyticsAssistant()
+    steps: Dict[str, Any] = {}
+
+    def step(name: str, run: Callable[[], Any]) -> Any:
+        if expired():
+            print(f"⏱️ Skipping {name}: pipeline deadline reached")
+            steps[name] = {"skipped": True, PARTIAL_FLAG: True}
+        else:
+            steps[name] = run()
+        return steps[name]
     
     # Demo 1: Analyze experimental data
     print("\n1️⃣ EXPERIMENTAL DATA ANALYSIS")
@@ -1056,11 +1024,11 @@ def demonstrate_rd_analytics():
         "reaction_time": [2.5, 2.3, 2.1, 2.0, 2.2]  # hours
     }
     
-    analysis = rd.analyze_experimental_data(
+    analysis = step("analysis", lambda: rd.analyze_experimental_data(
         data=sample_data,
         context="Optimization of synthesis reaction conditions for new pharmaceutical compound",
         analysis_type="optimization"
-    )
+    ))
     
     # Demo 2: Interpret results
     print("\n2️⃣ RESULTS INTERPRETATION")
@@ -1072,11 +1040,11 @@ def demonstrate_rd_analytics():
         "quality_score": 9.2
     }
     
-    interpretation = rd.interpret_results(
+    interpretation = step("interpretation", lambda: rd.interpret_results(
         results=results,
         hypothesis="Optimal temperature around 40°C will maximize both yield and purity",
         success_criteria="Yield >85%, Purity >95%, Cost <$20K per batch"
-    )
+    ))
     
     # Demo 3: Decision matrix
     print("\n3️⃣ DECISION MATRIX GENERATION")
@@ -1095,20 +1063,20 @@ def demonstrate_rd_analytics():
         "Scalability potential"
     ]
     
-    decision_matrix = rd.generate_decision_matrix(
+    decision_matrix = step("decision_matrix", lambda: rd.generate_decision_matrix(
         options=options,
         criteria=criteria,
         context="Next phase decision for pharmaceutical synthesis project"
-    )
+    ))
     
     # Demo 4: Design new experiment
     print("\n4️⃣ EXPERIMENTAL DESIGN")
-    experiment = rd.design_experiment(
+    experiment = step("experiment", lambda: rd.design_experiment(
         objective="Validate scalability of optimized process from lab to pilot scale",
         variables=["Temperature", "Pressure", "Flow rate", "Catalyst concentration"],
         constraints="Pilot plant available for 2 weeks, safety temperature limit 60°C",
         budget="$100K for pilot testing"
-    )
+    ))
     
     # Demo 5: Track project metrics
     print("\n5️⃣ PROJECT METRICS TRACKING")
@@ -1130,7 +1098,7 @@ def demonstrate_rd_analytics():
         "risk_score": 3.0
     }
     
-    metrics_analysis = rd.track_project_metrics(metrics=metrics, targets=targets)
+    metrics_analysis = step("metrics", lambda: rd.track_project_metrics(metrics=metrics, targets=targets))
     
     # Demo 6: Generate technical report
     print("\n6️⃣ TECHNICAL REPORT GENERATION")
@@ -1144,11 +1112,11 @@ def demonstrate_rd_analytics():
         "metrics": metrics_analysis
     }
     
-    technical_report = rd.generate_technical_report(
+    step("technical_report", lambda: rd.generate_technical_report(
         data=report_data,
         audience="executive",
         report_type="progress"
-    )
+    ))
     
     # Session summary
     print("\n7️⃣ SESSION SUMMARY")
@@ -1156,7 +1124,7 @@ def demonstrate_rd_analytics():
     
     # Generate multilingual summary
     print("\n8️⃣ MULTILINGUAL SUMMARY GENERATION")
-    multilingual_summary = rd.generate_multilingual_summary(session_summary)
+    step("multilingual_summary", lambda: rd.generate_multilingual_summary(session_summary))
     
     print(f"\n🎉 R&D Analytics Demo Complete!")
     print(f"📁 All outputs saved to: {rd.output_dir}")
@@ -1170,6 +1138,13 @@ def demonstrate_rd_analytics():
     print(f"   Total cost: ${final_cost['total_cost']:.6f}")
     print(f"   💡 Cost per operation: ${final_cost['average_cost_per_call']:.6f}")
 
+    skipped = [name for name, result in steps.items() if isinstance(result, dict) and result.get("skipped")]
+    if skipped:
+        print(f"⏱️ Deadline reached; skipped: {', '.join(skipped)}")
+    if any(is_partial(result) for result in steps.values()):
+        steps[PARTIAL_FLAG] = True
+    return steps
+
 
 def main():
     """Main function to run R&D Analytics demonstration"""
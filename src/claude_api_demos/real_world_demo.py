@@ -3,20 +3,23 @@ Real-world use case demonstrations
 Showing practical applications like the DataCamp tutorial
 """
 
-import anthropic
-import os
 import json
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from .client_pool import get_shared_client
+from .continuation import create_complete_message
+from .deadline import with_deadline
+from .messaging import create_message
+from .model_router import get_shared_router
+
 class RealWorldClaudeDemo:
     """Demonstrate real-world applications of Claude API"""
     
     def __init__(self, api_key: Optional[str] = None):
-        self.client = anthropic.Anthropic(
-            api_key=api_key or os.getenv("ANTHROPIC_API_KEY")
-        )
+        self.client = get_shared_client(api_key)
     
+    @with_deadline
     def code_documentation_generator(self, code: str, style: str = "google") -> str:
         """
         Generate comprehensive documentation for code
@@ -42,15 +45,18 @@ class RealWorldClaudeDemo:
         """
         
         try:
-            response = self.client.messages.create(
+            # Documented code is long; continue instead of returning it cut off
+            response = create_complete_message(
+                self.client,
                 model="claude-3-5-sonnet-20241022",
-                max_tokens=2000,
+                task="code",
                 messages=[{"role": "user", "content": prompt}]
             )
             return response.content[0].text
         except Exception as e:
             return f"Error generating documentation: {e}"
     
+    @with_deadline
     def api_client_builder(self, api_description: str) -> str:
         """
         Build a complete API client based on description
@@ -74,15 +80,17 @@ class RealWorldClaudeDemo:
         """
         
         try:
-            response = self.client.messages.create(
+            response = create_complete_message(
+                self.client,
                 model="claude-3-5-sonnet-20241022",
-                max_tokens=3000,
+                task="code",
                 messages=[{"role": "user", "content": prompt}]
             )
             return response.content[0].text
         except Exception as e:
             return f"Error building API client: {e}"
     
+    @with_deadline
     def bug_reporter_and_fixer(self, code: str, error_message: str) -> Dict[str, str]:
         """
         Comprehensive bug analysis and fixing
@@ -122,16 +130,16 @@ class RealWorldClaudeDemo:
         
         try:
             # Get analysis
-            analysis_response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1500,
+            analysis_response = get_shared_router().send(
+                self.client,
+                task="explanation",
                 messages=[{"role": "user", "content": analysis_prompt}]
             )
             
             # Get fix
-            fix_response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1500,
+            fix_response = get_shared_router().send(
+                self.client,
+                task="code",
                 messages=[{"role": "user", "content": fix_prompt}]
             )
             
@@ -142,6 +150,7 @@ class RealWorldClaudeDemo:
         except Exception as e:
             return {"error": f"Error in bug analysis: {e}"}
     
+    @with_deadline
     def architecture_reviewer(self, project_structure: str) -> str:
         """
         Review project architecture and suggest improvements
@@ -164,9 +173,10 @@ class RealWorldClaudeDemo:
         """
         
         try:
-            response = self.client.messages.create(
+            response = create_message(
+                self.client,
                 model="claude-3-5-sonnet-20241022",
-                max_tokens=2000,
+                task="analysis",
                 messages=[{"role": "user", "content": prompt}]
             )
             return response.content[0].text
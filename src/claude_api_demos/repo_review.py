@@ -0,0 +1,210 @@
+"""
+Repository-wide code review support
+Find the Python files to review and keep per-file results in a resumable store
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from .batches import open_jsonl_for_append
+
+# Directories and files skipped unless the caller passes its own exclude patterns
+DEFAULT_EXCLUDE = (
+    ".git", ".hg", ".svn", ".tox", ".nox", ".venv", "venv", "env", "node_modules", "__pycache__",
+    ".mypy_cache", ".pytest_cache", "build", "dist", "*.egg-info", ".claude_reviews",
+)
+DEFAULT_INCLUDE = ("*.py",)
+
+
+def _matches(relative: str, name: str, patterns: Sequence[str]) -> bool:
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative, pattern) for pattern in patterns)
+
+
+def find_python_files(root: Union[str, Path],
+                      include: Optional[Sequence[str]] = None,
+                      exclude: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    List the files under a directory that should be reviewed
+
+    Patterns are globs matched against a file or directory name and against
+    its path relative to ``root``. Excluded directories are not descended
+    into, which keeps large trees (virtualenvs, node_modules) cheap to skip.
+
+    Args:
+        root: Directory to search
+        include: Patterns a file must match (DEFAULT_INCLUDE if None)
+        exclude: Patterns for files and directories to skip (DEFAULT_EXCLUDE if None)
+
+    Returns:
+        Sorted paths relative to ``root``, with forward slashes
+    """
+    root = Path(root)
+    include = DEFAULT_INCLUDE if include is None else include
+    exclude = DEFAULT_EXCLUDE if exclude is None else exclude
+    found = []
+    for directory, dirnames, filenames in os.walk(root):
+        base = Path(directory).relative_to(root).as_posix()
+        prefix = "" if base == "." else base + "/"
+        dirnames[:] = sorted(name for name in dirnames if not _matches(prefix + name, name, exclude))
+        for name in filenames:
+            relative = prefix + name
+            if _matches(relative, name, include) and not _matches(relative, name, exclude):
+                found.append(relative)
+    return sorted(found)
+
+
+def file_hash(path: Union[str, Path]) -> str:
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def run_git(root: Union[str, Path], *args: str) -> str:
+    """
+    Run a git command in ``root`` and return its output
+
+    Raises:
+        RuntimeError: If git is missing or the command fails
+    """
+    try:
+        completed = subprocess.run(["git", "-C", str(root), *args], capture_output=True, text=True, check=True)
+    except FileNotFoundError:
+        raise RuntimeError("git is not installed") from None
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"git {' '.join(args)} failed: {e.stderr.strip()}") from None
+    return completed.stdout
+
+
+def changed_files(root: Union[str, Path], base_ref: str) -> Set[str]:
+    """
+    Files under ``root`` that differ from a git ref, plus untracked files
+
+    Args:
+        root: Directory inside a git work tree
+        base_ref: Commit, branch or tag to compare the working tree with
+
+    Returns:
+        Paths relative to ``root`` (deleted files included, as git lists them)
+
+    Raises:
+        RuntimeError: If git is missing or the diff fails
+    """
+    changed = set(run_git(root, "diff", "--name-only", "--relative", base_ref, "--").splitlines())
+    changed.update(run_git(root, "ls-files", "--others", "--exclude-standard").splitlines())
+    changed.discard("")
+    return changed
+
+
+def review_failed(results: Dict[str, Any]) -> bool:
+    """Whether a code_review_and_refactor result has an error for the file or any pass"""
+    return "error" in results or any(isinstance(text, str) and text.startswith("Error:")
+                                     for text in results.values())
+
+
+class ReviewStore:
+    """
+    Append-only JSONL file of per-file review results.
+
+    Each reviewed file is appended as one line and flushed as soon as it
+    finishes, so the store is also the checkpoint: a run that is interrupted
+    can be started again and skips every file that already has a successful
+    record. Later records for a path replace earlier ones, and a last line
+    cut off by a crash is ignored.
+
+    Successful records that carry ``content_hash``, ``prompt_version`` and
+    ``model`` are also indexed by those three values, so a file whose
+    content was reviewed before with the same prompts and model (under any
+    path) can be served without another request.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Initialize the store, reading any records already in the file
+
+        Args:
+            path: JSONL file to append to (created with its directory if missing)
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._index: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._keep(record)
+
+    def _keep(self, record: Dict[str, Any]):
+        """Make a record the latest for its path and index it (caller holds the lock or is __init__)"""
+        self._records[record["path"]] = record
+        key = (record.get("content_hash"), record.get("prompt_version"), record.get("model"))
+        if not record.get("failed") and None not in key:
+            self._index[key] = record
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        """Latest record for a relative path, if there is one"""
+        with self._lock:
+            return self._records.get(path)
+
+    def lookup(self, content_hash: str, prompt_version: str, model: str) -> Optional[Dict[str, Any]]:
+        """Latest successful record for this content, prompt version and model, under any path"""
+        with self._lock:
+            return self._index.get((content_hash, prompt_version, model))
+
+    def completed(self) -> Set[str]:
+        """Paths whose latest review succeeded"""
+        with self._lock:
+            return {path for path, record in self._records.items() if not record.get("failed")}
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Latest record of every path, sorted by path"""
+        with self._lock:
+            return [self._records[path] for path in sorted(self._records)]
+
+    def add(self, path: str, results: Dict[str, str], **fields) -> Dict[str, Any]:
+        """
+        Append the review of one file
+
+        Args:
+            path: File path relative to the reviewed root
+            results: code_review_and_refactor result for the file
+            **fields: Extra values to keep with the record (timing, usage)
+
+        Returns:
+            The stored record
+        """
+        record = {
+            "path": path,
+            "results": results,
+            "failed": review_failed(results),
+            "reviewed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **fields
+        }
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open_jsonl_for_append(self.path) as f:
+                f.write(line + "\n")
+                f.flush()
+            self._keep(record)
+        return record
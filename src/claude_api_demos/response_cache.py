@@ -0,0 +1,192 @@
+"""
+Response cache for Claude API calls
+In-memory LRU tier backed by a size-capped on-disk tier with TTL
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+
+def request_cache_key(request: Dict[str, Any]) -> str:
+    """
+    Canonical hash of a Messages API request
+
+    Args:
+        request: Keyword arguments for messages.create (model, messages, max_tokens, ...)
+
+    Returns:
+        Hex SHA-256 digest that is identical for identical requests
+    """
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of API results keyed on the request hash.
+
+    Lookups hit the in-memory LRU first and fall back to one JSON file per
+    entry on disk. Entries older than ``ttl`` are treated as misses, and the
+    least recently used files are deleted once the directory exceeds
+    ``max_disk_bytes``. Values must be JSON-serializable.
+    """
+
+    def __init__(self,
+                 cache_dir: Union[str, Path] = ".claude_api_cache",
+                 memory_entries: int = 256,
+                 max_disk_bytes: int = 100 * 1024 * 1024,
+                 ttl: Optional[float] = 7 * 24 * 3600):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Directory for the on-disk tier
+            memory_entries: Maximum entries kept in memory
+            max_disk_bytes: Size cap for the on-disk tier
+            ttl: Seconds an entry stays valid, or None to never expire
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._disk_bytes = sum(path.stat().st_size for path in self.cache_dir.glob("*.json"))
+
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._writes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _is_fresh(self, created: float) -> bool:
+        return self.ttl is None or time.time() - created < self.ttl
+
+    def _remember(self, key: str, created: float, value: Any):
+        """Put an entry in the memory tier (caller holds the lock)"""
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value
+
+        Args:
+            key: Request hash from request_cache_key
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._is_fresh(entry[0]):
+                    self._memory.move_to_end(key)
+                    self._memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                self._misses += 1
+                return None
+
+            if not self._is_fresh(record["created"]):
+                self._expired += 1
+                self._misses += 1
+                self._delete(path)
+                return None
+
+            # Touch the file so disk eviction sees it as recently used
+            os.utime(path, None)
+            self._remember(key, record["created"], record["value"])
+            self._disk_hits += 1
+            return record["value"]
+
+    def set(self, key: str, value: Any):
+        """
+        Store a value in both tiers
+
+        Args:
+            key: Request hash from request_cache_key
+            value: JSON-serializable value to cache
+        """
+        created = time.time()
+        data = json.dumps({"created": created, "value": value}, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            self._remember(key, created, value)
+
+            path = self._path(key)
+            if path.exists():
+                self._delete(path)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._disk_bytes += len(data)
+            self._writes += 1
+            self._evict()
+
+    def _delete(self, path: Path):
+        """Remove a file from the disk tier (caller holds the lock)"""
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        self._disk_bytes -= size
+
+    def _evict(self):
+        """Delete least recently used files until under the size cap (caller holds the lock)"""
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        files = sorted(self.cache_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            self._memory.pop(path.stem, None)
+            self._delete(path)
+            self._evictions += 1
+
+    def clear(self):
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            for path in self.cache_dir.glob("*.json"):
+                self._delete(path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            lookups = hits + self._misses
+            return {
+                "hits": hits,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "writes": self._writes,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes
+            }
@@ -0,0 +1,255 @@
+"""
+Retry engine for Claude API calls
+Exponential backoff with full jitter, Retry-After support and per-call budgets
+"""
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import anthropic
+import httpx
+
+from .deadline import remaining
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+# and 529 "overloaded"
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """
+    Decide whether an error is transient
+
+    Args:
+        error: Exception raised by an API call
+
+    Returns:
+        A short reason such as "429" or "connection" for retryable errors,
+        or None for fatal ones
+    """
+    if isinstance(error, anthropic.APIStatusError):
+        status = error.status_code
+        if status in RETRYABLE_STATUS_CODES or status >= 500:
+            return str(status)
+        return None
+    if isinstance(error, anthropic.APITimeoutError):
+        return "timeout"
+    if isinstance(error, (anthropic.APIConnectionError, httpx.TransportError, ConnectionError)):
+        return "connection"
+    return None
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    Read the server's requested delay from retry-after headers
+
+    Args:
+        error: Exception raised by an API call
+
+    Returns:
+        Seconds to wait, or None if the server did not say
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return max(float(retry_after_ms) / 1000.0, 0.0)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after is None:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    parsed = email.utils.parsedate_tz(retry_after)
+    if parsed is None:
+        return None
+    return max(email.utils.mktime_tz(parsed) - time.time(), 0.0)
+
+
+class RetryPolicy:
+    """
+    Shared retry policy for Messages API calls.
+
+    Retryable errors (429, 529, 5xx, timeouts, connection resets) are retried
+    with exponential backoff and full jitter, or after the server's
+    ``retry-after`` delay when one is sent. That delay is waited in full:
+    if it does not fit in the call's time budget or the caller's deadline,
+    the error is raised instead of retrying early into another 429. Each
+    call has its own budget of attempts and total time, and no retry starts
+    that the caller's deadline leaves no time for; fatal errors are raised
+    immediately.
+    """
+
+    def __init__(self,
+                 max_attempts: int = 4,
+                 base_delay: float = 0.5,
+                 max_delay: float = 30.0,
+                 max_elapsed: float = 120.0):
+        """
+        Initialize the policy
+
+        Args:
+            max_attempts: Attempts per call, including the first one
+            base_delay: Backoff before the first retry, doubled on each retry
+            max_delay: Upper bound for a single jittered backoff (not for retry-after)
+            max_elapsed: Per-call time budget; no retry starts after it is spent
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._retries = 0
+        self._recovered = 0
+        self._exhausted = 0
+        self._fatal = 0
+        self._reasons: Dict[str, int] = {}
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """
+        Delay before the next attempt
+
+        Args:
+            attempt: Number of attempts made so far (1 after the first failure)
+            error: The error that caused the retry
+
+        Returns:
+            Seconds to sleep: the server's retry-after if it sent one, else a jittered backoff
+        """
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def _next_delay(self, attempt: int, error: Exception, started: float) -> Optional[float]:
+        """Record a failure and return how long to wait, or None to give up"""
+        reason = classify_error(error)
+        with self._lock:
+            if reason is None:
+                self._fatal += 1
+                return None
+            delay = self.backoff(attempt, error)
+            left = remaining()
+            if (attempt >= self.max_attempts or time.monotonic() - started + delay > self.max_elapsed
+                    or (left is not None and delay >= left)):
+                self._exhausted += 1
+                return None
+            self._retries += 1
+            self._reasons[reason] = self._reasons.get(reason, 0) + 1
+            return delay
+
+    def _succeeded(self, attempt: int):
+        """Record a successful attempt"""
+        if attempt > 1:
+            with self._lock:
+                self._recovered += 1
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """
+        Run fn, retrying transient failures
+
+        Args:
+            fn: Zero-argument callable that performs one attempt
+
+        Returns:
+            The first successful result
+        """
+        with self._lock:
+            self._calls += 1
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._succeeded(attempt)
+            return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """asyncio version of call"""
+        with self._lock:
+            self._calls += 1
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = await fn()
+            except Exception as e:
+                delay = self._next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._succeeded(attempt)
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get retry statistics"""
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "retries": self._retries,
+                "recovered_calls": self._recovered,
+                "exhausted_calls": self._exhausted,
+                "fatal_errors": self._fatal,
+                "retries_by_reason": dict(self._reasons)
+            }
+
+
+_policy: Optional[RetryPolicy] = None
+_policy_lock = threading.Lock()
+
+
+def get_shared_retry_policy() -> RetryPolicy:
+    """Get the process-wide retry policy, creating it with defaults if needed"""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = RetryPolicy()
+        return _policy
+
+
+def configure_retry_policy(**kwargs) -> RetryPolicy:
+    """
+    Replace the process-wide retry policy
+
+    Args:
+        **kwargs: Settings accepted by RetryPolicy
+
+    Returns:
+        The new process-wide policy
+    """
+    global _policy
+    with _policy_lock:
+        _policy = RetryPolicy(**kwargs)
+        return _policy
+
+
+def reset_retry_policy():
+    """Drop the process-wide retry policy"""
+    global _policy
+    with _policy_lock:
+        _policy = None
@@ -0,0 +1,132 @@
+"""
+Code review benchmark
+Compare the latency and cost of one request per review pass with a single structured request
+"""
+
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from .advanced_demo import AdvancedClaudeDemo
+from .cost_tracker import CostTracker
+
+# Small, medium and large modules written for the benchmark, kept in the
+# source checkout so results stay comparable from one commit to the next
+SAMPLE_DIR = Path(__file__).resolve().parents[2] / "benchmarks" / "review_sample"
+DEFAULT_SAMPLE = [SAMPLE_DIR / name for name in ("small_settings.py", "medium_inventory.py", "large_jobs.py")]
+
+# Prompt cache writes and reads, as multiples of the model's input price
+CACHE_WRITE_PRICE = 1.25
+CACHE_READ_PRICE = 0.1
+
+MODES = {"multi-call": False, "single-call": True}
+
+
+def review_cost(model: str, usage: Dict[str, int]) -> float:
+    """
+    Price the token usage of a review
+
+    Args:
+        model: Model the review ran on
+        usage: AdvancedClaudeDemo.last_review_usage
+
+    Returns:
+        Cost in dollars (0.0 for models without known pricing)
+    """
+    pricing = CostTracker.PRICING.get(model)
+    if pricing is None:
+        return 0.0
+    input_tokens = (usage.get("input_tokens", 0)
+                    + usage.get("cache_creation_input_tokens", 0) * CACHE_WRITE_PRICE
+                    + usage.get("cache_read_input_tokens", 0) * CACHE_READ_PRICE)
+    return (input_tokens * pricing["input"] + usage.get("output_tokens", 0) * pricing["output"]) / 1_000_000
+
+
+def run_benchmark(files: Optional[Sequence[Path]] = None, runs: int = 1,
+                  demo: Optional[AdvancedClaudeDemo] = None) -> List[Dict[str, Any]]:
+    """
+    Review each file in both modes and measure them
+
+    Both modes send the code as the same cached prefix, so whichever mode
+    runs second on a file may read it from the prompt cache. Successive runs
+    alternate which mode goes first to even this out.
+
+    Args:
+        files: Python files to review (DEFAULT_SAMPLE if None)
+        runs: Reviews per file and mode
+        demo: Demo to review with (a new one on the shared client if None)
+
+    Returns:
+        One result per file, mode and run
+    """
+    demo = demo or AdvancedClaudeDemo()
+    results = []
+    for path in files or DEFAULT_SAMPLE:
+        for run in range(runs):
+            modes = list(MODES.items())
+            for mode, single_call in (modes if run % 2 == 0 else modes[::-1]):
+                started = time.perf_counter()
+                sections = demo.code_review_and_refactor(str(path), single_call=single_call)
+                elapsed = time.perf_counter() - started
+                usage = dict(demo.last_review_usage)
+                if "error" in sections:
+                    errors = len(demo.REVIEW_PASSES)
+                else:
+                    errors = sum(1 for text in sections.values() if text.startswith("Error"))
+                results.append({
+                    "file": Path(path).name,
+                    "mode": mode,
+                    "run": run,
+                    "seconds": round(elapsed, 3),
+                    "requests": usage.get("requests", 0),
+                    "input_tokens": (usage.get("input_tokens", 0) + usage.get("cache_creation_input_tokens", 0)
+                                     + usage.get("cache_read_input_tokens", 0)),
+                    "output_tokens": usage.get("output_tokens", 0),
+                    "cost": round(review_cost(demo.REVIEW_MODEL, usage), 6),
+                    "errors": errors
+                })
+    return results
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Average seconds, input tokens and cost per mode"""
+    summary = {}
+    for mode in MODES:
+        rows = [result for result in results if result["mode"] == mode]
+        if not rows:
+            continue
+        summary[mode] = {
+            "reviews": len(rows),
+            "average_seconds": round(sum(row["seconds"] for row in rows) / len(rows), 3),
+            "average_input_tokens": round(sum(row["input_tokens"] for row in rows) / len(rows)),
+            "average_cost": round(sum(row["cost"] for row in rows) / len(rows), 6)
+        }
+    return summary
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Render benchmark results as a text table"""
+    lines = [f"{'File':<24}{'Mode':<13}{'Seconds':>9}{'Reqs':>6}{'In tok':>9}{'Out tok':>9}{'Cost $':>10}{'Errs':>6}"]
+    for result in results:
+        lines.append(f"{result['file']:<24}{result['mode']:<13}{result['seconds']:>9.2f}{result['requests']:>6}"
+                     f"{result['input_tokens']:>9}{result['output_tokens']:>9}{result['cost']:>10.4f}"
+                     f"{result['errors']:>6}")
+    for mode, row in summarize(results).items():
+        lines.append(f"{'average':<24}{mode:<13}{row['average_seconds']:>9.2f}{'':>6}"
+                     f"{row['average_input_tokens']:>9}{'':>9}{row['average_cost']:>10.4f}")
+    return "\n".join(lines)
+
+
+def main():
+    """Run the review benchmark on the default sample and print the results"""
+    print("🧪 Code review benchmark: one request per pass vs one structured request")
+    print("=" * 60)
+    missing = [path for path in DEFAULT_SAMPLE if not path.exists()]
+    if missing:
+        print(f"❌ Sample files not found under {SAMPLE_DIR}; run the benchmark from a source checkout")
+        return
+    print(format_results(run_benchmark()))
+
+
+if __name__ == "__main__":
+    main()
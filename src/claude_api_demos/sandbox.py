@@ -0,0 +1,313 @@
+"""
+Sandboxed execution of generated tests
+Pull test code out of a model response and run it with pytest in isolated, resource-limited subprocesses
+"""
+
+import ast
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Module the function under test is written to, and the generated test file
+MODULE_NAME = "function_under_test"
+TEST_MODULE = "test_generated"
+
+CODE_BLOCK = re.compile(r"```(?:python|py)?[ \t]*\n(.*?)```", re.DOTALL)
+
+# Runs in the child: applies the limits to itself, then hands over to pytest.
+# Each test gets its own CPU timer, so a runaway test fails alone; the rlimits
+# are a backstop for the whole run. Limits are set here rather than with
+# preexec_fn, which is not safe while other threads of the parent are running.
+_BOOTSTRAP = """
+import signal
+import sys
+try:
+    import resource
+except ImportError:
+    resource = None
+import pytest
+
+cpu, total_cpu, memory = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+if resource is not None:
+    for limit, value in ((resource.RLIMIT_CPU, total_cpu), (resource.RLIMIT_AS, memory), (resource.RLIMIT_CORE, 0)):
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass
+
+
+class CpuLimit:
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        signal.setitimer(signal.ITIMER_PROF, cpu)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+def cpu_exceeded(signum, frame):
+    raise TimeoutError(f"test used more than {cpu}s of CPU time")
+
+
+plugins = []
+if hasattr(signal, "setitimer"):
+    signal.signal(signal.SIGPROF, cpu_exceeded)
+    plugins.append(CpuLimit())
+sys.exit(pytest.main(sys.argv[4:], plugins=plugins))
+"""
+
+# Environment variables passed on to the tests; everything else (API keys included) is left out
+SANDBOX_ENV = ("PATH", "SYSTEMROOT", "LANG", "LC_ALL", "TMPDIR", "TEMP", "TMP")
+
+
+class SandboxLimits:
+    """
+    Resource limits of one sandboxed pytest run.
+
+    Each test may use ``cpu_seconds`` of CPU time before it fails, and the
+    run may map ``memory_mb`` of memory (an allocation past it raises
+    MemoryError in the test). Both need the ``resource`` and timer support
+    of POSIX systems; the wall-clock limit is enforced by the parent
+    everywhere, and kills the run's whole process group.
+    """
+
+    def __init__(self, cpu_seconds: int = 10, memory_mb: int = 1024, wall_seconds: float = 30.0):
+        """
+        Initialize the limits
+
+        Args:
+            cpu_seconds: CPU seconds each test may use
+            memory_mb: Address space the run may map, in MiB
+            wall_seconds: Seconds before the run is killed
+        """
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.wall_seconds = wall_seconds
+
+
+def extract_code_blocks(text: str) -> List[str]:
+    """
+    Python code blocks of a markdown response
+
+    Args:
+        text: Model response
+
+    Returns:
+        The contents of the ```python (or unlabeled) blocks in order; the
+        whole text if it has no blocks but parses as Python, otherwise nothing
+    """
+    blocks = [block.strip("\n") + "\n" for block in CODE_BLOCK.findall(text) if block.strip()]
+    if blocks:
+        return blocks
+    try:
+        ast.parse(text)
+    except SyntaxError:
+        return []
+    return [text] if text.strip() else []
+
+
+def build_test_module(response: str) -> str:
+    """
+    Turn a test generation response into a test module
+
+    The code blocks are joined in order, and the function under test is
+    imported from MODULE_NAME unless the code already does so.
+
+    Returns:
+        Module source, or "" if the response holds no code
+    """
+    blocks = extract_code_blocks(response)
+    if not blocks:
+        return ""
+    code = "\n\n".join(blocks)
+    if MODULE_NAME not in code:
+        code = f"from {MODULE_NAME} import *  # noqa: F401,F403\n\n{code}"
+    return code
+
+
+def _test_id(case: ET.Element) -> str:
+    """pytest-style id of a junit testcase: ``Class::name`` or ``name``"""
+    classname = case.get("classname", "")
+    owner = classname[len(TEST_MODULE) + 1:] if classname.startswith(TEST_MODULE + ".") else ""
+    return f"{owner}::{case.get('name')}" if owner else case.get("name", "")
+
+
+def _read_report(path: Path) -> Dict[str, Dict[str, str]]:
+    tests: Dict[str, Dict[str, str]] = {}
+    for case in ET.parse(path).getroot().iter("testcase"):
+        outcome, message = "passed", ""
+        for tag in ("failure", "error", "skipped"):
+            found = case.find(tag)
+            if found is not None:
+                outcome = {"failure": "failed", "error": "error", "skipped": "skipped"}[tag]
+                message = (found.get("message") or found.text or "").strip()[:2000]
+                break
+        tests[_test_id(case)] = {"outcome": outcome, "message": message}
+    return tests
+
+
+def run_isolated(command: List[str], directory: str, timeout: float,
+                 input: Optional[str] = None, merge_output: bool = True) -> Tuple[Optional[int], str, str, bool]:
+    """
+    Run a command on untrusted code inside a scratch directory
+
+    The command runs with ``directory`` as its working directory and home,
+    only the SANDBOX_ENV variables, and (on POSIX) in its own process
+    group, which is killed when the command exits or times out so nothing
+    it started outlives it.
+
+    Args:
+        command: Command line to run
+        directory: Scratch directory, normally a TemporaryDirectory
+        timeout: Seconds before the process group is killed
+        input: Text sent on stdin (none if None)
+        merge_output: Send stderr to stdout
+
+    Returns:
+        Exit code (negative for a signal), stdout, stderr and whether the
+        timeout was hit
+    """
+    env = {name: os.environ[name] for name in SANDBOX_ENV if name in os.environ}
+    env["HOME"] = directory
+    posix = os.name == "posix"
+    process = subprocess.Popen(command, cwd=directory, env=env,
+                               stdin=subprocess.DEVNULL if input is None else subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT if merge_output else subprocess.PIPE,
+                               text=True, start_new_session=posix)
+
+    def kill_group():
+        if posix:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        else:
+            process.kill()
+
+    timed_out = False
+    try:
+        stdout, stderr = process.communicate(input=input, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        kill_group()
+        stdout, stderr = process.communicate()
+    else:
+        if posix:
+            # Children left running in the background go with the group
+            kill_group()
+    return process.returncode, stdout, stderr or "", timed_out
+
+
+def run_tests(function_code: str, test_code: str,
+              limits: Optional[SandboxLimits] = None) -> Dict[str, Any]:
+    """
+    Run a test module against a function in a fresh sandbox
+
+    The function is written to ``function_under_test.py`` and the tests
+    next to it in a new temporary directory, and pytest runs there in an
+    isolated interpreter (``-I``: no user site, no PYTHON* variables) with
+    only a handful of environment variables and the given resource limits.
+
+    Args:
+        function_code: Source of the function under test
+        test_code: Test module source (see build_test_module)
+        limits: Resource limits (SandboxLimits defaults if None)
+
+    Returns:
+        ``status`` ("passed", "failed" or "error"), per-test outcomes keyed
+        by pytest id, counts of passed, failed and errored tests, the
+        pytest exit code, the tail of its output and the seconds it took
+    """
+    limits = limits or SandboxLimits()
+    result: Dict[str, Any] = {"status": "error", "tests": {}, "passed": 0, "failed": 0, "errors": 0,
+                              "exit_code": None, "output": "", "seconds": 0.0}
+    if not test_code.strip():
+        result["output"] = "No test code in the response"
+        return result
+
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory(prefix="claude_tests_") as directory:
+        work = Path(directory)
+        (work / f"{MODULE_NAME}.py").write_text(function_code, encoding="utf-8")
+        (work / f"{TEST_MODULE}.py").write_text(test_code, encoding="utf-8")
+        report = work / "report.xml"
+        command = [sys.executable, "-I", "-B", "-c", _BOOTSTRAP,
+                   str(limits.cpu_seconds), str(int(limits.wall_seconds) + 1),
+                   str(limits.memory_mb * 1024 * 1024),
+                   "-q", "-p", "no:cacheprovider", "--rootdir", directory,
+                   f"--junitxml={report}", f"{TEST_MODULE}.py"]
+        returncode, output, _, timed_out = run_isolated(command, directory, limits.wall_seconds)
+        if timed_out:
+            output = f"{output}\nTimed out after {limits.wall_seconds}s"
+        result["exit_code"] = returncode
+        result["output"] = output[-4000:]
+        if report.exists():
+            try:
+                result["tests"] = _read_report(report)
+            except ET.ParseError:
+                pass
+    result["seconds"] = round(time.monotonic() - started, 3)
+
+    outcomes = [test["outcome"] for test in result["tests"].values()]
+    result["passed"] = outcomes.count("passed")
+    result["failed"] = outcomes.count("failed")
+    result["errors"] = outcomes.count("error")
+    if result["failed"] or result["errors"]:
+        result["status"] = "failed"
+    elif result["passed"] and result["exit_code"] == 0:
+        result["status"] = "passed"
+    return result
+
+
+def failing_tests(result: Dict[str, Any]) -> Dict[str, str]:
+    """Failure message of every failed or errored test of a run_tests result, keyed by pytest id"""
+    return {test_id: test["message"] for test_id, test in result["tests"].items()
+            if test["outcome"] in ("failed", "error")}
+
+
+def drop_tests(test_code: str, test_ids: Set[str]) -> str:
+    """
+    Remove tests from a test module
+
+    Args:
+        test_code: Test module source
+        test_ids: pytest ids (``name``, ``Class::name``; parameters are ignored)
+
+    Returns:
+        The source without those test functions; a class whose every
+        statement was removed is removed too. Unchanged if it does not parse.
+    """
+    try:
+        tree = ast.parse(test_code)
+    except SyntaxError:
+        return test_code
+    wanted = {test_id.split("[", 1)[0] for test_id in test_ids}
+    spans: List[Tuple[int, int]] = []
+
+    def span(node: ast.stmt) -> Tuple[int, int]:
+        decorators = getattr(node, "decorator_list", [])
+        return min([node.lineno] + [decorator.lineno for decorator in decorators]), node.end_lineno
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in wanted:
+            spans.append(span(node))
+        elif isinstance(node, ast.ClassDef):
+            methods = [child for child in node.body
+                       if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+                       and f"{node.name}::{child.name}" in wanted]
+            if methods and len(methods) == len(node.body):
+                spans.append(span(node))
+            else:
+                spans.extend(span(method) for method in methods)
+    lines = test_code.splitlines(keepends=True)
+    for first, last in sorted(spans, reverse=True):
+        del lines[first - 1:last]
+    return "".join(lines)
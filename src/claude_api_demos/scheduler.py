@@ -0,0 +1,261 @@
+"""
+Priority request scheduler
+Weighted fair queuing in front of the client so interactive calls go first
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from .bulkhead import BATCH, INTERACTIVE, current_traffic_class
+from .deadline import DeadlineExceeded, remaining
+
+# Share of dispatch slots per priority class when both are waiting
+DEFAULT_WEIGHTS = {INTERACTIVE: 16, BATCH: 1}
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a priority class already has its maximum number of queued requests"""
+
+    def __init__(self, priority: str, max_queue: int):
+        self.priority = priority
+        self.max_queue = max_queue
+        super().__init__(f"Queue for '{priority}' requests is full ({max_queue} waiting)")
+
+
+class _Ticket:
+    """A request waiting for a dispatch slot"""
+
+    def __init__(self, priority: str, start: float, finish: float):
+        self.priority = priority
+        self.start = start
+        self.finish = finish
+        self.enqueued = time.monotonic()
+        self.granted = threading.Event()
+        self.future: Optional["asyncio.Future[None]"] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def grant(self):
+        self.granted.set()
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class PriorityScheduler:
+    """
+    Admit requests to the API in priority order.
+
+    At most ``max_in_flight`` requests run at once. When they are all busy,
+    new requests queue per priority class (the caller's traffic class) and
+    free slots are handed out by start-time fair queuing: each request is
+    tagged with its class's virtual start time, advanced by cost / weight,
+    and the smallest tag goes next. A class with weight 16 therefore gets
+    about 16 times the slots of a weight-1 class while both are waiting,
+    and a single interactive request overtakes any backlog of batch work.
+    Under rate-limit pressure the wait happens in the RateLimiter, which
+    orders its waiters by traffic class too.
+    """
+
+    def __init__(self,
+                 max_in_flight: int = 64,
+                 weights: Optional[Dict[str, float]] = None,
+                 max_queue: int = 1000):
+        """
+        Initialize the scheduler
+
+        Args:
+            max_in_flight: Requests admitted at once
+            weights: Relative share per priority class (unknown classes get 1)
+            max_queue: Queued requests allowed per class before QueueFullError
+        """
+        self.max_in_flight = max_in_flight
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.max_queue = max_queue
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._queues: Dict[str, "deque[_Ticket]"] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _class_stats(self, priority: str) -> Dict[str, Any]:
+        """Counters for a class (caller holds the lock)"""
+        stats = self._stats.get(priority)
+        if stats is None:
+            stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0, "total_wait": 0.0, "waits": deque(maxlen=1000)}
+            self._stats[priority] = stats
+        return stats
+
+    def _admit(self, priority: str, wait: float):
+        """Record an admitted request (caller holds the lock)"""
+        stats = self._class_stats(priority)
+        stats["admitted"] += 1
+        stats["total_wait"] += wait
+        stats["waits"].append(wait)
+
+    def _enter(self, priority: str, cost: float) -> Optional[_Ticket]:
+        """Take a slot now, or return a queued ticket to wait on"""
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not any(self._queues.values()):
+                self._in_flight += 1
+                self._admit(priority, 0.0)
+                return None
+            queue = self._queues.setdefault(priority, deque())
+            if len(queue) >= self.max_queue:
+                self._class_stats(priority)["rejected"] += 1
+                raise QueueFullError(priority, self.max_queue)
+            start = max(self._virtual_time, self._last_finish.get(priority, 0.0))
+            finish = start + cost / self.weights.get(priority, 1)
+            self._last_finish[priority] = finish
+            ticket = _Ticket(priority, start, finish)
+            queue.append(ticket)
+            self._class_stats(priority)["queued"] += 1
+            return ticket
+
+    def _dispatch(self):
+        """Hand free slots to the queued tickets with the smallest start tags (caller holds the lock)"""
+        while self._in_flight < self.max_in_flight:
+            heads = [queue[0] for queue in self._queues.values() if queue]
+            if not heads:
+                return
+            ticket = min(heads, key=lambda t: (t.start, -self.weights.get(t.priority, 1)))
+            self._queues[ticket.priority].popleft()
+            self._virtual_time = max(self._virtual_time, ticket.start)
+            self._in_flight += 1
+            self._admit(ticket.priority, time.monotonic() - ticket.enqueued)
+            ticket.grant()
+
+    def _leave(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+
+    def _withdraw(self, ticket: _Ticket) -> bool:
+        """Take a ticket out of its queue; False if it had already been granted a slot"""
+        with self._lock:
+            queue = self._queues.get(ticket.priority)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                return True
+            return False
+
+    def _abandon(self, ticket: _Ticket):
+        """Withdraw a ticket whose waiter went away, giving back its slot if it had one"""
+        if not self._withdraw(ticket):
+            self._leave()
+
+    def _time_out(self, ticket: _Ticket):
+        """Withdraw a ticket whose deadline passed, unless it was granted in the meantime"""
+        if self._withdraw(ticket):
+            with self._lock:
+                self._class_stats(ticket.priority)["timed_out"] += 1
+            raise DeadlineExceeded("scheduler queue wait")
+
+    @contextmanager
+    def slot(self, cost: float = 1.0, priority: Optional[str] = None) -> Iterator[None]:
+        """
+        Hold a dispatch slot for the duration of the block
+
+        Args:
+            cost: Size of the request (e.g. estimated tokens) for fair sharing
+            priority: Priority class (the caller's traffic class by default)
+
+        Raises:
+            QueueFullError: If the class's queue is full
+            DeadlineExceeded: If the caller's deadline passes while queued
+        """
+        ticket = self._enter(priority or current_traffic_class(), cost)
+        if ticket is not None:
+            try:
+                granted = ticket.granted.wait(remaining())
+            except BaseException:
+                self._abandon(ticket)
+                raise
+            if not granted:
+                self._time_out(ticket)
+        try:
+            yield
+        finally:
+            self._leave()
+
+    @asynccontextmanager
+    async def slot_async(self, cost: float = 1.0, priority: Optional[str] = None) -> AsyncIterator[None]:
+        """asyncio version of slot"""
+        ticket = self._enter(priority or current_traffic_class(), cost)
+        if ticket is not None:
+            ticket.loop = asyncio.get_running_loop()
+            ticket.future = ticket.loop.create_future()
+            if ticket.granted.is_set():
+                ticket.future.set_result(None)
+            try:
+                done, _ = await asyncio.wait({ticket.future}, timeout=remaining())
+            except asyncio.CancelledError:
+                self._abandon(ticket)
+                raise
+            if not done:
+                self._time_out(ticket)
+        try:
+            yield
+        finally:
+            self._leave()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth and queue-wait time per priority class"""
+        with self._lock:
+            classes = {}
+            for priority, stats in self._stats.items():
+                waits = sorted(stats["waits"])
+
+                def percentile(pct: float) -> Optional[float]:
+                    if not waits:
+                        return None
+                    return round(waits[min(int(len(waits) * pct), len(waits) - 1)], 4)
+
+                classes[priority] = {
+                    "waiting": len(self._queues.get(priority, ())),
+                    "admitted": stats["admitted"],
+                    "queued": stats["queued"],
+                    "rejected": stats["rejected"],
+                    "timed_out": stats["timed_out"],
+                    "wait_p50": percentile(0.50),
+                    "wait_p95": percentile(0.95),
+                    "wait_max": round(waits[-1], 4) if waits else None,
+                    "average_wait": round(stats["total_wait"] / stats["admitted"], 4) if stats["admitted"] else 0.0
+                }
+            return {"in_flight": self._in_flight, "max_in_flight": self.max_in_flight, "classes": classes}
+
+
+_scheduler: Optional[PriorityScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_shared_scheduler() -> PriorityScheduler:
+    """Get the process-wide scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PriorityScheduler()
+        return _scheduler
+
+
+def configure_scheduler(**kwargs) -> PriorityScheduler:
+    """Replace the process-wide scheduler with one built from kwargs"""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = PriorityScheduler(**kwargs)
+        return _scheduler
+
+
+def reset_scheduler():
+    """Drop the process-wide scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = None
@@ -0,0 +1,239 @@
+"""
+Measured speedup harness
+Check an optimization's functions against the originals on generated inputs and time both in isolated subprocesses
+"""
+
+import ast
+import difflib
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .sandbox import SandboxLimits, extract_code_blocks, run_isolated
+
+WORKER = Path(__file__).with_name("speedup_worker.py")
+
+
+def extract_module(response: str) -> str:
+    """
+    Definitions from the code blocks of a response, as one module
+
+    Imports, functions, classes and assignments are kept in order, so a
+    later definition of a name replaces an earlier one (the optimized
+    version usually follows the original). Example calls, prints and
+    ``__main__`` blocks are dropped, as are blocks that do not parse.
+
+    Args:
+        response: Model response
+
+    Returns:
+        Module source, "" if the response has no usable code
+    """
+    kept = []
+    for block in extract_code_blocks(response):
+        try:
+            tree = ast.parse(block)
+        except SyntaxError:
+            continue
+        lines = block.splitlines(keepends=True)
+        for node in tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef,
+                                 ast.Assign, ast.AnnAssign)):
+                decorators = getattr(node, "decorator_list", [])
+                first = min([node.lineno] + [decorator.lineno for decorator in decorators])
+                kept.append("".join(lines[first - 1:node.end_lineno]).rstrip() + "\n")
+    return "\n\n".join(kept)
+
+
+def _functions(source: str) -> Dict[str, Tuple[int, str]]:
+    """Top-level functions of a module: number of required positional parameters and a dump of the code"""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return {}
+    functions = {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            positional = node.args.posonlyargs + node.args.args
+            functions[node.name] = (len(positional) - len(node.args.defaults), ast.dump(node))
+    return functions
+
+
+def match_functions(original: str, optimized: str) -> Dict[str, str]:
+    """
+    Pair each original function with its optimized version
+
+    A changed function of the same name is used if there is one; otherwise
+    the most similarly named function with the same number of required
+    parameters (``fibonacci`` and ``fibonacci_fast``), if its name is close
+    enough. A response that repeats the original unchanged next to a renamed
+    optimized version is therefore paired with the optimized one; an
+    unchanged copy is only used when there is nothing else.
+
+    Returns:
+        Optimized function name keyed by original function name
+    """
+    before, after = _functions(original), _functions(optimized)
+    pairs = {name: name for name in before if name in after and after[name][1] != before[name][1]}
+    unused = [name for name in after if name not in before]
+    for name, (arity, _) in before.items():
+        if name in pairs:
+            continue
+        candidates = [other for other in unused if after[other][0] == arity]
+        best = max(candidates, key=lambda other: difflib.SequenceMatcher(None, name, other).ratio(), default=None)
+        if best is not None and difflib.SequenceMatcher(None, name, best).ratio() >= 0.6:
+            pairs[name] = best
+            unused.remove(best)
+        elif name in after:
+            pairs[name] = name
+    return pairs
+
+
+def _run_worker(job: Dict[str, Any], limits: SandboxLimits) -> Dict[str, Any]:
+    """Run one worker job in an isolated interpreter under the limits, in a scratch directory"""
+    job = dict(job, cpu_seconds=limits.cpu_seconds, memory_bytes=limits.memory_mb * 1024 * 1024)
+    with tempfile.TemporaryDirectory(prefix="claude_speedup_") as directory:
+        returncode, stdout, stderr, timed_out = run_isolated([sys.executable, "-I", "-B", str(WORKER)], directory,
+                                                             limits.wall_seconds, input=json.dumps(job),
+                                                             merge_output=False)
+    if timed_out:
+        return {"error": f"Timed out after {limits.wall_seconds}s"}
+    lines = stdout.strip().splitlines()
+    try:
+        return json.loads(lines[-1])
+    except (IndexError, ValueError):
+        return {"error": f"Worker exited with {returncode}: {stderr.strip()[-500:]}"}
+
+
+def _compare(original: str, optimized: str, name: str, optimized_name: str, cases: int, seed: int,
+             limits: SandboxLimits) -> Dict[str, Any]:
+    return _run_worker({"mode": "check", "original": original, "optimized": optimized, "name": name,
+                        "optimized_name": optimized_name, "cases": cases, "seed": seed}, limits)
+
+
+def measure_speedup(original_code: str, optimized_code: str,
+                    cases: int = 50,
+                    warmup: int = 3,
+                    repeats: int = 5,
+                    min_speedup: float = 1.0,
+                    seed: int = 0,
+                    limits: Optional[SandboxLimits] = None,
+                    max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Check and time an optimization function by function
+
+    Each original function is paired with its optimized version (see
+    match_functions). The pair is first run on ``cases`` generated inputs,
+    from the smallest up; results, exceptions raised and any changes to the
+    arguments must all match. Input kinds come from annotations and
+    parameter names, or are probed against the original. The benchmark
+    input is then grown until one call of the original is measurable, and
+    each version is timed in its own subprocess with timeit (``warmup``
+    calls first, best of ``repeats``) and its peak memory traced with
+    tracemalloc. Checks run in parallel; timings run one at a time so they
+    do not compete for cores. Every subprocess is an isolated interpreter
+    with the ``limits`` (``cpu_seconds`` covering the whole subprocess).
+
+    A pair is accepted only if the outputs match and the optimized version
+    is at least ``min_speedup`` times as fast.
+
+    Args:
+        original_code: Source of the original functions
+        optimized_code: Source of the optimized functions (see extract_module)
+        cases: Generated inputs each pair is compared on
+        warmup: Untimed calls before timing
+        repeats: Timing repeats; the best is used
+        min_speedup: Slowest accepted ratio of original to optimized time
+        seed: Seed of the generated inputs
+        limits: Resource limits of each subprocess
+        max_workers: Checks run at the same time (one per CPU core if None)
+
+    Returns:
+        ``accepted`` if every pair was, with per-function results (optimized
+        name, equivalence, cases, input kinds and size, both timings,
+        ``speedup``, ``memory_delta`` in bytes, ``accepted`` and ``reason``)
+    """
+    limits = limits or SandboxLimits(cpu_seconds=60, memory_mb=1024, wall_seconds=120.0)
+    pairs = match_functions(original_code, optimized_code)
+    result: Dict[str, Any] = {"accepted": False, "functions": {}}
+    if not pairs:
+        result["reason"] = "No optimized function matches an original one"
+        return result
+
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(pairs)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        checks = {name: executor.submit(_compare, original_code, optimized_code, name, optimized_name,
+                                        cases, seed, limits) for name, optimized_name in pairs.items()}
+        checked = {name: future.result() for name, future in checks.items()}
+
+    for name, optimized_name in pairs.items():
+        check = checked[name]
+        entry: Dict[str, Any] = {"optimized_name": optimized_name, "equivalent": check.get("equivalent"),
+                                 "cases": check.get("cases", 0), "kinds": check.get("kinds"),
+                                 "size": check.get("size"), "accepted": False}
+        result["functions"][name] = entry
+        if check.get("error"):
+            entry["reason"] = check["error"]
+            continue
+        if not check["equivalent"]:
+            entry["mismatch"] = check["mismatch"]
+            entry["reason"] = f"Different output after {check['cases']} cases"
+            continue
+        timings: List[Tuple[str, Dict[str, Any]]] = []
+        for label, source, function in (("original", original_code, name), ("optimized", optimized_code, optimized_name)):
+            timings.append((label, _run_worker({"mode": "bench", "source": source, "name": function,
+                                                "kinds": check["kinds"], "size": check["size"], "seed": seed,
+                                                "warmup": warmup, "repeats": repeats}, limits)))
+        entry.update(timings)
+        failed = next((f"{label}: {timing['error']}" for label, timing in timings if "error" in timing), None)
+        if failed:
+            entry["reason"] = f"Benchmark failed ({failed})"
+            continue
+        before, after = entry["original"], entry["optimized"]
+        entry["speedup"] = round(before["best"] / after["best"], 3) if after["best"] > 0 else float("inf")
+        entry["memory_delta"] = after["peak_bytes"] - before["peak_bytes"]
+        entry["accepted"] = entry["speedup"] >= min_speedup
+        entry["reason"] = (f"{entry['speedup']}x faster" if entry["accepted"]
+                           else f"Slower than required ({entry['speedup']}x, need {min_speedup}x)")
+    result["accepted"] = all(entry["accepted"] for entry in result["functions"].values())
+    return result
+
+
+def format_measurements(measurements: Dict[str, Any]) -> str:
+    """Short markdown table of measure_speedup results"""
+    if not measurements["functions"]:
+        return f"Not verified: {measurements.get('reason', 'nothing to compare')}"
+    rows = ["| Function | Result | Speedup | Peak memory change |", "|---|---|---|---|"]
+    for name, entry in measurements["functions"].items():
+        speedup = f"{entry['speedup']}x" if "speedup" in entry else "-"
+        memory = f"{entry['memory_delta']:+,} bytes" if "memory_delta" in entry else "-"
+        verdict = "accepted" if entry["accepted"] else f"rejected: {entry['reason']}"
+        rows.append(f"| {name} | {verdict} | {speedup} | {memory} |")
+    return "\n".join(rows)
+
+
+def verify_optimization(original_code: str, response: str, **kwargs) -> Dict[str, Any]:
+    """
+    Measure the optimized code of a response against the original
+
+    Args:
+        original_code: Code that was sent to be optimized
+        response: Optimization response with the optimized code in code blocks
+        **kwargs: Passed on to measure_speedup
+
+    Returns:
+        The response, the measurements, whether the optimization was
+        accepted, and the optimized code (None if it was rejected)
+    """
+    optimized = extract_module(response)
+    measurements = measure_speedup(original_code, optimized, **kwargs)
+    return {
+        "response": response,
+        "accepted": measurements["accepted"],
+        "optimized_code": optimized if measurements["accepted"] else None,
+        "measurements": measurements
+    }
@@ -0,0 +1,235 @@
+"""
+Subprocess side of the speedup harness
+Run as a script: reads one JSON job on stdin and writes one JSON result on stdout.
+Only the standard library is used, so it runs in an isolated interpreter (-I).
+"""
+
+import copy
+import inspect
+import json
+import math
+import random
+import string
+import sys
+import time
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+KINDS = ("int", "list_int", "str", "float", "list_str", "dict", "bool")
+
+# Parameter names that suggest a kind of input, for functions without annotations
+NAME_HINTS = {
+    "int": ("n", "k", "m", "i", "j", "x", "y", "num", "count", "size", "limit", "index", "target", "depth",
+            "steps", "width", "height", "start", "end", "low", "high", "base", "exp", "power", "times"),
+    "list_int": ("numbers", "nums", "arr", "array", "values", "items", "data", "lst", "list", "seq",
+                 "sequence", "elements", "xs", "scores", "a", "b", "prices", "weights", "matrix_row"),
+    "str": ("s", "text", "string", "word", "name", "pattern", "sentence", "line", "chars", "prefix", "suffix"),
+    "float": ("amount", "rate", "ratio", "price", "t", "tolerance", "eps", "alpha"),
+    "list_str": ("words", "names", "strings", "lines", "tokens", "keys"),
+    "dict": ("d", "mapping", "counts", "table", "graph", "config", "dictionary"),
+    "bool": ("flag", "reverse", "strict", "verbose"),
+}
+
+ANNOTATION_KINDS = (("bool", "bool"), ("List[int]", "list_int"), ("list[int]", "list_int"),
+                    ("List[str]", "list_str"), ("list[str]", "list_str"), ("List[float]", "list_int"),
+                    ("int", "int"), ("float", "float"), ("str", "str"), ("List", "list_int"),
+                    ("list", "list_int"), ("Sequence", "list_int"), ("Dict", "dict"), ("dict", "dict"))
+
+
+def hinted_kinds(function: Callable) -> List[str]:
+    """Most likely input kind of each positional parameter, from its annotation or its name"""
+    kinds = []
+    for parameter in inspect.signature(function).parameters.values():
+        if parameter.kind not in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD):
+            continue
+        if parameter.default is not parameter.empty:
+            break
+        annotation = parameter.annotation
+        text = getattr(annotation, "__name__", None) if isinstance(annotation, type) else str(annotation)
+        kind = next((kind for marker, kind in ANNOTATION_KINDS if text and marker in text), None)
+        if kind is None:
+            name = parameter.name.lower()
+            kind = next((kind for kind, names in NAME_HINTS.items() if name in names), None)
+        if kind is None:
+            name = parameter.name.lower()
+            kind = "list_int" if name.endswith("s") else "int"
+        kinds.append(kind)
+    return kinds
+
+
+def make_value(kind: str, rng: random.Random, size: int) -> Any:
+    """A random value of a kind; ``size`` bounds ints and the length of containers"""
+    if kind == "int":
+        return rng.randint(0, size)
+    if kind == "float":
+        return rng.uniform(-size, size)
+    if kind == "bool":
+        return rng.random() < 0.5
+    if kind == "str":
+        return "".join(rng.choice("abc de") for _ in range(rng.randint(0, size)))
+    if kind == "list_int":
+        return [rng.randint(0, max(size // 2, 1)) for _ in range(rng.randint(0, size))]
+    if kind == "list_str":
+        return ["".join(rng.choice(string.ascii_lowercase[:4]) for _ in range(rng.randint(0, 4)))
+                for _ in range(rng.randint(0, size))]
+    if kind == "dict":
+        return {f"k{index}": rng.randint(0, size) for index in range(rng.randint(0, size))}
+    raise ValueError(f"Unknown input kind: {kind}")
+
+
+def benchmark_args(kinds: Sequence[str], size: int, seed: int) -> List[Any]:
+    """Deterministic benchmark input: ints equal to ``size``, containers of length ``size``"""
+    rng = random.Random(seed)
+    args = []
+    for kind in kinds:
+        if kind == "int":
+            args.append(size)
+        elif kind in ("str", "list_int", "list_str", "dict"):
+            value = make_value(kind, rng, size * 2)
+            while len(value) < size:
+                value = make_value(kind, rng, size * 2)
+            args.append(value[:size] if not isinstance(value, dict) else dict(list(value.items())[:size]))
+        else:
+            args.append(make_value(kind, rng, size))
+    return args
+
+
+def call(function: Callable, args: Sequence[Any]) -> Tuple[str, Any, Any]:
+    """Call on a copy of the arguments; returns ("ok", result, args after) or ("raised", error type, None)"""
+    args = copy.deepcopy(list(args))
+    try:
+        result = function(*args)
+    except Exception as e:
+        return "raised", type(e).__name__, None
+    return "ok", result, args
+
+
+def same(a: Any, b: Any) -> bool:
+    """Equality that tolerates float rounding and compares containers element by element"""
+    if isinstance(a, float) and isinstance(b, (int, float)) or isinstance(b, float) and isinstance(a, (int, float)):
+        return (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return type(a) is type(b) and len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    try:
+        return bool(a == b)
+    except Exception:
+        return repr(a) == repr(b)
+
+
+def probe_kinds(function: Callable, rng: random.Random) -> Optional[List[str]]:
+    """Input kinds the function accepts: the hinted ones, else the first single-parameter change that works"""
+    hinted = hinted_kinds(function)
+
+    def accepts(kinds: List[str]) -> bool:
+        outcomes = [call(function, [make_value(kind, rng, 8) for kind in kinds]) for _ in range(6)]
+        return sum(outcome[0] == "ok" for outcome in outcomes) >= 3
+
+    if accepts(hinted):
+        return hinted
+    for position in range(len(hinted)):
+        for kind in KINDS:
+            candidate = hinted[:position] + [kind] + hinted[position + 1:]
+            if kind != hinted[position] and accepts(candidate):
+                return candidate
+    return None
+
+
+def check(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare the two functions on generated inputs and pick a benchmark size"""
+    original = load(job["original"], job["name"])
+    optimized = load(job["optimized"], job["optimized_name"])
+    rng = random.Random(job["seed"])
+    kinds = job.get("kinds") or probe_kinds(original, rng)
+    if kinds is None:
+        return {"equivalent": None, "cases": 0, "error": "Could not find inputs the original function accepts"}
+
+    cases = 0
+    for case in range(job["cases"]):
+        # Start with the smallest inputs, where edge cases live
+        args = [make_value(kind, rng, min(case, 20)) for kind in kinds]
+        expected, actual = call(original, args), call(optimized, args)
+        cases += 1
+        if not (expected[0] == actual[0] and same(expected[1], actual[1]) and same(expected[2], actual[2])):
+            return {"equivalent": False, "cases": cases, "kinds": kinds,
+                    "mismatch": {"args": repr(args)[:500], "expected": repr(expected[1])[:500],
+                                 "actual": repr(actual[1])[:500]}}
+
+    # Grow the benchmark input until one call of the original takes long enough to time well
+    size, limit = 8, time.monotonic() + job.get("calibration_seconds", 2.0)
+    while size < job.get("max_size", 100_000) and time.monotonic() < limit:
+        args = benchmark_args(kinds, size, job["seed"])
+        started = time.perf_counter()
+        if call(original, args)[0] != "ok":
+            break
+        if time.perf_counter() - started >= job.get("target_seconds", 0.002):
+            break
+        size = int(size * 1.5) + 1
+    return {"equivalent": True, "cases": cases, "kinds": kinds, "size": size}
+
+
+def bench(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Time one function on the benchmark input and measure its peak traced memory"""
+    function = load(job["source"], job["name"])
+    args = benchmark_args(job["kinds"], job["size"], job["seed"])
+
+    def prepare() -> List[Any]:
+        return copy.deepcopy(args)
+
+    for _ in range(job.get("warmup", 3)):
+        function(*prepare())
+    # Copying the arguments is timed separately and subtracted, so functions that mutate them stay comparable
+    timer = timeit.Timer(lambda: function(*prepare()))
+    overhead = timeit.Timer(prepare)
+    number, _ = timer.autorange()
+    timings = timer.repeat(repeat=job.get("repeats", 5), number=number)
+    copying = min(overhead.repeat(repeat=job.get("repeats", 5), number=number))
+    per_call = sorted(max(timing - copying, 0.0) / number for timing in timings)
+
+    fresh = prepare()
+    tracemalloc.start()
+    try:
+        function(*fresh)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"best": per_call[0], "median": per_call[len(per_call) // 2], "number": number,
+            "repeats": len(per_call), "peak_bytes": peak}
+
+
+def load(source: str, name: str) -> Callable:
+    """Execute module source in a fresh namespace and return one of its functions"""
+    namespace: Dict[str, Any] = {"__name__": "measured"}
+    exec(compile(source, "<measured>", "exec"), namespace)
+    return namespace[name]
+
+
+def main():
+    job = json.loads(sys.stdin.read())
+    if resource is not None:
+        for limit, value in ((resource.RLIMIT_CPU, job.get("cpu_seconds")), (resource.RLIMIT_AS, job.get("memory_bytes"))):
+            if value:
+                try:
+                    resource.setrlimit(limit, (value, value))
+                except (ValueError, OSError):
+                    pass
+    # Keep the function's own prints out of the result line
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        result = check(job) if job["mode"] == "check" else bench(job)
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        sys.stdout = stdout
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
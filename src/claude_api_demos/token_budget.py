@@ -0,0 +1,317 @@
+"""
+Pre-flight token counting and max_tokens budgeting
+Size requests before sending them so oversized ones fail fast
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .deadline import request_timeout
+from .rate_limiter import estimate_request_tokens
+from .response_cache import request_cache_key
+from .retry import get_shared_retry_policy
+
+# (context window, maximum output tokens) by model name prefix, most specific first
+MODEL_LIMITS: List[Tuple[str, Tuple[int, int]]] = [
+    ("claude-3-5-sonnet", (200_000, 8192)),
+    ("claude-3-5-haiku", (200_000, 8192)),
+    ("claude-3-7-sonnet", (200_000, 64_000)),
+    ("claude-sonnet-4", (200_000, 64_000)),
+    ("claude-opus-4", (200_000, 32_000)),
+    ("claude-3-opus", (200_000, 4096)),
+    ("claude-3-sonnet", (200_000, 4096)),
+    ("claude-3-haiku", (200_000, 4096)),
+]
+DEFAULT_LIMITS = (200_000, 4096)
+
+# Output tokens wanted by each kind of task
+TASK_OUTPUT_TOKENS = {
+    "chat": 1000,
+    "explanation": 1500,
+    "analysis": 2000,
+    "code": 4000,
+    "report": 4000,
+}
+
+# Smallest useful answer; requests that leave less room are rejected
+MIN_OUTPUT_TOKENS = 256
+
+
+class ContextWindowExceeded(ValueError):
+    """Raised before sending a request whose input leaves no room for the answer"""
+
+    def __init__(self, model: str, input_tokens: int, context_window: int):
+        self.model = model
+        self.input_tokens = input_tokens
+        self.context_window = context_window
+        super().__init__(
+            f"Request needs {input_tokens} input tokens, which leaves fewer than "
+            f"{MIN_OUTPUT_TOKENS} output tokens in the {context_window}-token context window of {model}"
+        )
+
+
+def model_limits(model: str) -> Tuple[int, int]:
+    """Context window and maximum output tokens for a model"""
+    for prefix, limits in MODEL_LIMITS:
+        if model.startswith(prefix):
+            return limits
+    return DEFAULT_LIMITS
+
+
+def output_budget(model: str, task: str) -> int:
+    """Output tokens a task gets on a model when the input is small"""
+    return min(TASK_OUTPUT_TOKENS.get(task, TASK_OUTPUT_TOKENS["chat"]), model_limits(model)[1])
+
+
+def plan_max_tokens(model: str, input_tokens: int, task: str = "chat",
+                    requested: Optional[int] = None) -> int:
+    """
+    Pick max_tokens for a request
+
+    Args:
+        model: Model the request is sent to
+        input_tokens: Counted input size of the request
+        task: Kind of task (a key of TASK_OUTPUT_TOKENS)
+        requested: Explicit ceiling from the caller, if any
+
+    Returns:
+        The task's output budget, reduced to what fits in the context window
+    """
+    context_window, max_output = model_limits(model)
+    wanted = requested if requested is not None else TASK_OUTPUT_TOKENS.get(task, TASK_OUTPUT_TOKENS["chat"])
+    remaining = context_window - input_tokens
+    if remaining < MIN_OUTPUT_TOKENS:
+        raise ContextWindowExceeded(model, input_tokens, context_window)
+    return min(wanted, max_output, remaining)
+
+
+def split_text(text: str, max_tokens: int, chars_per_token: int = 3) -> List[str]:
+    """
+    Split text on line boundaries into parts of at most ``max_tokens``
+
+    The size of each part is judged by characters, using a conservative
+    ratio so code (which tokenizes densely) still fits. A single line longer
+    than a part is cut.
+
+    Args:
+        text: Text to split
+        max_tokens: Token budget per part
+        chars_per_token: Characters assumed per token
+
+    Returns:
+        Parts that join back into the original text
+    """
+    limit = max(1, max_tokens * chars_per_token)
+    parts: List[str] = []
+    current = ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:limit])
+            line = line[limit:]
+        if len(current) + len(line) > limit:
+            parts.append(current)
+            current = ""
+        current += line
+    if current or not parts:
+        parts.append(current)
+    return parts
+
+
+class TokenCounter:
+    """
+    Count request input tokens with the token-counting endpoint.
+
+    Counts are cached by a hash of the counted fields (model, system,
+    messages, tools), so repeated or retried requests are not counted again.
+    Requests whose local estimate is below ``exact_above`` skip the endpoint:
+    they are too small for the count to change the outcome, and the
+    round trip would only add latency. If the endpoint fails the local
+    estimate is used instead.
+    """
+
+    COUNTED_FIELDS = ("model", "system", "messages", "tools", "tool_choice")
+
+    def __init__(self, exact_above: int = 8000, cache_entries: int = 1024):
+        """
+        Initialize the counter
+
+        Args:
+            exact_above: Estimated size from which the endpoint is asked
+            cache_entries: Maximum cached counts
+        """
+        self.exact_above = exact_above
+        self.cache_entries = cache_entries
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._hits = 0
+        self._api_calls = 0
+        self._estimated = 0
+        self._fallbacks = 0
+        self._rejected = 0
+
+    def _counted_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: request[name] for name in self.COUNTED_FIELDS if name in request}
+
+    def _cached(self, key: str) -> Optional[int]:
+        with self._lock:
+            count = self._cache.get(key)
+            if count is not None:
+                self._cache.move_to_end(key)
+                self._hits += 1
+            return count
+
+    def _store(self, key: str, count: int):
+        with self._lock:
+            self._cache[key] = count
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def _take_estimate(self, counted: Dict[str, Any]) -> Optional[int]:
+        """The local estimate if it is small enough to use as is"""
+        estimate = estimate_request_tokens(counted)
+        if estimate < self.exact_above:
+            with self._lock:
+                self._estimated += 1
+            return estimate
+        return None
+
+    def _finish(self, key: str, counted: Dict[str, Any], result: Any) -> int:
+        count = getattr(result, "input_tokens", None)
+        if not isinstance(count, int):
+            with self._lock:
+                self._fallbacks += 1
+            return estimate_request_tokens(counted)
+        self._store(key, count)
+        return count
+
+    def count(self, client: Any, request: Dict[str, Any]) -> int:
+        """
+        Input tokens of a request
+
+        Args:
+            client: Anthropic client used for the counting endpoint
+            request: Keyword arguments for messages.create
+
+        Returns:
+            Input token count
+        """
+        counted = self._counted_request(request)
+        estimate = self._take_estimate(counted)
+        if estimate is not None:
+            return estimate
+        key = request_cache_key(counted)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            self._api_calls += 1
+        try:
+            result = get_shared_retry_policy().call(lambda: client.messages.count_tokens(**counted, **request_timeout()))
+        except Exception:
+            result = None
+        return self._finish(key, counted, result)
+
+    async def count_async(self, client: Any, request: Dict[str, Any]) -> int:
+        """asyncio version of count for ``anthropic.AsyncAnthropic`` clients"""
+        counted = self._counted_request(request)
+        estimate = self._take_estimate(counted)
+        if estimate is not None:
+            return estimate
+        key = request_cache_key(counted)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            self._api_calls += 1
+        try:
+            result = await get_shared_retry_policy().call_async(lambda: client.messages.count_tokens(**counted, **request_timeout()))
+        except Exception:
+            result = None
+        return self._finish(key, counted, result)
+
+    def budget(self, request: Dict[str, Any], input_tokens: int, task: str) -> Dict[str, Any]:
+        """
+        Return the request with max_tokens chosen for its input size and task
+
+        Raises:
+            ContextWindowExceeded: If the input leaves no room for an answer
+        """
+        try:
+            max_tokens = plan_max_tokens(request["model"], input_tokens, task, request.get("max_tokens"))
+        except ContextWindowExceeded:
+            with self._lock:
+                self._rejected += 1
+            raise
+        return dict(request, max_tokens=max_tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get counting statistics"""
+        with self._lock:
+            return {
+                "api_calls": self._api_calls,
+                "cache_hits": self._hits,
+                "estimated": self._estimated,
+                "fallbacks": self._fallbacks,
+                "rejected": self._rejected,
+                "cached_counts": len(self._cache)
+            }
+
+
+_counter: Optional[TokenCounter] = None
+_counter_lock = threading.Lock()
+
+
+def get_shared_token_counter() -> TokenCounter:
+    """Get the process-wide token counter"""
+    global _counter
+    with _counter_lock:
+        if _counter is None:
+            _counter = TokenCounter()
+        return _counter
+
+
+def configure_token_counter(**kwargs) -> TokenCounter:
+    """Replace the process-wide token counter with one built from kwargs"""
+    global _counter
+    with _counter_lock:
+        _counter = TokenCounter(**kwargs)
+        return _counter
+
+
+def reset_token_counter():
+    """Drop the process-wide token counter"""
+    global _counter
+    with _counter_lock:
+        _counter = None
+
+
+def budget_request(client: Any, request: Dict[str, Any], task: str) -> Dict[str, Any]:
+    """
+    Count a request's input and set its max_tokens for the task
+
+    Args:
+        client: Anthropic client used for the counting endpoint
+        request: Keyword arguments for messages.create
+        task: Kind of task (a key of TASK_OUTPUT_TOKENS)
+
+    Returns:
+        A copy of the request with max_tokens set
+
+    Raises:
+        ContextWindowExceeded: If the input leaves no room for an answer
+    """
+    counter = get_shared_token_counter()
+    return counter.budget(request, counter.count(client, request), task)
+
+
+async def budget_request_async(client: Any, request: Dict[str, Any], task: str) -> Dict[str, Any]:
+    """asyncio version of budget_request"""
+    counter = get_shared_token_counter()
+    return counter.budget(request, await counter.count_async(client, request), task)
@@ -0,0 +1,267 @@
+"""
+HTTP transport benchmark
+Compare HTTP/1.1 connection pooling with HTTP/2 multiplexing against a local stand-in API
+"""
+
+import asyncio
+import importlib.util
+import json
+import statistics
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import anthropic
+
+from .client_pool import ClientPool
+
+H2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+
+# Transports compared by default, as ClientPool settings
+DEFAULT_TRANSPORTS: Dict[str, Dict[str, Any]] = {
+    "HTTP/1.1 pool": {"max_connections": 128, "max_keepalive_connections": 128},
+    "HTTP/2": {"http2": True, "max_connections": 8, "max_keepalive_connections": 8},
+}
+
+BENCHMARK_REQUEST = {
+    "model": "stand-in-model",
+    "max_tokens": 16,
+    "messages": [{"role": "user", "content": "ping"}]
+}
+
+
+def http2_available() -> bool:
+    """Whether the optional h2 package is installed"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class StandInServer:
+    """
+    Local stand-in for the Messages API.
+
+    Answers every request with the same small message after ``latency``
+    seconds, over keep-alive HTTP/1.1 or cleartext HTTP/2 (when h2 is
+    installed). Runs its own event loop in a background thread; use it as
+    a context manager.
+    """
+
+    def __init__(self, latency: float = 0.05):
+        """
+        Initialize the server
+
+        Args:
+            latency: Seconds to wait before answering, standing in for model time
+        """
+        self.latency = latency
+        self.body = json.dumps({
+            "id": "msg_standin",
+            "type": "message",
+            "role": "assistant",
+            "model": BENCHMARK_REQUEST["model"],
+            "content": [{"type": "text", "text": "pong"}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 8, "output_tokens": 1}
+        }).encode()
+        self.port: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "StandInServer":
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        async def start():
+            self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0, backlog=1024)
+            self.port = self._server.sockets[0].getsockname()[1]
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def __exit__(self, *exc_info):
+        async def stop():
+            self._server.close()
+            handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in handlers:
+                task.cancel()
+            await asyncio.gather(*handlers, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(stop(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = b""
+            while len(head) < len(H2_PREFACE) and b"\r\n\r\n" not in head:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    return
+                head += chunk
+            if head.startswith(H2_PREFACE):
+                await self._serve_http2(reader, writer, head)
+            else:
+                await self._serve_http1(reader, writer, head)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Clients hanging up, or the server shutting down
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_http1(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, buffer: bytes):
+        while True:
+            while b"\r\n\r\n" not in buffer:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    return
+                buffer += chunk
+            head, buffer = buffer.split(b"\r\n\r\n", 1)
+            length = 0
+            for line in head.decode("latin-1").split("\r\n")[1:]:
+                name, _, value = line.partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            if len(buffer) < length:
+                buffer += await reader.readexactly(length - len(buffer))
+            buffer = buffer[length:]
+
+            await asyncio.sleep(self.latency)
+            writer.write(b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+                         b"content-length: %d\r\n\r\n" % len(self.body) + self.body)
+            await writer.drain()
+
+    async def _serve_http2(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, data: bytes):
+        import h2.config
+        import h2.connection
+        import h2.events
+
+        connection = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        connection.initiate_connection()
+
+        async def respond(stream_id: int):
+            await asyncio.sleep(self.latency)
+            connection.send_headers(stream_id, [
+                (":status", "200"),
+                ("content-type", "application/json"),
+                ("content-length", str(len(self.body)))
+            ])
+            connection.send_data(stream_id, self.body, end_stream=True)
+            writer.write(connection.data_to_send())
+
+        pending = set()
+        while data:
+            for event in connection.receive_data(data):
+                if isinstance(event, h2.events.DataReceived):
+                    connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    task = asyncio.ensure_future(respond(event.stream_id))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    return
+            writer.write(connection.data_to_send())
+            await writer.drain()
+            data = await reader.read(65536)
+
+
+async def _measure(pool: ClientPool, concurrency: int, requests: int) -> Dict[str, Any]:
+    """Send ``requests`` calls, ``concurrency`` at a time, and time them"""
+    client = anthropic.AsyncAnthropic(api_key="benchmark-key", base_url=pool.base_url,
+                                      http_client=pool.new_async_http_client(), max_retries=0)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one() -> float:
+        async with slots:
+            started = time.perf_counter()
+            await client.messages.create(**BENCHMARK_REQUEST)
+            return time.perf_counter() - started
+
+    try:
+        await client.messages.create(**BENCHMARK_REQUEST)  # open the first connection outside the timing
+        started = time.perf_counter()
+        latencies = sorted(await asyncio.gather(*(one() for _ in range(requests))))
+        elapsed = time.perf_counter() - started
+    finally:
+        await client.close()
+    stats = pool.get_stats()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "latency_p50": round(statistics.median(latencies), 4),
+        "latency_p95": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 4),
+        "connections": stats["new_connections"],
+        "http_versions": stats["http_versions"]
+    }
+
+
+def run_benchmark(concurrency_levels: Sequence[int] = (1, 16, 128),
+                  transports: Optional[Dict[str, Dict[str, Any]]] = None,
+                  requests_per_level: Optional[int] = None,
+                  latency: float = 0.05) -> List[Dict[str, Any]]:
+    """
+    Benchmark transports against a local stand-in server
+
+    Args:
+        concurrency_levels: Concurrent requests to test
+        transports: ClientPool settings by name (DEFAULT_TRANSPORTS if None);
+            HTTP/2 transports are skipped when h2 is not installed
+        requests_per_level: Requests per run (4 per concurrent slot, at least 16, if None)
+        latency: Simulated server time per request in seconds
+
+    Returns:
+        One result per transport and concurrency level
+    """
+    results = []
+    with StandInServer(latency=latency) as server:
+        for name, settings in (transports or DEFAULT_TRANSPORTS).items():
+            if settings.get("http2") and not http2_available():
+                results.append({"transport": name, "skipped": "h2 is not installed"})
+                continue
+            for concurrency in concurrency_levels:
+                pool = ClientPool(base_url=server.url, **settings)
+                try:
+                    requests = requests_per_level or max(concurrency * 4, 16)
+                    results.append(dict(transport=name, **asyncio.run(_measure(pool, concurrency, requests))))
+                finally:
+                    pool.close()
+    return results
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Render benchmark results as a text table"""
+    lines = [f"{'Transport':<16}{'Conc.':>6}{'Req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'Conns':>7}"]
+    for result in results:
+        if "skipped" in result:
+            lines.append(f"{result['transport']:<16}  skipped: {result['skipped']}")
+            continue
+        lines.append(f"{result['transport']:<16}{result['concurrency']:>6}{result['requests_per_second']:>9}"
+                     f"{result['latency_p50'] * 1000:>9.1f}{result['latency_p95'] * 1000:>9.1f}"
+                     f"{result['connections']:>7}")
+    return "\n".join(lines)
+
+
+def main():
+    """Run the transport benchmark and print the results"""
+    print("🚦 HTTP transport benchmark (local stand-in server, 50 ms simulated latency)")
+    print("=" * 60)
+    print(format_results(run_benchmark()))
+
+
+if __name__ == "__main__":
+    main()
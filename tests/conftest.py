@@ -0,0 +1,42 @@
+"""
+Shared pytest fixtures for Claude API Demonstrations tests
+"""
+
+import pytest
+
+from claude_api_demos.bulkhead import reset_bulkheads
+from claude_api_demos.circuit_breaker import reset_circuit_breakers
+from claude_api_demos.client_pool import reset_client_pool
+from claude_api_demos.coalescing import reset_singleflight
+from claude_api_demos.model_router import reset_router
+from claude_api_demos.prompt_cache import reset_prompt_cache_stats
+from claude_api_demos.rate_limiter import reset_rate_limiter
+from claude_api_demos.retry import reset_retry_policy
+from claude_api_demos.scheduler import reset_scheduler
+from claude_api_demos.token_budget import reset_token_counter
+
+
+@pytest.fixture(autouse=True)
+def fresh_client_layer():
+    """Give every test its own process-wide client-layer state"""
+    reset_client_pool()
+    reset_rate_limiter()
+    reset_retry_policy()
+    reset_singleflight()
+    reset_prompt_cache_stats()
+    reset_token_counter()
+    reset_router()
+    reset_circuit_breakers()
+    reset_bulkheads()
+    reset_scheduler()
+    yield
+    reset_client_pool()
+    reset_rate_limiter()
+    reset_retry_policy()
+    reset_singleflight()
+    reset_prompt_cache_stats()
+    reset_token_counter()
+    reset_router()
+    reset_circuit_breakers()
+    reset_bulkheads()
+    reset_scheduler()
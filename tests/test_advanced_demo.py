@@ -0,0 +1,202 @@
+"""
+Tests for AdvancedClaudeDemo
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from claude_api_demos.advanced_demo import AdvancedClaudeDemo
+from claude_api_demos.review_benchmark import DEFAULT_SAMPLE, SAMPLE_DIR, format_results, run_benchmark
+
+
+def _response(text="ok"):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], stop_reason="end_turn",
+                           usage=SimpleNamespace(input_tokens=10, output_tokens=20))
+
+
+def _tool_response(sections, stop_reason="tool_use"):
+    block = SimpleNamespace(type="tool_use", name=AdvancedClaudeDemo.REVIEW_TOOL_NAME, input=sections)
+    return SimpleNamespace(content=[block], stop_reason=stop_reason,
+                           usage=SimpleNamespace(input_tokens=100, output_tokens=400))
+
+
+def _instruction(request):
+    return request["messages"][0]["content"][1]["text"]
+
+
+class _SlowFirstTokenStream:
+    """Stand-in for the SDK MessageStream whose first token arrives after a delay"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.first_token_at = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @property
+    def text_stream(self):
+        time.sleep(self.delay)
+        self.first_token_at = time.monotonic()
+        yield "streamed"
+
+    def get_final_message(self):
+        return _response("streamed review")
+
+
+class TestCodeReviewPasses:
+    def setup_method(self):
+        with patch("anthropic.Anthropic"):
+            self.demo = AdvancedClaudeDemo(api_key="test_key")
+        self.client = self.demo.client
+
+    def _source(self, tmp_path, lines=2):
+        source = tmp_path / "module.py"
+        source.write_text("".join(f"def f{i}():\n    return {i}\n" for i in range(lines)))
+        return str(source)
+
+    def test_subset_comes_back_in_fixed_order(self, tmp_path):
+        """Only the requested passes run, in REVIEW_PASSES order"""
+        self.client.messages.create.return_value = _response()
+
+        results = self.demo.code_review_and_refactor(self._source(tmp_path), passes=["security", "review"])
+
+        assert list(results) == ["review", "security"]
+        assert self.client.messages.create.call_count == 2
+
+    def test_unknown_pass_is_rejected(self, tmp_path):
+        results = self.demo.code_review_and_refactor(self._source(tmp_path), passes=["review", "lint"])
+
+        assert results == {"error": "Unknown review passes: lint"}
+        self.client.messages.create.assert_not_called()
+
+    def test_failed_pass_does_not_sink_the_others(self, tmp_path):
+        """A failing pass is reported as an error string next to the other results"""
+        refactor = AdvancedClaudeDemo.REVIEW_PASSES["refactor"]
+
+        def create(**request):
+            if _instruction(request) == refactor:
+                raise ValueError("boom")
+            return _response("fine")
+
+        self.client.messages.create.side_effect = create
+        results = self.demo.code_review_and_refactor(self._source(tmp_path))
+
+        assert list(results) == ["review", "refactor", "document", "security"]
+        assert results["refactor"] == "Error: boom"
+        assert results["review"] == results["document"] == results["security"] == "fine"
+
+    def test_passes_run_concurrently(self, tmp_path):
+        """Wall time is close to one pass, not the sum of four"""
+        def create(**request):
+            time.sleep(0.2)
+            return _response()
+
+        self.client.messages.create.side_effect = create
+        started = time.monotonic()
+        results = self.demo.code_review_and_refactor(self._source(tmp_path))
+
+        assert len(results) == 4
+        assert time.monotonic() - started < 0.6
+
+    def test_large_file_passes_wait_for_the_cache_to_be_written(self, tmp_path):
+        """With a cacheable prefix, the first pass streams and the others start after its first token"""
+        stream = _SlowFirstTokenStream(0.1)
+        self.client.messages.stream.return_value = stream
+        sent_at = []
+        lock = threading.Lock()
+
+        def create(**request):
+            with lock:
+                sent_at.append(time.monotonic())
+            return _response()
+
+        self.client.messages.create.side_effect = create
+        results = self.demo.code_review_and_refactor(self._source(tmp_path, lines=400))
+
+        assert results["review"] == "streamed review"
+        assert self.client.messages.stream.call_count == 1
+        assert len(sent_at) == 3
+        assert min(sent_at) >= stream.first_token_at
+
+
+class TestStructuredReview:
+    def setup_method(self):
+        with patch("anthropic.Anthropic"):
+            self.demo = AdvancedClaudeDemo(api_key="test_key")
+        self.client = self.demo.client
+
+    def _source(self, tmp_path):
+        source = tmp_path / "module.py"
+        source.write_text("def f():\n    return 1\n")
+        return str(source)
+
+    def test_one_request_answers_every_pass(self, tmp_path):
+        """The code is sent once and the tool input is split into the usual shape"""
+        sections = {name: f"{name} text" for name in reversed(list(AdvancedClaudeDemo.REVIEW_PASSES))}
+        self.client.messages.create.return_value = _tool_response(sections)
+
+        results = self.demo.code_review_and_refactor(self._source(tmp_path), single_call=True)
+
+        assert list(results) == ["review", "refactor", "document", "security"]
+        assert results["security"] == "security text"
+        request = self.client.messages.create.call_args.kwargs
+        assert self.client.messages.create.call_count == 1
+        assert request["tool_choice"] == {"type": "tool", "name": "submit_review"}
+        assert request["tools"][0]["input_schema"]["required"] == list(results)
+        assert self.demo.last_review_usage["requests"] == 1
+        assert self.demo.last_review_usage["output_tokens"] == 400
+
+    def test_invalid_sections_are_run_separately(self, tmp_path):
+        """Missing or empty sections fall back to their own pass"""
+        structured = _tool_response({"review": "looks fine", "refactor": "", "document": 3}, "max_tokens")
+        self.client.messages.create.side_effect = lambda **request: (
+            structured if "tools" in request else _response(f"separate {_instruction(request)[:8]}")
+        )
+
+        results = self.demo.code_review_and_refactor(self._source(tmp_path), single_call=True)
+
+        assert results["review"] == "looks fine"
+        assert results["refactor"].startswith("separate Refactor")
+        assert results["document"].startswith("separate Add")
+        assert results["security"].startswith("separate Analyze")
+        assert self.demo.last_review_usage["requests"] == 4
+
+    def test_schema_covers_only_the_selected_passes(self):
+        tool = AdvancedClaudeDemo.review_tool(["review", "security"])
+
+        assert set(tool["input_schema"]["properties"]) == {"review", "security"}
+        assert AdvancedClaudeDemo.validate_review_sections("not a dict", ["review"]) == {}
+
+
+class TestReviewBenchmark:
+    def test_compares_both_modes_per_file(self, tmp_path):
+        with patch("anthropic.Anthropic"):
+            demo = AdvancedClaudeDemo(api_key="test_key")
+        sections = {name: "text" for name in AdvancedClaudeDemo.REVIEW_PASSES}
+        demo.client.messages.create.side_effect = lambda **request: (
+            _tool_response(sections) if "tools" in request else _response()
+        )
+        source = tmp_path / "module.py"
+        source.write_text("x = 1\n")
+
+        results = run_benchmark([source], runs=2, demo=demo)
+
+        assert [(row["mode"], row["run"]) for row in results] == [
+            ("multi-call", 0), ("single-call", 0), ("single-call", 1), ("multi-call", 1)
+        ]
+        multi, single = results[0], results[1]
+        assert (multi["requests"], single["requests"]) == (4, 1)
+        assert multi["cost"] > 0 and single["cost"] > 0
+        assert all(row["errors"] == 0 for row in results)
+        assert "average" in format_results(results)
+
+    def test_default_sample_is_small_medium_and_large(self):
+        assert [path.parent for path in DEFAULT_SAMPLE] == [SAMPLE_DIR] * 3
+        sizes = [len(path.read_text(encoding="utf-8").splitlines()) for path in DEFAULT_SAMPLE]
+        assert sizes == sorted(sizes) and sizes[0] > 0
@@ -0,0 +1,63 @@
+"""
+Tests for the asynchronous Claude client
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+from claude_api_demos.async_client import AsyncClaudeClient
+
+
+def _response(text):
+    response = Mock()
+    response.content = [Mock(text=text)]
+    return response
+
+
+class TestAsyncClaudeClient:
+    def setup_method(self):
+        with patch('anthropic.AsyncAnthropic'):
+            self.client = AsyncClaudeClient(api_key="test_key")
+
+    def test_chat_returns_text(self):
+        """chat returns the response text"""
+        self.client.client.messages.create = AsyncMock(return_value=_response("hello"))
+
+        assert asyncio.run(self.client.chat("hi")) == "hello"
+
+    def test_chat_many_keeps_order_and_errors(self):
+        """chat_many returns results in input order with per-request errors"""
+        async def create(**kwargs):
+            prompt = kwargs["messages"][0]["content"]
+            await asyncio.sleep(0.01 if prompt == "first" else 0)
+            if prompt == "bad":
+                raise RuntimeError("overloaded")
+            return _response(prompt.upper())
+
+        self.client.client.messages.create = create
+        results = asyncio.run(self.client.chat_many(["first", "bad", "third"]))
+
+        assert [r["index"] for r in results] == [0, 1, 2]
+        assert results[0]["response"] == "FIRST"
+        assert results[1]["response"] is None
+        assert results[1]["error"] == "overloaded"
+        assert results[2]["response"] == "THIRD"
+
+    def test_chat_many_respects_concurrency(self):
+        """No more than `concurrency` requests are in flight at once"""
+        in_flight = 0
+        peak = 0
+
+        async def create(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return _response("ok")
+
+        self.client.client.messages.create = create
+        results = asyncio.run(self.client.chat_many([str(i) for i in range(20)], concurrency=4))
+
+        assert len(results) == 20
+        assert peak == 4
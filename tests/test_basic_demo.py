@@ -0,0 +1,85 @@
+"""
+Tests for ClaudeClient in basic_demo
+"""
+
+from unittest.mock import MagicMock, Mock, patch
+
+from claude_api_demos.basic_demo import ClaudeClient
+from claude_api_demos.response_cache import ResponseCache
+
+
+class _FakeStream:
+    def __init__(self, chunks, output_tokens):
+        self.text_stream = iter(chunks)
+        self._output_tokens = output_tokens
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def get_final_message(self):
+        return Mock(usage=Mock(output_tokens=self._output_tokens))
+
+
+class TestClaudeClientStreaming:
+    def setup_method(self):
+        with patch('anthropic.Anthropic') as mock_anthropic:
+            mock_anthropic.return_value = MagicMock()
+            self.client = ClaudeClient(api_key="test_key")
+
+    def test_chat_stream_yields_deltas_and_records_metrics(self):
+        """chat_stream yields text pieces and records TTFT and throughput"""
+        self.client.client.messages.stream.return_value = _FakeStream(["Hel", "lo"], 2)
+
+        chunks = list(self.client.chat_stream("hi"))
+
+        assert chunks == ["Hel", "lo"]
+        metrics = self.client.stream_metrics[-1]
+        assert metrics["error"] is None
+        assert metrics["output_tokens"] == 2
+        assert metrics["time_to_first_token"] is not None
+        assert metrics["duration"] >= metrics["time_to_first_token"]
+
+    def test_chat_stream_reports_errors(self):
+        """Errors are yielded as text and recorded in the metrics"""
+        self.client.client.messages.stream.side_effect = Exception("boom")
+
+        chunks = list(self.client.chat_stream("hi"))
+
+        assert chunks == ["Error: boom"]
+        assert self.client.stream_metrics[-1]["error"] == "boom"
+        assert self.client.get_stream_stats()["errors"] == 1
+
+
+class TestClaudeClientCache:
+    def setup_method(self):
+        with patch('anthropic.Anthropic') as mock_anthropic:
+            mock_anthropic.return_value = MagicMock()
+            self.client = ClaudeClient(api_key="test_key")
+
+    def test_identical_requests_hit_the_cache(self, tmp_path):
+        """A repeated request is answered from the cache without an API call"""
+        self.client.cache = ResponseCache(cache_dir=tmp_path)
+        self.client.client.messages.create.return_value = Mock(content=[Mock(text="analysis")], usage=None)
+
+        first = self.client.analyze_code("x = 1")
+        second = self.client.analyze_code("x = 1")
+
+        assert first == second == "analysis"
+        self.client.client.messages.create.assert_called_once()
+        assert self.client.cache.get_stats()["memory_hits"] == 1
+
+    def test_bypass_flag_forces_a_fresh_call(self, tmp_path):
+        """bypass_cache skips the lookup and refreshes the entry"""
+        self.client.cache = ResponseCache(cache_dir=tmp_path)
+        self.client.client.messages.create.side_effect = [
+            Mock(content=[Mock(text="old")], usage=None),
+            Mock(content=[Mock(text="new")], usage=None),
+        ]
+
+        assert self.client.chat("hi") == "old"
+        assert self.client.chat("hi", bypass_cache=True) == "new"
+        assert self.client.chat("hi") == "new"
+        assert self.client.client.messages.create.call_count == 2
@@ -0,0 +1,215 @@
+"""
+Tests for Message Batches support against a local stand-in batch server
+"""
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import anthropic
+import pytest
+
+from claude_api_demos.advanced_demo import AdvancedClaudeDemo
+from claude_api_demos.basic_demo import ClaudeClient
+from claude_api_demos.batches import BatchSubmitter
+
+
+class StandInBatchServer:
+    """Minimal in-process implementation of the Message Batches endpoints"""
+
+    def __init__(self, polls_until_ended=1, fail_ids=()):
+        self.polls_until_ended = polls_until_ended
+        self.fail_ids = set(fail_ids)
+        self.batches = {}
+        self.results_downloads = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload, content_type="application/json"):
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                body = json.loads(self.rfile.read(length))
+                batch_id = f"msgbatch_{len(server.batches) + 1:04d}"
+                server.batches[batch_id] = {"requests": body["requests"], "polls": 0}
+                self._send_json(server.batch_object(batch_id))
+
+            def do_GET(self):
+                match = re.match(r"^/v1/messages/batches/([^/]+)(/results)?$", self.path)
+                batch_id, results = match.group(1), match.group(2)
+                if results:
+                    server.results_downloads += 1
+                    self._send_json(server.results_jsonl(batch_id), "application/binary")
+                else:
+                    server.batches[batch_id]["polls"] += 1
+                    self._send_json(server.batch_object(batch_id))
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def batch_object(self, batch_id):
+        batch = self.batches[batch_id]
+        ended = batch["polls"] >= self.polls_until_ended
+        count = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else count, "succeeded": count if ended else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": "2024-01-01T00:00:00Z",
+            "expires_at": "2024-01-02T00:00:00Z",
+            "ended_at": "2024-01-01T00:10:00Z" if ended else None,
+            "results_url": f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def results_jsonl(self, batch_id):
+        lines = []
+        # results come back in reverse order to prove they are matched by custom_id
+        for request in reversed(self.batches[batch_id]["requests"]):
+            custom_id = request["custom_id"]
+            if custom_id in self.fail_ids:
+                result = {"type": "errored",
+                          "error": {"type": "error", "error": {"type": "api_error", "message": "boom"}}}
+            else:
+                prompt = request["params"]["messages"][0]["content"]
+                result = {"type": "succeeded", "message": {
+                    "id": f"msg_{custom_id}", "type": "message", "role": "assistant",
+                    "model": request["params"]["model"], "stop_reason": "end_turn", "stop_sequence": None,
+                    "content": [{"type": "text", "text": f"answer for {custom_id}: {len(prompt)}"}],
+                    "usage": {"input_tokens": 10, "output_tokens": 5},
+                }}
+            lines.append(json.dumps({"custom_id": custom_id, "result": result}))
+        return ("\n".join(lines) + "\n").encode()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def batch_server():
+    with StandInBatchServer(polls_until_ended=2, fail_ids={"broken"}) as server:
+        yield server
+
+
+@pytest.fixture
+def stand_in_client(batch_server):
+    client = anthropic.Anthropic(api_key="test_key", base_url=batch_server.base_url, max_retries=0)
+    yield client
+    client.close()
+
+
+class TestBatchSubmitter:
+    def test_submit_poll_and_collect(self, batch_server, stand_in_client, tmp_path):
+        """A batch is submitted, polled until ended and mapped back by custom_id"""
+        submitter = BatchSubmitter(stand_in_client, state_dir=tmp_path, poll_interval=0)
+        requests = [
+            {"custom_id": name, "params": {"model": "m", "max_tokens": 10,
+                                           "messages": [{"role": "user", "content": name}]}}
+            for name in ("alpha", "broken", "gamma")
+        ]
+
+        texts = submitter.run(requests)
+
+        assert texts["alpha"] == "answer for alpha: 5"
+        assert texts["gamma"] == "answer for gamma: 5"
+        assert texts["broken"] == "Error: boom"
+        assert submitter.pending_handles() == []
+
+    def test_resume_after_crash_skips_downloaded_results(self, batch_server, stand_in_client, tmp_path):
+        """A new process resumes a batch and reuses results saved before the crash"""
+        submitter = BatchSubmitter(stand_in_client, state_dir=tmp_path, poll_interval=0)
+        handle = submitter.submit_batch([
+            {"custom_id": f"r{i}", "params": {"model": "m", "max_tokens": 10,
+                                              "messages": [{"role": "user", "content": "x"}]}}
+            for i in range(3)
+        ])
+        assert submitter.wait(handle)
+
+        # "crash" after reading the first result
+        first = next(submitter.iter_results(handle))
+
+        resumed_submitter = BatchSubmitter(stand_in_client, state_dir=tmp_path, poll_interval=0)
+        assert [h.batch_id for h in resumed_submitter.pending_handles()] == [handle.batch_id]
+        resumed = resumed_submitter.resume(handle.batch_id)
+        results = resumed_submitter.collect_results(resumed)
+
+        assert set(results) == {"r0", "r1", "r2"}
+        assert results[first["custom_id"]] == first["result"]
+        assert resumed_submitter.pending_handles() == []
+
+        # fully collected batches are served from disk without another download
+        downloads = batch_server.results_downloads
+        assert resumed_submitter.collect_results(resumed) == results
+        assert batch_server.results_downloads == downloads
+
+    def test_resume_after_a_torn_results_line(self, batch_server, stand_in_client, tmp_path):
+        """A result cut off mid-write is skipped on resume and downloaded again"""
+        submitter = BatchSubmitter(stand_in_client, state_dir=tmp_path, poll_interval=0)
+        handle = submitter.submit_batch([
+            {"custom_id": f"r{i}", "params": {"model": "m", "max_tokens": 10,
+                                              "messages": [{"role": "user", "content": "x"}]}}
+            for i in range(3)
+        ])
+        assert submitter.wait(handle)
+        first = next(submitter.iter_results(handle))
+        with open(handle.results_path, "a", encoding="utf-8") as f:
+            f.write('{"custom_id": "r1", "resu')
+
+        resumed_submitter = BatchSubmitter(stand_in_client, state_dir=tmp_path, poll_interval=0)
+        resumed = resumed_submitter.resume(handle.batch_id)
+        assert set(resumed.stored_results()) == {first["custom_id"]}
+        results = resumed_submitter.collect_results(resumed)
+
+        assert set(results) == {"r0", "r1", "r2"}
+        assert set(resumed.stored_results()) == {"r0", "r1", "r2"}
+
+    def test_duplicate_custom_ids_are_rejected(self, stand_in_client, tmp_path):
+        """custom_id must be unique within a batch"""
+        submitter = BatchSubmitter(stand_in_client, state_dir=tmp_path)
+        request = {"custom_id": "same", "params": {}}
+        with pytest.raises(ValueError):
+            submitter.submit_batch([request, request])
+
+
+class TestDemoBatchMethods:
+    def test_analyze_code_batch(self, stand_in_client, tmp_path):
+        """ClaudeClient.analyze_code_batch returns one analysis per custom_id"""
+        with patch('anthropic.Anthropic'):
+            client = ClaudeClient(api_key="test_key")
+        submitter = BatchSubmitter(stand_in_client, state_dir=tmp_path, poll_interval=0)
+
+        results = client.analyze_code_batch({"a": "x = 1", "b": "y = 2"}, submitter=submitter)
+
+        assert set(results) == {"a", "b"}
+        assert results["a"].startswith("answer for a:")
+
+    def test_generate_test_cases_batch(self, stand_in_client, tmp_path):
+        """AdvancedClaudeDemo.generate_test_cases_batch uses the batch prompt"""
+        with patch('anthropic.Anthropic'):
+            demo = AdvancedClaudeDemo(api_key="test_key")
+        submitter = BatchSubmitter(stand_in_client, state_dir=tmp_path, poll_interval=0)
+        prompt = demo.build_test_generation_prompt("def f(): pass")
+
+        results = demo.generate_test_cases_batch({"f": "def f(): pass"}, submitter=submitter)
+
+        assert results == {"f": f"answer for f: {len(prompt)}"}
@@ -0,0 +1,112 @@
+"""
+Tests for bulkheads and traffic classes
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from claude_api_demos.bulkhead import (
+    BATCH,
+    Bulkhead,
+    BulkheadFullError,
+    configure_bulkheads,
+    current_traffic_class,
+    get_shared_bulkheads,
+    traffic_class,
+)
+from claude_api_demos.deadline import DeadlineExceeded, deadline_scope
+from claude_api_demos.messaging import create_message
+
+
+class TestBulkhead:
+    def test_rejects_when_full_after_wait(self):
+        bulkhead = Bulkhead("batch", max_concurrent=1, max_wait=0.05)
+        with bulkhead.slot():
+            with pytest.raises(BulkheadFullError):
+                with bulkhead.slot():
+                    pass
+        stats = bulkhead.get_stats()
+        assert stats["rejected"] == 1
+        assert stats["in_use"] == 0
+        assert stats["peak"] == 1
+
+    def test_async_slot_waits_for_release(self):
+        bulkhead = Bulkhead("batch", max_concurrent=1, max_wait=1.0)
+
+        async def hold(order, name, delay):
+            async with bulkhead.slot_async():
+                order.append(name)
+                await asyncio.sleep(delay)
+
+        async def main():
+            order = []
+            await asyncio.gather(hold(order, "a", 0.05), hold(order, "b", 0))
+            return order
+
+        assert asyncio.run(main()) == ["a", "b"]
+        assert bulkhead.get_stats()["admitted"] == 2
+
+    def test_wait_stops_at_the_deadline(self):
+        bulkhead = Bulkhead("batch", max_concurrent=1, max_wait=60)
+
+        async def wait_async():
+            async with bulkhead.slot_async():
+                pass
+
+        with bulkhead.slot(), deadline_scope(0.1):
+            started = time.monotonic()
+            with pytest.raises(DeadlineExceeded):
+                with bulkhead.slot():
+                    pass
+            with pytest.raises(DeadlineExceeded):
+                asyncio.run(wait_async())
+            assert time.monotonic() - started < 5
+        stats = bulkhead.get_stats()
+        assert stats["rejected"] == 0 and stats["waiting"] == 0
+
+    def test_traffic_class_context(self):
+        assert current_traffic_class() == "interactive"
+        with traffic_class(BATCH):
+            assert current_traffic_class() == BATCH
+        assert current_traffic_class() == "interactive"
+
+
+class TestIsolation:
+    def test_batch_saturation_does_not_block_interactive(self):
+        """Interactive calls get through while every batch slot is busy"""
+        configure_bulkheads(interactive=2, batch=1, max_wait=0.05)
+        release = threading.Event()
+        client = MagicMock()
+
+        def slow_create(**request):
+            if request["messages"][0]["content"] == "bulk":
+                release.wait(2)
+            return MagicMock()
+
+        client.messages.create.side_effect = slow_create
+
+        def bulk():
+            with traffic_class(BATCH):
+                create_message(client, coalesce=False, model="m", max_tokens=10,
+                               messages=[{"role": "user", "content": "bulk"}])
+
+        worker = threading.Thread(target=bulk)
+        worker.start()
+        while get_shared_bulkheads().for_class(BATCH).get_stats()["in_use"] == 0:
+            time.sleep(0.001)
+
+        with traffic_class(BATCH):
+            with pytest.raises(BulkheadFullError):
+                create_message(client, coalesce=False, model="m", max_tokens=10,
+                               messages=[{"role": "user", "content": "bulk 2"}])
+        create_message(client, model="m", max_tokens=10, messages=[{"role": "user", "content": "interactive"}])
+
+        release.set()
+        worker.join()
+        stats = get_shared_bulkheads().get_stats()
+        assert stats["interactive"]["admitted"] == 1
+        assert stats["batch"]["rejected"] == 1
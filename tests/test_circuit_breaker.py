@@ -0,0 +1,141 @@
+"""
+Tests for circuit breakers and failover
+"""
+
+import asyncio
+from unittest.mock import MagicMock, Mock
+
+import anthropic
+import httpx
+import pytest
+
+from claude_api_demos.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    configure_circuit_breakers,
+    get_shared_breakers,
+)
+from claude_api_demos.messaging import create_message, create_message_async
+from claude_api_demos.retry import configure_retry_policy
+
+SONNET = "claude-3-5-sonnet-20241022"
+HAIKU = "claude-3-5-haiku-20241022"
+
+
+def _status_error(status):
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(status, request=request)
+    return anthropic.APIStatusError(f"status {status}", response=response, body=None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("m", failure_threshold=3, clock=FakeClock())
+        for _ in range(3):
+            breaker.allow()
+            breaker.record_failure(_status_error(529))
+
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError) as excinfo:
+            breaker.allow()
+        assert excinfo.value.retry_in > 0
+        assert breaker.get_stats()["rejected"] == 1
+
+    def test_half_open_probe_closes_or_reopens(self):
+        """After the cool-down one probe is let through; its outcome decides the state"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("m", failure_threshold=1, recovery_timeout=10, clock=clock)
+        breaker.record_failure(_status_error(500))
+
+        clock.now = 10
+        assert breaker.state == "half_open"
+        breaker.allow()
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+        breaker.record_failure(_status_error(503))
+        assert breaker.state == "open"
+
+        clock.now = 20
+        breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.get_stats()["transitions"] == {"open": 2, "half_open": 2, "closed": 1}
+
+    def test_client_errors_and_rate_limits_do_not_trip(self):
+        """Bad requests and 429s say nothing about backend health"""
+        breaker = CircuitBreaker("m", failure_threshold=1)
+        breaker.record_failure(_status_error(400))
+        breaker.record_failure(_status_error(429))
+        assert breaker.state == "closed"
+
+
+class TestRequestPath:
+    def setup_method(self):
+        configure_retry_policy(max_attempts=1)
+
+    def test_open_breaker_fails_fast(self):
+        """Once open, no request reaches the client"""
+        configure_circuit_breakers(failure_threshold=2)
+        client = MagicMock()
+        client.messages.create.side_effect = _status_error(529)
+        request = {"model": SONNET, "max_tokens": 10, "messages": [{"role": "user", "content": "hi"}]}
+
+        for _ in range(2):
+            with pytest.raises(anthropic.APIStatusError):
+                create_message(client, **request)
+        with pytest.raises(CircuitOpenError):
+            create_message(client, **request)
+
+        assert client.messages.create.call_count == 2
+        stats = get_shared_breakers().get_stats()["breakers"][f"messages:{SONNET}"]
+        assert stats["state"] == "open"
+
+    def test_fails_over_to_fallback_model(self):
+        """With a fallback configured, an open breaker reroutes the request"""
+        configure_circuit_breakers(failure_threshold=1, fallbacks={SONNET: HAIKU})
+        client = MagicMock()
+        client.messages.create.side_effect = [_status_error(503), Mock(content=[Mock(text="from haiku")])]
+        request = {"model": SONNET, "max_tokens": 10, "messages": [{"role": "user", "content": "hi"}]}
+
+        with pytest.raises(anthropic.APIStatusError):
+            create_message(client, **request)
+        response = create_message(client, **request)
+
+        assert response.content[0].text == "from haiku"
+        assert client.messages.create.call_args.kwargs["model"] == HAIKU
+        assert get_shared_breakers().get_stats()["failovers"] == 1
+
+    def test_cancelled_probe_gives_its_permission_back(self):
+        """A half-open probe cancelled mid-request does not keep the breaker closed to everyone"""
+        clock = FakeClock()
+        configure_circuit_breakers(failure_threshold=1, recovery_timeout=10, clock=clock)
+        breaker = get_shared_breakers().get("messages", SONNET)
+        breaker.record_failure(_status_error(529))
+        clock.now = 10
+
+        async def hang(**request):
+            await asyncio.Event().wait()
+
+        client = MagicMock()
+        client.messages.create = hang
+        request = {"model": SONNET, "max_tokens": 10, "messages": [{"role": "user", "content": "hi"}]}
+
+        async def main():
+            task = asyncio.ensure_future(create_message_async(client, **request))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+
+        assert breaker.state == "half_open"
+        breaker.allow()
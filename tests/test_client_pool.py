@@ -0,0 +1,146 @@
+"""
+Tests for the shared Anthropic client pool
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from claude_api_demos.client_pool import (
+    ClientPool,
+    configure_client_pool,
+    get_client_pool,
+    get_shared_client,
+)
+from claude_api_demos.transport_benchmark import format_results, run_benchmark
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestClientPool:
+    @patch.dict(os.environ, {'ANTHROPIC_API_KEY': 'test_key'})
+    def test_demo_classes_share_one_client(self):
+        """All demo classes get the same pooled client by default"""
+        from claude_api_demos import ClaudeClient, AdvancedClaudeDemo, RDAnalyticsAssistant
+
+        with patch('anthropic.Anthropic') as mock_anthropic:
+            first = ClaudeClient()
+            second = AdvancedClaudeDemo()
+            third = RDAnalyticsAssistant()
+
+        assert first.client is second.client is third.client
+        mock_anthropic.assert_called_once()
+
+    def test_clients_are_keyed_by_api_key(self):
+        """Different API keys get different clients over the same connections"""
+        with patch('anthropic.Anthropic') as mock_anthropic:
+            pool = ClientPool()
+            pool.get("key-a")
+            pool.get("key-b")
+            pool.get("key-a")
+
+        assert mock_anthropic.call_count == 2
+        http_clients = {call.kwargs["http_client"] for call in mock_anthropic.call_args_list}
+        assert len(http_clients) == 1
+        pool.close()
+
+    def test_configure_replaces_pool(self):
+        """configure_client_pool installs a new pool with the given limits"""
+        pool = configure_client_pool(max_connections=8, keepalive_expiry=5.0)
+        assert get_client_pool() is pool
+        assert pool.get_stats()["max_connections"] == 8
+        assert pool.get_stats()["keepalive_expiry"] == 5.0
+
+    def test_connection_reuse_is_measured(self):
+        """Keep-alive requests are counted as reused connections"""
+        server = HTTPServer(("127.0.0.1", 0), _OkHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        pool = ClientPool()
+        try:
+            http_client = pool._get_http_client()
+            url = f"http://127.0.0.1:{server.server_port}/"
+            for _ in range(3):
+                assert http_client.get(url).status_code == 200
+
+            stats = pool.get_stats()
+            assert stats["requests"] == 3
+            assert stats["new_connections"] == 1
+            assert stats["reused_connections"] == 2
+            assert stats["reuse_ratio"] == round(2 / 3, 4)
+        finally:
+            pool.close()
+            server.shutdown()
+            server.server_close()
+
+
+class TestTransportSettings:
+    def test_transport_options(self):
+        """Timeouts, HTTP/2 and proxy settings reach the httpx client options"""
+        pool = ClientPool(connect_timeout=2.0, read_timeout=30.0, proxy="http://127.0.0.1:8888")
+        options = pool.transport_options()
+        assert options["timeout"] == httpx.Timeout(30.0, connect=2.0)
+        assert options["proxy"] == "http://127.0.0.1:8888"
+        assert options["http2"] is False
+        assert pool.get_stats()["proxy"] is True
+
+    def test_http2_requires_h2(self):
+        with patch("importlib.util.find_spec", return_value=None):
+            with pytest.raises(ImportError, match="h2"):
+                ClientPool(http2=True)
+
+    def test_cleartext_http2_uses_prior_knowledge(self):
+        pytest.importorskip("h2")
+        pool = ClientPool(http2=True, base_url="http://127.0.0.1:9")
+        assert pool.transport_options()["http1"] is False
+        assert "http1" not in ClientPool(http2=True, base_url="https://api.anthropic.com").transport_options()
+
+    def test_sync_clients_stay_on_http1(self):
+        pytest.importorskip("h2")
+        pool = ClientPool(http2=True)
+        try:
+            options = pool.transport_options(asynchronous=False)
+            assert options["http2"] is False and "http1" not in options
+            assert pool.transport_options()["http2"] is True
+            pool.get("test_key")
+            assert pool._http_client._transport._pool._http2 is False
+        finally:
+            pool.close()
+
+
+class TestTransportBenchmark:
+    def test_http1_pool_against_stand_in_server(self):
+        results = run_benchmark(concurrency_levels=(1, 4), latency=0.01, requests_per_level=8,
+                                transports={"HTTP/1.1": {"max_connections": 4}})
+        assert [r["concurrency"] for r in results] == [1, 4]
+        assert all(r["http_versions"] == {"HTTP/1.1": 9} for r in results)
+        assert results[1]["connections"] <= 4
+        assert "HTTP/1.1" in format_results(results)
+
+    def test_http2_multiplexes_over_one_connection(self):
+        pytest.importorskip("h2")
+        results = run_benchmark(concurrency_levels=(8,), latency=0.01, requests_per_level=16,
+                                transports={"HTTP/2": {"http2": True}})
+        assert results[0]["http_versions"] == {"HTTP/2": 17}
+        assert results[0]["connections"] == 1
+
+    def test_http2_is_skipped_without_h2(self):
+        with patch("claude_api_demos.transport_benchmark.http2_available", return_value=False):
+            results = run_benchmark(concurrency_levels=(1,), transports={"HTTP/2": {"http2": True}})
+        assert results == [{"transport": "HTTP/2", "skipped": "h2 is not installed"}]
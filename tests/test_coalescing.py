@@ -0,0 +1,150 @@
+"""
+Tests for in-flight request coalescing
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, Mock
+
+import pytest
+
+from claude_api_demos.coalescing import SingleFlight, get_shared_singleflight
+from claude_api_demos.messaging import create_message
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+class TestSingleFlight:
+    def test_concurrent_threads_share_one_call(self):
+        """Threads asking for the same key while it runs get the leader's result"""
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait()
+            return "shared"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("k", fn))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        _wait_for(lambda: flight.get_stats()["calls"] == 5)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["shared"] * 5
+        assert len(calls) == 1
+        assert flight.get_stats()["merged"] == 4
+
+    def test_errors_are_shared_and_key_is_released(self):
+        """Waiters see the leader's error and the next call runs again"""
+        flight = SingleFlight()
+        with pytest.raises(RuntimeError):
+            flight.do("k", Mock(side_effect=RuntimeError("down")))
+        assert flight.do("k", lambda: "ok") == "ok"
+        assert flight.get_stats()["executed"] == 2
+
+    def test_async_callers_share_one_call(self):
+        """Concurrent coroutines with the same key share one execution"""
+        flight = SingleFlight()
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "shared"
+
+        async def run():
+            return await asyncio.gather(*(flight.do_async("k", fn) for _ in range(5)))
+
+        assert asyncio.run(run()) == ["shared"] * 5
+        assert len(calls) == 1
+        assert flight.get_stats()["merged"] == 4
+
+
+    def test_cancelled_leader_hands_the_call_to_a_waiter(self):
+        """Waiters are not cancelled with the leader; one of them runs the call again"""
+        flight = SingleFlight()
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "shared"
+
+        async def run():
+            leader = asyncio.ensure_future(flight.do_async("k", fn))
+            await asyncio.sleep(0)
+            waiters = [asyncio.ensure_future(flight.do_async("k", fn)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await asyncio.gather(*waiters)
+
+        assert asyncio.run(run()) == ["shared"] * 3
+        assert len(calls) == 2
+        assert flight.get_stats()["in_flight"] == 0
+
+    def test_interrupted_thread_leader_hands_the_call_to_a_waiter(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def interrupted():
+            started.set()
+            release.wait()
+            raise KeyboardInterrupt
+
+        def leader():
+            with pytest.raises(KeyboardInterrupt):
+                flight.do("k", interrupted)
+
+        results = []
+        threads = [threading.Thread(target=leader)]
+        threads[0].start()
+        started.wait()
+        threads.append(threading.Thread(target=lambda: results.append(flight.do("k", lambda: "again"))))
+        threads[1].start()
+        _wait_for(lambda: flight.get_stats()["merged"] == 1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["again"]
+
+
+class TestCreateMessageCoalescing:
+    def test_identical_requests_are_merged(self):
+        """Identical concurrent create_message calls hit the API once"""
+        client = MagicMock()
+        release = threading.Event()
+        response = Mock(usage=None)
+
+        def create(**kwargs):
+            release.wait()
+            return response
+
+        client.messages.create.side_effect = create
+        request = {"model": "m", "max_tokens": 10, "messages": [{"role": "user", "content": "hi"}]}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(create_message(client, **request)))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        _wait_for(lambda: get_shared_singleflight().get_stats()["calls"] == 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == [response] * 3
+        client.messages.create.assert_called_once()
@@ -0,0 +1,198 @@
+"""
+Tests for AST-aware chunking and map-reduce analysis
+"""
+
+import ast
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from claude_api_demos.advanced_demo import AdvancedClaudeDemo
+from claude_api_demos.code_chunker import CHARS_PER_TOKEN, chunk_python_source, map_reduce
+
+MODULE = '''"""Sample module"""
+
+import os
+from typing import List
+
+LIMIT = 10
+
+
+def first(values: List[int]) -> int:
+    """Return the first value"""
+    return values[0]
+
+
+class Store:
+    """Keeps values"""
+
+    def __init__(self):
+        self.values = []
+
+    def add(self, value):
+        self.values.append(value)
+        return len(self.values)
+
+    def path(self):
+        return os.path.join("a", "b")
+
+
+def last(values):
+    # The last value
+    return values[-1]
+'''
+
+
+def _response(text):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], stop_reason="end_turn",
+                           usage=SimpleNamespace(input_tokens=10, output_tokens=20))
+
+
+class TestChunkPythonSource:
+    def test_small_source_is_one_chunk(self):
+        chunks = chunk_python_source(MODULE, 10_000)
+
+        assert len(chunks) == 1
+        assert chunks[0].text == MODULE
+
+    def test_splits_on_definition_boundaries_within_budget(self):
+        budget = 120
+        chunks = chunk_python_source(MODULE, budget)
+
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert len(chunk.text) // CHARS_PER_TOKEN <= budget
+            assert "import os" in chunk.text and "LIMIT = 10" in chunk.text
+        joined = "".join(chunk.code for chunk in chunks)
+        for name in ("def first", "class Store", "def __init__", "def add", "def path", "def last"):
+            assert joined.count(name) == 1
+        assert "import os" not in joined
+
+    def test_oversized_class_is_split_by_method_with_its_header(self):
+        chunks = chunk_python_source(MODULE, 90)
+
+        method_chunks = [chunk for chunk in chunks if any(name.startswith("def Store.") for name in chunk.names)]
+        assert len(method_chunks) > 1
+        assert all("class Store:" in chunk.context for chunk in method_chunks)
+        for chunk in method_chunks:
+            # Each part still parses once dedented, so no method was cut in half
+            ast.parse("class Store:\n" + chunk.code)
+
+    def test_line_numbers_point_into_the_source(self):
+        lines = MODULE.splitlines(keepends=True)
+        for chunk in chunk_python_source(MODULE, 120):
+            assert chunk.code.startswith(lines[chunk.start_line - 1])
+            assert chunk.code.endswith(lines[chunk.end_line - 1])
+
+    def test_globals_beyond_the_context_budget_are_chunked(self):
+        source = "".join(f"value_{i} = {i}\n" for i in range(100))
+
+        chunks = chunk_python_source(source, 100)
+
+        assert len(chunks) > 1
+        assert "".join(chunk.code for chunk in chunks) == source
+
+    def test_unparsable_source_is_split_by_lines(self):
+        source = "def broken(:\n" + "x = 1\n" * 200
+
+        chunks = chunk_python_source(source, 100)
+
+        assert len(chunks) > 1
+        assert "".join(chunk.code for chunk in chunks) == source
+
+
+class TestMapReduce:
+    def test_parts_run_in_parallel_then_merge(self):
+        chunks = chunk_python_source(MODULE, 120)
+
+        def ask(prompt):
+            if prompt.startswith("merge"):
+                return f"merged {prompt.count('## Part')}"
+            time.sleep(0.1)
+            return "part"
+
+        started = time.monotonic()
+        result = map_reduce(chunks, lambda chunk: chunk.text, ask, lambda partials: "merge\n" + "\n".join(partials))
+
+        assert result == f"merged {len(chunks)}"
+        assert time.monotonic() - started < 0.1 * len(chunks)
+
+    def test_without_reduce_the_parts_are_joined_in_order(self):
+        chunks = chunk_python_source(MODULE, 120)
+
+        result = map_reduce(chunks, lambda chunk: chunk.label, lambda prompt: f"<{prompt}>")
+
+        assert [line for line in result.splitlines() if line.startswith("<")] == [f"<{c.label}>" for c in chunks]
+
+    def test_failed_parts_are_reported_unless_all_fail(self):
+        chunks = chunk_python_source(MODULE, 120)
+        failing = chunks[0].label
+
+        def ask(prompt):
+            if prompt == failing:
+                raise ValueError("overloaded")
+            return "fine"
+
+        result = map_reduce(chunks, lambda chunk: chunk.label, ask)
+        assert "could not be analyzed: overloaded" in result
+
+        def down(prompt):
+            raise ValueError("down")
+
+        with pytest.raises(ValueError):
+            map_reduce(chunks, lambda chunk: chunk.label, down)
+
+    def test_large_partials_are_merged_in_groups(self):
+        chunks = chunk_python_source(MODULE, 120)
+        merges = []
+        lock = threading.Lock()
+
+        def ask(prompt):
+            if prompt.startswith("merge"):
+                with lock:
+                    merges.append(prompt)
+                return "m"
+            return "x" * 300
+
+        result = map_reduce(chunks, lambda chunk: chunk.text, ask,
+                            lambda partials: "merge\n" + "\n".join(partials), reduce_tokens=150)
+
+        assert result == "m"
+        assert len(merges) > 2
+
+
+class TestChunkedCallers:
+    def setup_method(self):
+        with patch("anthropic.Anthropic"):
+            self.demo = AdvancedClaudeDemo(api_key="test_key")
+        self.demo.CHUNK_TOKENS = 120
+        self.client = self.demo.client
+
+    def test_review_merges_analysis_and_joins_code(self, tmp_path):
+        source = tmp_path / "module.py"
+        source.write_text(MODULE)
+
+        def create(**request):
+            prompt = request["messages"][0]["content"]
+            return _response("merged review" if prompt.startswith("These are review") else "part")
+
+        self.client.messages.create.side_effect = create
+        results = self.demo.code_review_and_refactor(str(source), passes=["review", "refactor"])
+
+        assert results["review"] == "merged review"
+        assert results["refactor"].count("part") == len(chunk_python_source(MODULE, 120))
+        assert self.demo.last_review_usage["requests"] == self.client.messages.create.call_count
+
+    def test_explanation_of_large_code_is_merged(self):
+        def create(**request):
+            prompt = request["messages"][0]["content"]
+            return _response("whole module" if prompt.startswith("These explain") else "one part")
+
+        self.client.messages.create.side_effect = create
+        result = self.demo.explain_complex_code(MODULE)
+
+        assert result == "whole module"
+        assert self.client.messages.create.call_count == len(chunk_python_source(MODULE, 120)) + 1
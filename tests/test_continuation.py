@@ -0,0 +1,97 @@
+"""
+Tests for continuation of truncated responses
+"""
+
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from claude_api_demos.continuation import (
+    ContinuedMessage,
+    close_open_fence,
+    create_complete_message,
+    join_continuation,
+)
+from claude_api_demos.rd_analytics_demo import extract_text_from_content
+from claude_api_demos.real_world_demo import RealWorldClaudeDemo
+
+SONNET = "claude-3-5-sonnet-20241022"
+
+
+def _response(text, stop_reason="end_turn", input_tokens=50, output_tokens=100):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], stop_reason=stop_reason,
+                           usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens))
+
+
+REQUEST = {"model": SONNET, "max_tokens": 100, "messages": [{"role": "user", "content": "write code"}]}
+
+
+class TestJoining:
+    def test_plain_join(self):
+        assert join_continuation("def f():", "\n    return 1") == "def f():\n    return 1"
+
+    def test_repeated_overlap_is_dropped(self):
+        previous = "Step one is complete and we move on to the next part of"
+        addition = "we move on to the next part of the plan."
+        assert join_continuation(previous, addition) == "Step one is complete and we move on to the next part of the plan."
+
+    def test_open_fence_is_closed(self):
+        assert close_open_fence("```python\nx = 1") == "```python\nx = 1\n```\n"
+        assert close_open_fence("```python\nx = 1\n```") == "```python\nx = 1\n```"
+
+
+class TestCreateCompleteMessage:
+    def test_complete_response_is_returned_unchanged(self):
+        client = MagicMock()
+        first = _response("done")
+        client.messages.create.return_value = first
+
+        assert create_complete_message(client, **REQUEST) is first
+        assert client.messages.create.call_count == 1
+
+    def test_truncated_response_is_continued_with_prefill(self):
+        """Follow-ups prefill the partial answer and the pieces are joined"""
+        client = MagicMock()
+        client.messages.create.side_effect = [
+            _response("```python\ndef f():\n", "max_tokens"),
+            _response("\n    return 1\n```\nDone.", "end_turn"),
+        ]
+
+        result = create_complete_message(client, **REQUEST)
+
+        assert isinstance(result, ContinuedMessage)
+        assert result.content[0].text == "```python\ndef f():\n    return 1\n```\nDone."
+        assert extract_text_from_content(result.content) == result.content[0].text
+        assert result.continuations == 1
+        assert result.stop_reason == "end_turn"
+        assert (result.usage.input_tokens, result.usage.output_tokens) == (100, 200)
+        follow_up = client.messages.create.call_args_list[1].kwargs["messages"]
+        assert follow_up[-1] == {"role": "assistant", "content": "```python\ndef f():"}
+
+    def test_token_cap_stops_and_closes_fence(self):
+        """At the cap the text is returned with its open fence closed"""
+        client = MagicMock()
+        client.messages.create.side_effect = [
+            _response("```python\nx = 1\n", "max_tokens", output_tokens=100),
+            _response("\ny = 2\n", "max_tokens", output_tokens=50),
+        ]
+
+        result = create_complete_message(client, max_output_tokens=150, **REQUEST)
+
+        assert client.messages.create.call_count == 2
+        assert client.messages.create.call_args_list[1].kwargs["max_tokens"] == 50
+        assert result.stop_reason == "max_tokens"
+        assert result.content[0].text.endswith("y = 2\n```\n")
+
+    @patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test_key"})
+    @patch("anthropic.Anthropic")
+    def test_api_client_builder_returns_whole_answer(self, mock_anthropic):
+        client = mock_anthropic.return_value
+        client.messages.create.side_effect = [
+            _response("class Client:\n    pass", "max_tokens"),
+            _response("\n\nclient = Client()", "end_turn"),
+        ]
+
+        result = RealWorldClaudeDemo().api_client_builder("A todo API")
+
+        assert result == "class Client:\n    pass\n\nclient = Client()"
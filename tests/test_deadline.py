@@ -0,0 +1,169 @@
+"""
+Tests for deadline propagation
+"""
+
+import os
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import anthropic
+import httpx
+import pytest
+
+from claude_api_demos.basic_demo import ClaudeClient
+from claude_api_demos.circuit_breaker import get_shared_breakers
+from claude_api_demos.continuation import create_complete_message
+from claude_api_demos.deadline import (
+    DeadlineExceeded,
+    deadline_scope,
+    expired,
+    is_partial,
+    remaining,
+    with_deadline,
+)
+from claude_api_demos.messaging import create_message
+from claude_api_demos.rate_limiter import RateLimiter
+from claude_api_demos.retry import configure_retry_policy
+
+HAIKU = "claude-3-5-haiku-20241022"
+REQUEST = {"model": HAIKU, "max_tokens": 100, "messages": [{"role": "user", "content": "hi"}]}
+
+
+def _response(text="ok", stop_reason="end_turn"):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], stop_reason=stop_reason,
+                           usage=SimpleNamespace(input_tokens=10, output_tokens=20))
+
+
+def _overloaded():
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(529, request=request, headers={"retry-after": "5"})
+    return anthropic.APIStatusError("overloaded", response=response, body=None)
+
+
+class TestDeadlineScope:
+    def test_nested_scopes_only_shorten(self):
+        assert remaining() is None
+        with deadline_scope(10):
+            with deadline_scope(60):
+                assert remaining() <= 10
+            with deadline_scope(0.5):
+                assert remaining() <= 0.5
+        assert remaining() is None
+
+    def test_with_deadline_flags_results_that_ran_out(self):
+        @with_deadline
+        def slow():
+            time.sleep(0.02)
+            return {"answer": 42}
+
+        @with_deadline
+        def fast():
+            return "done"
+
+        assert is_partial(slow(deadline=0.01))
+        assert not is_partial(slow())
+        assert not is_partial(fast(deadline=5))
+
+    def test_generator_stops_yielding_after_deadline(self):
+        @with_deadline
+        def chunks():
+            for i in range(100):
+                time.sleep(0.01)
+                yield i
+
+        assert len(list(chunks(deadline=0.05))) < 10
+        assert not expired()
+
+
+class TestRequestPath:
+    def test_http_timeout_is_the_time_left(self):
+        client = MagicMock()
+        client.messages.create.return_value = _response()
+
+        create_message(client, **REQUEST)
+        assert "timeout" not in client.messages.create.call_args.kwargs
+
+        with deadline_scope(5):
+            create_message(client, coalesce=False, **REQUEST)
+        assert 0 < client.messages.create.call_args.kwargs["timeout"] <= 5
+
+    def test_expired_deadline_fails_fast(self):
+        client = MagicMock()
+        with deadline_scope(0):
+            with pytest.raises(DeadlineExceeded):
+                create_message(client, **REQUEST)
+        client.messages.create.assert_not_called()
+
+    def test_no_retry_that_the_deadline_cannot_cover(self):
+        configure_retry_policy(max_attempts=4)
+        client = MagicMock()
+        client.messages.create.side_effect = _overloaded()
+
+        started = time.monotonic()
+        with deadline_scope(1):
+            with pytest.raises(anthropic.APIStatusError):
+                create_message(client, **REQUEST)
+        assert time.monotonic() - started < 1
+        assert client.messages.create.call_count == 1
+
+    def test_own_timeout_is_not_a_backend_failure(self):
+        client = MagicMock()
+
+        def hang(**request):
+            time.sleep(request["timeout"])
+            raise anthropic.APITimeoutError(httpx.Request("POST", "https://api.anthropic.com/v1/messages"))
+
+        client.messages.create.side_effect = hang
+        with deadline_scope(0.05):
+            with pytest.raises(DeadlineExceeded):
+                create_message(client, **REQUEST)
+        breaker = get_shared_breakers().get("messages", HAIKU).get_stats()
+        assert breaker["failures"] == 0
+
+    def test_rate_limit_wait_beyond_deadline_is_refused_and_refunded(self):
+        limiter = RateLimiter(requests_per_minute=1)
+        limiter.acquire(1, 1)
+        before = limiter.buckets["requests"].level
+        with pytest.raises(DeadlineExceeded):
+            limiter.acquire(1, 1, max_wait=1.0)
+        assert limiter.buckets["requests"].level == pytest.approx(before, abs=0.01)
+
+
+class TestPartialResults:
+    def test_continuation_returns_text_so_far(self):
+        client = MagicMock()
+
+        def truncated(**request):
+            time.sleep(0.03)
+            return _response("part one ", "max_tokens")
+
+        client.messages.create.side_effect = truncated
+        with deadline_scope(0.05):
+            result = create_complete_message(client, **REQUEST)
+
+        assert result.deadline_exceeded
+        assert result.content[0].text.startswith("part one")
+        assert client.messages.create.call_count <= 2
+
+    @patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test_key"})
+    @patch("anthropic.Anthropic")
+    def test_public_method_returns_flagged_result(self, mock_anthropic):
+        client = ClaudeClient()
+        answer = client.chat("hello", model=HAIKU, deadline=0)
+        assert is_partial(answer)
+        assert answer.startswith("Error:")
+        mock_anthropic.return_value.messages.create.assert_not_called()
+
+    @patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test_key"})
+    @patch("anthropic.Anthropic")
+    def test_rd_pipeline_skips_steps_after_its_deadline(self, mock_anthropic, tmp_path, monkeypatch):
+        from claude_api_demos.rd_analytics_demo import demonstrate_rd_analytics
+
+        monkeypatch.chdir(tmp_path)
+        steps = demonstrate_rd_analytics(deadline=0)
+
+        assert is_partial(steps)
+        assert steps["analysis"]["skipped"]
+        assert steps["multilingual_summary"]["skipped"]
+        mock_anthropic.return_value.messages.create.assert_not_called()
@@ -0,0 +1,190 @@
+"""
+Tests for diff-only code review
+"""
+
+import subprocess
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from claude_api_demos.advanced_demo import AdvancedClaudeDemo
+from claude_api_demos.bulkhead import BATCH, current_traffic_class
+from claude_api_demos.diff_review import (diff_hunks, enclosing_signatures, map_findings, pack_hunks,
+                                          parse_unified_diff)
+
+BASE = '''import os
+
+
+class Store:
+    """Keeps values"""
+
+    def __init__(self):
+        self.values = []
+
+    def add(self, value: int,
+            check: bool = True) -> int:
+        if check:
+            assert value >= 0
+        self.values.append(value)
+        return len(self.values)
+
+
+def helper():
+    return os.getcwd()
+''' + "".join(f"\n\ndef filler_{i}():\n    return {i}\n" for i in range(40))
+
+DIFF = '''diff --git a/pkg/a.py b/pkg/a.py
+index 1111111..2222222 100644
+--- a/pkg/a.py
++++ b/pkg/a.py
+@@ -10,3 +10,4 @@ class Store:
+     def add(self, value):
+-        self.values.append(value)
++        if value is not None:
++            self.values.append(value)
+         return len(self.values)
+diff --git a/gone.py b/gone.py
+deleted file mode 100644
+--- a/gone.py
++++ /dev/null
+@@ -1,2 +0,0 @@
+-x = 1
+-y = 2
+diff --git a/new.py b/new.py
+new file mode 100644
+--- /dev/null
++++ b/new.py
+@@ -0,0 +1 @@
++z = 3
+'''
+
+
+def _git(root, *args):
+    subprocess.run(["git", "-C", str(root), "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                   check=True, capture_output=True)
+
+
+def _tool_response(findings):
+    block = SimpleNamespace(type="tool_use", name="report_findings", input={"findings": findings})
+    return SimpleNamespace(content=[block], stop_reason="tool_use",
+                           usage=SimpleNamespace(input_tokens=10, output_tokens=20))
+
+
+class TestParseUnifiedDiff:
+    def test_hunks_and_new_line_numbers(self):
+        hunks = parse_unified_diff(DIFF)
+
+        assert [(hunk.path, hunk.new_lines) for hunk in hunks] == [("pkg/a.py", (10, 13)), ("new.py", (1, 1))]
+        text = hunks[0].text.splitlines()
+        assert text[1] == "   10     def add(self, value):"
+        assert text[2] == "     -        self.values.append(value)"
+        assert text[3] == "   11+        if value is not None:"
+        assert text[-1] == "   13         return len(self.values)"
+
+
+    def test_lines_that_look_like_file_headers(self):
+        diff = ("diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n"
+                "@@ -1,2 +1,2 @@\n x = 1\n--- old comment line\n+++ new\n"
+                "diff --git a/gone.py b/gone.py\n--- a/gone.py\n+++ /dev/null\n"
+                "@@ -1 +0,0 @@\n-++ b/evil.py\n"
+                "diff --git a/b.py b/b.py\n--- a/b.py\n+++ b/b.py\n@@ -1 +1 @@\n-y = 1\n+y = 2\n")
+
+        hunks = parse_unified_diff(diff)
+
+        assert [hunk.path for hunk in hunks] == ["a.py", "b.py"]
+        assert hunks[0].lines == [" x = 1", "--- old comment line", "+++ new"]
+        assert hunks[1].lines == ["-y = 1", "+y = 2"]
+
+
+class TestEnclosingSignatures:
+    def test_nested_definitions_outermost_first(self):
+        signatures = enclosing_signatures(BASE, 13, 14)
+
+        assert signatures == ["class Store:", "def add(self, value: int, check: bool = True) -> int:"]
+
+    def test_module_level_and_unparsable_source(self):
+        assert enclosing_signatures(BASE, 1, 1) == []
+        assert enclosing_signatures("def broken(:\n", 1, 1) == []
+
+
+class TestPackAndMap:
+    def test_packing_respects_the_budget(self):
+        hunks = parse_unified_diff(DIFF) * 5
+        budget = len(hunks[0].text) // 3 + 5
+
+        batches = pack_hunks(hunks, budget)
+
+        assert sum(len(batch) for batch in batches) == len(hunks)
+        assert all(sum(len(hunk.text) // 3 for hunk in batch) <= budget for batch in batches if len(batch) > 1)
+        assert len(batches) > 1
+
+    def test_findings_are_checked_against_the_hunks(self):
+        hunks = parse_unified_diff(DIFF)
+        findings, dropped = map_findings([
+            {"path": "pkg/a.py", "line": 11, "severity": "error", "message": "inside"},
+            {"path": "pkg/a.py", "line": 40, "severity": "warning", "message": "outside"},
+            {"path": "other.py", "line": 1, "severity": "error", "message": "not sent"},
+            {"path": "new.py", "message": "no line"},
+        ], hunks)
+
+        assert findings[0] == {"path": "pkg/a.py", "line": 11, "severity": "error", "message": "inside"}
+        assert findings[1]["line"] == 13 and findings[1]["approximate"]
+        assert dropped == 2
+
+
+class TestReviewDiff:
+    def setup_method(self):
+        with patch("anthropic.Anthropic"):
+            self.demo = AdvancedClaudeDemo(api_key="test_key")
+        self.client = self.demo.client
+
+    def _repo(self, tmp_path):
+        (tmp_path / "a.py").write_text(BASE)
+        (tmp_path / "b.py").write_text("x = 1\n")
+        _git(tmp_path, "init", "-q")
+        _git(tmp_path, "add", ".")
+        _git(tmp_path, "commit", "-q", "-m", "base")
+        (tmp_path / "a.py").write_text(BASE.replace("assert value >= 0", "raise ValueError(value)"))
+        _git(tmp_path, "commit", "-q", "-am", "change")
+
+    def test_sends_only_the_hunks_and_maps_findings(self, tmp_path):
+        self._repo(tmp_path)
+
+        def create(**request):
+            prompt = request["messages"][0]["content"]
+            assert "def filler_30" not in prompt
+            assert "def add(self, value: int, check: bool = True) -> int:  # enclosing" in prompt
+            assert request["tool_choice"] == {"type": "tool", "name": "report_findings"}
+            assert current_traffic_class() == BATCH
+            return _tool_response([{"path": "a.py", "line": 14, "severity": "suggestion", "message": "say why"}])
+
+        self.client.messages.create.side_effect = create
+        result = self.demo.review_diff("HEAD~1", "HEAD", root=str(tmp_path), context_lines=1)
+
+        assert (result["files"], result["hunks"], result["requests"]) == (1, 1, 1)
+        assert result["findings"] == [{"path": "a.py", "line": 14, "severity": "suggestion", "message": "say why"}]
+        assert result["prompt_tokens"] * 2 < result["full_file_tokens"]
+
+    def test_working_tree_changes_and_failed_requests(self, tmp_path):
+        self._repo(tmp_path)
+        (tmp_path / "b.py").write_text("x = 2\n")
+        self.client.messages.create.side_effect = ValueError("overloaded")
+
+        result = self.demo.review_diff("HEAD", root=str(tmp_path), max_request_tokens=1)
+
+        assert (result["hunks"], result["requests"]) == (1, 0)
+        assert result["errors"] == ["b.py: overloaded"]
+
+    def test_unknown_ref(self, tmp_path):
+        self._repo(tmp_path)
+
+        result = self.demo.review_diff("no-such-ref", root=str(tmp_path))
+
+        assert result["error"].startswith("Failed to read the diff")
+
+    def test_diff_hunks_reads_the_head_version(self, tmp_path):
+        self._repo(tmp_path)
+        (tmp_path / "a.py").write_text("# uncommitted\n")
+
+        hunks = diff_hunks(tmp_path, "HEAD~1", "HEAD", context_lines=1)
+
+        assert hunks[0].enclosing[0] == "class Store:"
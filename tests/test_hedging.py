@@ -0,0 +1,165 @@
+"""
+Tests for hedged requests
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+from claude_api_demos.basic_demo import ClaudeClient
+from claude_api_demos.hedging import HedgePolicy
+from claude_api_demos.rate_limiter import estimate_request_tokens
+
+SONNET = "claude-3-5-sonnet-20241022"
+
+
+class FakeStream:
+    """Stand-in for the SDK MessageStream that waits before its first token"""
+
+    def __init__(self, delay, text):
+        self.delay = delay
+        self.text = text
+        self.closed = threading.Event()
+        self.current_message_snapshot = SimpleNamespace(
+            usage=SimpleNamespace(input_tokens=100, output_tokens=1), content=[]
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @property
+    def text_stream(self):
+        if self.closed.wait(self.delay):
+            raise RuntimeError("stream closed")
+        for word in self.text.split():
+            self.current_message_snapshot.content = [SimpleNamespace(text=word * 8)]
+            yield word
+
+    def get_final_message(self):
+        return SimpleNamespace(content=[SimpleNamespace(text=self.text)], stop_reason="end_turn",
+                               usage=SimpleNamespace(input_tokens=100, output_tokens=5))
+
+    def close(self):
+        self.closed.set()
+
+
+class FakeClient:
+    """Client whose streams start after the given delays, one per call"""
+
+    def __init__(self, *delays):
+        self.delays = list(delays)
+        self.streams = []
+        self.messages = self
+        self.lock = threading.Lock()
+
+    def stream(self, **request):
+        with self.lock:
+            index = len(self.streams)
+            stream = FakeStream(self.delays[index], f"answer {index}")
+            self.streams.append(stream)
+        return stream
+
+
+class SlowOpeningClient(FakeClient):
+    """Client whose second stream does not open until released"""
+
+    def __init__(self, *delays):
+        super().__init__(*delays)
+        self.opened = threading.Event()
+
+    def stream(self, **request):
+        if self.streams:
+            self.opened.wait(5)
+        return super().stream(**request)
+
+
+def _warmed_policy(samples=20, latency=0.01, **kwargs):
+    policy = HedgePolicy(min_samples=samples, min_delay=0.01, **kwargs)
+    for _ in range(samples):
+        policy.record_latency(latency)
+    return policy
+
+
+REQUEST = {"model": SONNET, "max_tokens": 100, "messages": [{"role": "user", "content": "hi"}]}
+
+
+class TestHedgePolicy:
+    def test_no_hedging_without_latency_history(self):
+        """With too few samples the request is sent once"""
+        client = FakeClient(0.05)
+        policy = HedgePolicy(min_samples=5)
+
+        result = policy.create(client, **REQUEST)
+
+        assert result.content[0].text == "answer 0"
+        assert len(client.streams) == 1
+        assert policy.get_stats()["hedged"] == 0
+
+    def test_slow_request_is_hedged_and_loser_cancelled(self):
+        """A request stuck past the percentile is duplicated; the duplicate wins"""
+        client = FakeClient(2.0, 0.0)
+        policy = _warmed_policy(budget=1.0)
+
+        started = time.monotonic()
+        result = policy.create(client, **REQUEST)
+
+        assert time.monotonic() - started < 1.0
+        assert result.content[0].text == "answer 1"
+        assert client.streams[0].closed.is_set()
+        stats = policy.get_stats()
+        assert stats["hedged"] == 1
+        assert stats["hedge_wins"] == 1
+        assert stats["cancelled"] == 1
+        assert stats["extra_input_tokens"] == 100
+        assert stats["extra_cost"] > 0
+
+    def test_budget_limits_hedges(self):
+        """With a 5% budget the first 19 calls are never hedged"""
+        policy = _warmed_policy(budget=0.05)
+        client = FakeClient(*([0.05] * 19))
+
+        for _ in range(19):
+            policy.create(client, **REQUEST)
+
+        assert len(client.streams) == 19
+        assert policy.get_stats()["hedged"] == 0
+
+    def test_primary_can_still_win(self):
+        """If the original finishes first the hedge is cancelled instead"""
+        client = FakeClient(0.05, 2.0)
+        policy = _warmed_policy(budget=1.0)
+
+        result = policy.create(client, **REQUEST)
+
+        assert result.content[0].text == "answer 0"
+        assert client.streams[1].closed.is_set()
+        assert policy.get_stats()["hedge_wins"] == 0
+
+
+    def test_hedge_cancelled_before_its_stream_opens_is_charged(self):
+        """A copy that was sent but never opened its stream still pays for its input"""
+        client = SlowOpeningClient(0.05, 0.0)
+        policy = _warmed_policy(budget=1.0)
+
+        try:
+            result = policy.create(client, **REQUEST)
+
+            assert result.content[0].text == "answer 0"
+            stats = policy.get_stats()
+            assert stats["cancelled"] == 1
+            assert stats["extra_input_tokens"] == estimate_request_tokens(REQUEST)
+            assert stats["extra_cost"] > 0
+        finally:
+            client.opened.set()
+
+
+class TestHedgedClient:
+    def test_chat_uses_hedge_policy(self):
+        """ClaudeClient sends through the hedge policy when one is configured"""
+        client = ClaudeClient(api_key="test_key", hedge=_warmed_policy(budget=1.0))
+        client.client = FakeClient(2.0, 0.0)
+
+        assert client.chat("hi", model=SONNET) == "answer 1"
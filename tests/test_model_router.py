@@ -0,0 +1,150 @@
+"""
+Tests for the cost- and complexity-aware model router
+"""
+
+import asyncio
+import os
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+
+from claude_api_demos.basic_demo import ClaudeClient
+from claude_api_demos.model_router import (
+    MODEL_TIERS,
+    ModelRouter,
+    complexity_score,
+)
+from claude_api_demos.cost_tracker import CostTracker
+
+HAIKU, SONNET, OPUS = MODEL_TIERS
+
+
+def _response(text="ok", stop_reason="end_turn"):
+    response = Mock()
+    response.content = [Mock(text=text)]
+    response.stop_reason = stop_reason
+    return response
+
+
+def _client(*responses):
+    client = MagicMock()
+    client.messages.create.side_effect = list(responses)
+    return client
+
+
+class TestRouting:
+    def test_tiers_are_priced_cheapest_first(self):
+        """Every tier has a price and each is more expensive than the last"""
+        prices = [CostTracker.PRICING[model]["input"] for model in MODEL_TIERS]
+        assert prices == sorted(prices)
+
+    def test_simple_chat_goes_to_cheapest_model(self):
+        router = ModelRouter()
+        tier, reason = router.choose("chat", {"messages": [{"role": "user", "content": "What is a list?"}]})
+        assert (MODEL_TIERS[tier], reason) == (HAIKU, "task:chat")
+
+    def test_complex_or_large_prompts_skip_cheapest_model(self):
+        router = ModelRouter(large_input_tokens=100)
+        complex_prompt = "Review the architecture for race condition and security issues"
+        assert router.choose("chat", {"messages": [{"role": "user", "content": complex_prompt}]}) == (1, "complex")
+        assert router.choose("chat", {"messages": [{"role": "user", "content": "x" * 1000}]}) == (1, "large-input")
+        assert router.choose("code", {"messages": [{"role": "user", "content": "hi"}]}) == (1, "task:code")
+
+    def test_complexity_score(self):
+        code = "```python\n" + "x = 1\n" * 80 + "```"
+        assert complexity_score("hello") == 0
+        assert complexity_score(code) == 1
+        assert complexity_score(code + " optimize the design") == 3
+
+
+class TestEscalation:
+    def test_truncated_answer_is_escalated(self):
+        """A cheap answer cut off at max_tokens is retried on the stronger model"""
+        client = _client(_response("partial", "max_tokens"), _response("complete"))
+        router = ModelRouter()
+
+        response = router.send(client, task="chat", messages=[{"role": "user", "content": "hi"}])
+
+        assert response.content[0].text == "complete"
+        models = [call.kwargs["model"] for call in client.messages.create.call_args_list]
+        assert models == [HAIKU, SONNET]
+        stats = router.get_stats()
+        assert stats["escalations"] == 1
+        assert stats["escalation_rate"] == 1.0
+        assert stats["escalation_reasons"] == {"truncated": 1}
+        assert stats["routes"] == {f"chat -> {SONNET}": 1}
+        assert stats["recent"][0]["models"] == [HAIKU, SONNET]
+
+    def test_truncated_answer_gets_more_room(self):
+        """The stronger model is not cut off at the same max_tokens"""
+        client = _client(_response("partial", "max_tokens"), _response("complete"))
+        router = ModelRouter()
+
+        router.send(client, task="chat", messages=[{"role": "user", "content": "hi"}])
+
+        limits = [call.kwargs["max_tokens"] for call in client.messages.create.call_args_list]
+        assert limits == [1000, 2000]
+
+    def test_rejected_answer_is_escalated(self):
+        client = _client(_response("maybe"), _response("yes"))
+        router = ModelRouter()
+
+        def yes_or_no(text):
+            return None if text in ("yes", "no") else "not yes or no"
+
+        response = router.send(client, task="chat", validate=yes_or_no,
+                               messages=[{"role": "user", "content": "yes or no?"}])
+
+        assert response.content[0].text == "yes"
+        assert router.get_stats()["escalation_reasons"] == {"not yes or no": 1}
+        limits = [call.kwargs["max_tokens"] for call in client.messages.create.call_args_list]
+        assert limits[0] == limits[1]
+
+    def test_escalation_is_capped(self):
+        """With one escalation allowed, a second bad answer is returned as is"""
+        client = _client(_response("a", "max_tokens"), _response("b", "max_tokens"), _response("c"))
+        router = ModelRouter(max_escalations=1)
+
+        response = router.send(client, task="chat", messages=[{"role": "user", "content": "hi"}])
+
+        assert response.content[0].text == "b"
+        assert client.messages.create.call_count == 2
+
+    def test_good_answer_is_not_escalated(self):
+        client = _client(_response("fine"))
+        router = ModelRouter()
+
+        router.send(client, task="chat", messages=[{"role": "user", "content": "hi"}])
+
+        assert router.get_stats()["escalation_rate"] == 0.0
+        assert client.messages.create.call_args.kwargs["model"] == HAIKU
+
+    def test_async_send_escalates(self):
+        client = MagicMock()
+        client.messages.create = AsyncMock(side_effect=[_response("x", "max_tokens"), _response("done")])
+        router = ModelRouter()
+
+        response = asyncio.run(router.send_async(client, task="chat",
+                                                 messages=[{"role": "user", "content": "hi"}]))
+
+        assert response.content[0].text == "done"
+        assert router.get_stats()["escalations"] == 1
+
+
+class TestRoutedClients:
+    @patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test_key"})
+    @patch("anthropic.Anthropic")
+    def test_chat_without_model_is_routed(self, mock_anthropic):
+        client = mock_anthropic.return_value
+        client.messages.create.return_value = _response("hi there")
+
+        assert ClaudeClient().chat("Hello") == "hi there"
+        assert client.messages.create.call_args.kwargs["model"] == HAIKU
+
+    @patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test_key"})
+    @patch("anthropic.Anthropic")
+    def test_explicit_model_bypasses_router(self, mock_anthropic):
+        client = mock_anthropic.return_value
+        client.messages.create.return_value = _response("hi there")
+
+        ClaudeClient().chat("Hello", model=OPUS)
+
+        assert client.messages.create.call_args.kwargs["model"] == OPUS
@@ -0,0 +1,122 @@
+"""
+Tests for prompt caching helpers
+"""
+
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, Mock, patch
+
+from claude_api_demos.advanced_demo import AdvancedClaudeDemo
+from claude_api_demos.interactive_demo import ClaudeDeveloperAssistant
+from claude_api_demos.messaging import create_message
+from claude_api_demos.prompt_cache import (
+    PromptCacheStats,
+    build_cached_content,
+    get_prompt_cache_stats,
+    place_cache_breakpoints,
+)
+
+
+def _response(text="ok", **usage):
+    response = Mock()
+    response.content = [Mock(text=text)]
+    response.usage = SimpleNamespace(input_tokens=usage.get("input_tokens", 10), output_tokens=5,
+                                     cache_creation_input_tokens=usage.get("cache_creation_input_tokens", 0),
+                                     cache_read_input_tokens=usage.get("cache_read_input_tokens", 0))
+    return response
+
+
+class TestBreakpoints:
+    def test_shared_part_comes_first_and_is_cached(self):
+        """The shared prefix is the first block and carries the breakpoint"""
+        blocks = build_cached_content("big file", "review it")
+        assert blocks[0] == {"type": "text", "text": "big file", "cache_control": {"type": "ephemeral"}}
+        assert blocks[1] == {"type": "text", "text": "review it"}
+
+    def test_marks_latest_user_turns_without_mutating_history(self):
+        """The two newest user turns get a breakpoint; the input is unchanged"""
+        history = [
+            {"role": "user", "content": "first"},
+            {"role": "assistant", "content": "a1"},
+            {"role": "user", "content": "second"},
+            {"role": "assistant", "content": "a2"},
+            {"role": "user", "content": "third"},
+        ]
+        marked = place_cache_breakpoints(history)
+
+        assert history[4]["content"] == "third"
+        assert marked[0]["content"] == "first"
+        assert marked[2]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert marked[4]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert marked[4]["content"][-1]["text"] == "third"
+
+    def test_stale_breakpoints_are_moved(self):
+        """Breakpoints left on older turns are dropped so the limit is never exceeded"""
+        history = [{"role": "user", "content": build_cached_content("a", "b")},
+                   {"role": "assistant", "content": "x"},
+                   {"role": "user", "content": "c"}]
+        marked = place_cache_breakpoints(history, breakpoints=1)
+
+        assert all("cache_control" not in block for block in marked[0]["content"])
+        assert "cache_control" in history[0]["content"][0]
+        assert marked[2]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+
+
+class TestCacheStats:
+    def test_records_cache_writes_and_reads(self):
+        """Cache token counts are accumulated and a read ratio derived"""
+        stats = PromptCacheStats()
+        stats.record(_response(input_tokens=10, cache_creation_input_tokens=1000).usage)
+        stats.record(_response(input_tokens=10, cache_read_input_tokens=1000).usage)
+        stats.record(None)
+
+        result = stats.get_stats()
+        assert result["calls"] == 2
+        assert result["cache_creation_input_tokens"] == 1000
+        assert result["cache_read_input_tokens"] == 1000
+        assert result["cache_read_ratio"] == round(1000 / 2020, 4)
+
+    def test_create_message_logs_usage(self):
+        """Responses sent through the request path update the shared stats"""
+        client = MagicMock()
+        client.messages.create.return_value = _response(cache_read_input_tokens=300)
+
+        create_message(client, model="m", max_tokens=10, messages=[{"role": "user", "content": "hi"}])
+
+        assert get_prompt_cache_stats().get_stats()["cache_read_input_tokens"] == 300
+
+
+class TestCachedCallSites:
+    @patch("anthropic.Anthropic")
+    def test_review_passes_share_the_cached_code_prefix(self, mock_anthropic, tmp_path):
+        """All four passes send an identical cached code block before the instruction"""
+        client = mock_anthropic.return_value
+        client.messages.create.return_value = _response()
+        source = tmp_path / "module.py"
+        source.write_text("def f():\n    return 1\n")
+
+        results = AdvancedClaudeDemo(api_key="test_key").code_review_and_refactor(str(source))
+
+        assert set(results) == {"review", "refactor", "document", "security"}
+        contents = [call.kwargs["messages"][0]["content"] for call in client.messages.create.call_args_list]
+        assert len(contents) == 4
+        assert all(content[0] == contents[0][0] for content in contents)
+        assert "def f():" in contents[0][0]["text"]
+        assert contents[0][0]["cache_control"] == {"type": "ephemeral"}
+        assert len({content[1]["text"] for content in contents}) == 4
+
+    @patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test_key"})
+    @patch("anthropic.Anthropic")
+    def test_chat_sends_history_with_breakpoints(self, mock_anthropic):
+        """Chat marks the newest turn while history keeps plain strings"""
+        client = mock_anthropic.return_value
+        client.messages.create.return_value = _response("answer")
+        assistant = ClaudeDeveloperAssistant()
+
+        assistant.chat("one")
+        assistant.chat("two")
+
+        sent = client.messages.create.call_args.kwargs["messages"]
+        assert sent[-1]["content"][-1] == {"type": "text", "text": "two", "cache_control": {"type": "ephemeral"}}
+        assert sent[0]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+        assert assistant.conversation_history[2] == {"role": "user", "content": "two"}
@@ -0,0 +1,125 @@
+"""
+Tests for the client-side rate limiter
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, Mock
+
+from claude_api_demos.bulkhead import BATCH, traffic_class
+from claude_api_demos.messaging import create_message
+from claude_api_demos.rate_limiter import (
+    RateLimiter,
+    TokenBucket,
+    configure_rate_limiter,
+    estimate_request_tokens,
+)
+
+
+class TestTokenBucket:
+    def test_unlimited_bucket_never_waits(self):
+        """A bucket without a limit never throttles"""
+        bucket = TokenBucket()
+        assert bucket.reserve(10_000) == 0.0
+
+    def test_wait_covers_the_debt(self):
+        """Reserving past the level returns the time needed to refill"""
+        bucket = TokenBucket(per_minute=60)
+        assert bucket.reserve(60) == 0.0
+        wait = bucket.reserve(30)
+        assert 29.0 < wait <= 30.0
+
+    def test_update_never_raises_level_above_remaining(self):
+        """Server-reported remaining capacity caps the local level"""
+        bucket = TokenBucket()
+        bucket.update(per_minute=1000, remaining=100)
+        assert bucket.per_minute == 1000
+        assert bucket.level <= 101
+
+
+class TestRateLimiter:
+    def test_usage_corrects_reservation(self):
+        """Estimated tokens are corrected from response.usage"""
+        limiter = RateLimiter(input_tokens_per_minute=1000, output_tokens_per_minute=1000)
+        reservation = limiter.acquire(input_tokens=500, output_tokens=800)
+
+        limiter.record_usage(reservation, Mock(input_tokens=100, output_tokens=50))
+
+        assert limiter.buckets["input-tokens"].level > 890
+        assert limiter.buckets["output-tokens"].level > 940
+
+    def test_learns_limits_from_headers(self):
+        """anthropic-ratelimit-* headers configure the buckets"""
+        limiter = RateLimiter()
+        limiter.update_from_headers({
+            "anthropic-ratelimit-requests-limit": "50",
+            "anthropic-ratelimit-requests-remaining": "0",
+            "anthropic-ratelimit-input-tokens-limit": "40000",
+            "anthropic-ratelimit-output-tokens-limit": "8000",
+        })
+
+        stats = limiter.get_stats()
+        assert stats["requests_per_minute"] == 50
+        assert stats["input_tokens_per_minute"] == 40000
+        assert stats["output_tokens_per_minute"] == 8000
+        assert limiter.buckets["requests"].shortfall(1) > 0
+
+    def test_estimate_request_tokens(self):
+        """Token estimates grow with the prompt size"""
+        small = estimate_request_tokens({"messages": [{"role": "user", "content": "hi"}]})
+        large = estimate_request_tokens({"messages": [{"role": "user", "content": "x" * 4000}]})
+        assert small >= 1
+        assert large >= 1000
+
+
+class TestCreateMessage:
+    def test_create_message_goes_through_limiter(self):
+        """create_message reserves capacity and records usage"""
+        limiter = configure_rate_limiter(requests_per_minute=100)
+        client = MagicMock()
+        client.messages.create.return_value = Mock(usage=Mock(input_tokens=3, output_tokens=4))
+
+        response = create_message(client, model="m", max_tokens=10,
+                                  messages=[{"role": "user", "content": "hi"}])
+
+        assert response is client.messages.create.return_value
+        client.messages.create.assert_called_once_with(
+            model="m", max_tokens=10, messages=[{"role": "user", "content": "hi"}]
+        )
+        assert limiter.get_stats()["acquired"] == 1
+
+
+def _wait_until(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+class TestPriority:
+    def test_interactive_call_overtakes_queued_batch_calls(self):
+        """With the limit exhausted, capacity goes to the interactive caller before the batch backlog"""
+        limiter = configure_rate_limiter(requests_per_minute=240)
+        limiter.buckets["requests"].take(240)
+        order = []
+        client = MagicMock()
+        client.messages.create.side_effect = lambda **request: order.append(
+            request["messages"][0]["content"]) or Mock(usage=None)
+
+        def send(content, traffic):
+            with traffic_class(traffic):
+                create_message(client, model="m", max_tokens=10, messages=[{"role": "user", "content": content}])
+
+        threads = []
+        for i in range(3):
+            threads.append(threading.Thread(target=send, args=(f"batch{i}", BATCH)))
+            threads[-1].start()
+            _wait_until(lambda: limiter.get_stats()["waiting"] == i + 1)
+        threads.append(threading.Thread(target=send, args=("keystroke", "interactive")))
+        threads[-1].start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        assert order == ["keystroke", "batch0", "batch1", "batch2"]
+        assert limiter.get_stats()["throttled"] == 4
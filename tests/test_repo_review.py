@@ -0,0 +1,236 @@
+"""
+Tests for repository-wide code review
+"""
+
+import json
+import subprocess
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from claude_api_demos.advanced_demo import AdvancedClaudeDemo
+from claude_api_demos.bulkhead import BATCH, current_traffic_class
+from claude_api_demos.deadline import is_partial
+from claude_api_demos.repo_review import ReviewStore, find_python_files
+
+
+def _response(text="ok"):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], stop_reason="end_turn",
+                           usage=SimpleNamespace(input_tokens=10, output_tokens=20))
+
+
+def _tree(root, paths):
+    for path in paths:
+        target = root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(f"# {path}\nx = 1\n")
+
+
+def _git(root, *args):
+    subprocess.run(["git", "-C", str(root), "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                   check=True, capture_output=True)
+
+
+class TestFindPythonFiles:
+    def test_skips_excluded_directories(self, tmp_path):
+        _tree(tmp_path, ["a.py", "pkg/b.py", "pkg/notes.txt", ".venv/lib/c.py",
+                         "pkg/__pycache__/d.py", "node_modules/e.py"])
+
+        assert find_python_files(tmp_path) == ["a.py", "pkg/b.py"]
+
+    def test_include_and_exclude_patterns(self, tmp_path):
+        _tree(tmp_path, ["src/a.py", "src/gen/b.py", "tests/test_a.py"])
+
+        assert find_python_files(tmp_path, include=["src/*.py"], exclude=["gen"]) == ["src/a.py"]
+
+
+class TestReviewStore:
+    def test_resumes_from_the_file_and_ignores_a_torn_line(self, tmp_path):
+        path = tmp_path / "reviews.jsonl"
+        store = ReviewStore(path)
+        store.add("a.py", {"review": "fine"})
+        store.add("b.py", {"review": "Error: overloaded"})
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"path": "c.py", "resu')
+
+        reopened = ReviewStore(path)
+
+        assert reopened.completed() == {"a.py"}
+        assert reopened.get("b.py")["failed"]
+        assert len(reopened) == 2
+
+    def test_record_after_a_torn_line_is_kept(self, tmp_path):
+        path = tmp_path / "reviews.jsonl"
+        ReviewStore(path).add("a.py", {"review": "fine"})
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"path": "b.py", "resu')
+
+        ReviewStore(path).add("c.py", {"review": "fine"})
+
+        assert ReviewStore(path).completed() == {"a.py", "c.py"}
+
+
+class TestReviewRepository:
+    def setup_method(self):
+        with patch("anthropic.Anthropic"):
+            self.demo = AdvancedClaudeDemo(api_key="test_key")
+        self.client = self.demo.client
+
+    def test_reviews_every_file_into_the_store(self, tmp_path):
+        _tree(tmp_path, ["a.py", "pkg/b.py", "pkg/c.py"])
+        self.client.messages.create.return_value = _response()
+
+        summary = self.demo.review_repository(str(tmp_path), passes=["review"])
+
+        assert (summary["files"], summary["reviewed"], summary["failed"], summary["remaining"]) == (3, 3, 0, 0)
+        assert summary["usage"]["requests"] == 3
+        lines = (tmp_path / ".claude_reviews" / "reviews.jsonl").read_text().splitlines()
+        assert sorted(json.loads(line)["path"] for line in lines) == ["a.py", "pkg/b.py", "pkg/c.py"]
+
+    def test_rerun_skips_finished_files_and_retries_failures(self, tmp_path):
+        _tree(tmp_path, ["a.py", "b.py"])
+        store = tmp_path / "reviews.jsonl"
+
+        def create(**request):
+            if "# b.py" in request["messages"][0]["content"][0]["text"]:
+                raise ValueError("boom")
+            return _response()
+
+        self.client.messages.create.side_effect = create
+        first = self.demo.review_repository(str(tmp_path), store_path=str(store), passes=["review"])
+        self.client.messages.create.side_effect = None
+        self.client.messages.create.return_value = _response()
+        self.client.messages.create.reset_mock()
+        second = self.demo.review_repository(str(tmp_path), store_path=str(store), passes=["review"])
+
+        assert (first["reviewed"], first["failed"]) == (1, 1)
+        assert (second["skipped"], second["reviewed"]) == (1, 1)
+        assert self.client.messages.create.call_count == 1
+        assert ReviewStore(store).completed() == {"a.py", "b.py"}
+
+    def test_files_in_flight_are_bounded(self, tmp_path):
+        _tree(tmp_path, [f"m{i}.py" for i in range(6)])
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def create(**request):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return _response()
+
+        self.client.messages.create.side_effect = create
+        summary = self.demo.review_repository(str(tmp_path), passes=["review"], max_files_in_flight=2)
+
+        assert summary["reviewed"] == 6
+        assert active[1] == 2
+
+    def test_requests_run_in_the_batch_traffic_class(self, tmp_path):
+        _tree(tmp_path, ["a.py", "b.py"])
+        classes = []
+
+        def create(**request):
+            classes.append(current_traffic_class())
+            return _response()
+
+        self.client.messages.create.side_effect = create
+        self.demo.review_repository(str(tmp_path))
+
+        assert classes and set(classes) == {BATCH}
+        assert current_traffic_class() != BATCH
+
+    def test_no_new_files_after_the_deadline(self, tmp_path):
+        _tree(tmp_path, ["a.py", "b.py"])
+
+        summary = self.demo.review_repository(str(tmp_path), deadline=0)
+
+        assert summary["remaining"] == 2
+        assert is_partial(summary)
+        self.client.messages.create.assert_not_called()
+
+
+class TestIncrementalReview:
+    def setup_method(self):
+        with patch("anthropic.Anthropic"):
+            self.demo = AdvancedClaudeDemo(api_key="test_key")
+        self.client = self.demo.client
+        self.client.messages.create.return_value = _response()
+
+    def _review(self, root, **kwargs):
+        self.client.messages.create.reset_mock()
+        return self.demo.review_repository(str(root), passes=["review"], **kwargs)
+
+    def test_only_modified_files_are_sent_again(self, tmp_path):
+        _tree(tmp_path, ["a.py", "b.py", "c.py"])
+        self._review(tmp_path)
+        (tmp_path / "b.py").write_text("x = 2\n")
+
+        summary = self._review(tmp_path)
+
+        assert (summary["skipped"], summary["reviewed"]) == (2, 1)
+        sent = self.client.messages.create.call_args.kwargs["messages"][0]["content"][0]["text"]
+        assert "x = 2" in sent
+
+    def test_prompt_change_invalidates_the_index(self, tmp_path):
+        _tree(tmp_path, ["a.py"])
+        self._review(tmp_path)
+
+        with patch.dict(AdvancedClaudeDemo.REVIEW_PASSES, {"review": "Review the code above, briefly."}):
+            summary = self._review(tmp_path)
+
+        assert summary["reviewed"] == 1
+
+    def test_copied_file_is_served_from_the_index(self, tmp_path):
+        _tree(tmp_path, ["a.py"])
+        self._review(tmp_path)
+        (tmp_path / "copy.py").write_text((tmp_path / "a.py").read_text())
+
+        summary = self._review(tmp_path)
+
+        assert summary["reviewed"] == 0
+        self.client.messages.create.assert_not_called()
+        record = ReviewStore(tmp_path / ".claude_reviews" / "reviews.jsonl").get("copy.py")
+        assert record["reused_from"] == "a.py"
+        assert record["results"] == {"review": "ok"}
+
+    def test_unchanged_tree_with_duplicate_content_adds_no_records(self, tmp_path):
+        _tree(tmp_path, ["a.py"])
+        (tmp_path / "copy.py").write_text((tmp_path / "a.py").read_text())
+        (tmp_path / "pkg").mkdir()
+        (tmp_path / "pkg" / "__init__.py").write_text("")
+        (tmp_path / "__init__.py").write_text("")
+        store = tmp_path / ".claude_reviews" / "reviews.jsonl"
+
+        self._review(tmp_path)
+        lines = len(store.read_text().splitlines())
+        for _ in range(3):
+            summary = self._review(tmp_path)
+
+        assert lines == 2
+        assert len(store.read_text().splitlines()) == lines
+        assert (summary["files"], summary["skipped"], summary["reviewed"]) == (4, 4, 0)
+        self.client.messages.create.assert_not_called()
+
+    def test_base_ref_limits_the_review_to_changed_files(self, tmp_path):
+        _tree(tmp_path, ["a.py", "b.py", "pkg/c.py"])
+        _git(tmp_path, "init", "-q")
+        _git(tmp_path, "add", ".")
+        _git(tmp_path, "commit", "-q", "-m", "base")
+        (tmp_path / "pkg" / "c.py").write_text("y = 3\n")
+        _tree(tmp_path, ["new.py"])
+
+        summary = self._review(tmp_path, base_ref="HEAD")
+
+        assert (summary["files"], summary["changed"], summary["reviewed"]) == (4, 2, 2)
+        assert ReviewStore(tmp_path / ".claude_reviews" / "reviews.jsonl").completed() == {"pkg/c.py", "new.py"}
+
+    def test_base_ref_outside_a_git_repository(self, tmp_path):
+        _tree(tmp_path, ["a.py"])
+
+        summary = self._review(tmp_path, base_ref="HEAD")
+
+        assert summary["error"].startswith("Failed to find changed files")
@@ -0,0 +1,66 @@
+"""
+Tests for the two-tier response cache
+"""
+
+import time
+
+from claude_api_demos.response_cache import ResponseCache, request_cache_key
+
+
+class TestRequestCacheKey:
+    def test_key_is_canonical(self):
+        """Key order does not change the hash; content does"""
+        a = request_cache_key({"model": "m", "max_tokens": 10, "messages": [{"role": "user", "content": "hi"}]})
+        b = request_cache_key({"messages": [{"content": "hi", "role": "user"}], "max_tokens": 10, "model": "m"})
+        c = request_cache_key({"model": "m", "max_tokens": 11, "messages": [{"role": "user", "content": "hi"}]})
+        assert a == b
+        assert a != c
+
+
+class TestResponseCache:
+    def test_disk_tier_survives_a_new_instance(self, tmp_path):
+        """Entries written by one instance are read from disk by the next"""
+        ResponseCache(cache_dir=tmp_path).set("k", "value")
+
+        cache = ResponseCache(cache_dir=tmp_path)
+        assert cache.get("k") == "value"
+        assert cache.get("k") == "value"
+
+        stats = cache.get_stats()
+        assert stats["disk_hits"] == 1
+        assert stats["memory_hits"] == 1
+        assert stats["disk_bytes"] > 0
+
+    def test_expired_entries_are_misses(self, tmp_path):
+        """Entries older than the TTL are dropped"""
+        cache = ResponseCache(cache_dir=tmp_path, ttl=0.01)
+        cache.set("k", "value")
+        time.sleep(0.02)
+
+        assert cache.get("k") is None
+        stats = cache.get_stats()
+        assert stats["expired"] == 1
+        assert stats["misses"] == 1
+        assert stats["disk_bytes"] == 0
+
+    def test_memory_tier_is_lru(self, tmp_path):
+        """The memory tier keeps only the most recently used entries"""
+        cache = ResponseCache(cache_dir=tmp_path, memory_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert list(cache._memory) == ["a", "c"]
+
+    def test_disk_size_cap_evicts_oldest(self, tmp_path):
+        """The disk tier evicts least recently used files past the size cap"""
+        cache = ResponseCache(cache_dir=tmp_path, max_disk_bytes=200)
+        for i in range(10):
+            cache.set(f"key{i}", "x" * 40)
+
+        stats = cache.get_stats()
+        assert stats["disk_bytes"] <= 200
+        assert stats["evictions"] > 0
+        assert (tmp_path / "key9.json").exists()
+        assert not (tmp_path / "key0.json").exists()
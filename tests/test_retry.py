@@ -0,0 +1,117 @@
+"""
+Tests for the retry engine
+"""
+
+from unittest.mock import MagicMock, Mock, patch
+
+import anthropic
+import httpx
+import pytest
+
+from claude_api_demos.messaging import create_message
+from claude_api_demos.retry import (
+    RetryPolicy,
+    classify_error,
+    configure_retry_policy,
+    retry_after_seconds,
+)
+
+
+def _status_error(status, headers=None):
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return anthropic.APIStatusError(f"status {status}", response=response, body=None)
+
+
+class TestClassification:
+    def test_transient_errors_are_retryable(self):
+        """429, 529, 5xx and connection errors are retryable"""
+        assert classify_error(_status_error(429)) == "429"
+        assert classify_error(_status_error(529)) == "529"
+        assert classify_error(_status_error(503)) == "503"
+        assert classify_error(ConnectionResetError()) == "connection"
+
+    def test_fatal_errors_are_not_retryable(self):
+        """Client errors and unknown exceptions are fatal"""
+        assert classify_error(_status_error(400)) is None
+        assert classify_error(_status_error(401)) is None
+        assert classify_error(ValueError("bad")) is None
+
+    def test_retry_after_header(self):
+        """retry-after and retry-after-ms are honored"""
+        assert retry_after_seconds(_status_error(429, {"retry-after": "7"})) == 7.0
+        assert retry_after_seconds(_status_error(429, {"retry-after-ms": "250"})) == 0.25
+        assert retry_after_seconds(_status_error(500)) is None
+
+
+class TestRetryPolicy:
+    def test_recovers_from_transient_failures(self):
+        """Transient failures are retried until success and counted"""
+        policy = RetryPolicy(max_attempts=3, base_delay=0)
+        fn = Mock(side_effect=[_status_error(529), _status_error(429), "ok"])
+
+        with patch("claude_api_demos.retry.time.sleep") as sleep:
+            assert policy.call(fn) == "ok"
+
+        assert fn.call_count == 3
+        assert sleep.call_count == 2
+        stats = policy.get_stats()
+        assert stats["retries"] == 2
+        assert stats["recovered_calls"] == 1
+        assert stats["retries_by_reason"] == {"529": 1, "429": 1}
+
+    def test_fatal_error_is_raised_immediately(self):
+        """Fatal errors are not retried"""
+        policy = RetryPolicy(base_delay=0)
+        fn = Mock(side_effect=_status_error(400))
+
+        with pytest.raises(anthropic.APIStatusError):
+            policy.call(fn)
+
+        assert fn.call_count == 1
+        assert policy.get_stats()["fatal_errors"] == 1
+
+    def test_attempt_budget(self):
+        """Retries stop once the per-call attempt budget is spent"""
+        policy = RetryPolicy(max_attempts=2, base_delay=0)
+        fn = Mock(side_effect=_status_error(503))
+
+        with patch("claude_api_demos.retry.time.sleep"), pytest.raises(anthropic.APIStatusError):
+            policy.call(fn)
+
+        assert fn.call_count == 2
+        assert policy.get_stats()["exhausted_calls"] == 1
+
+    def test_retry_after_is_used_for_backoff(self):
+        """The server's retry-after replaces the jittered backoff"""
+        policy = RetryPolicy(max_delay=30)
+        assert policy.backoff(1, _status_error(429, {"retry-after": "3"})) == 3.0
+        assert 0 <= policy.backoff(3, _status_error(503)) <= 2.0
+
+    def test_long_retry_after_is_waited_in_full_or_not_at_all(self):
+        """A retry-after beyond max_delay is not cut short; past the time budget the error is raised"""
+        error = _status_error(429, {"retry-after": "60"})
+        fn = Mock(side_effect=[error, "ok"])
+
+        with patch("claude_api_demos.retry.time.sleep") as sleep:
+            assert RetryPolicy(max_delay=30, max_elapsed=120).call(fn) == "ok"
+        sleep.assert_called_once_with(60.0)
+
+        fn = Mock(side_effect=[error, "ok"])
+        with patch("claude_api_demos.retry.time.sleep") as sleep:
+            with pytest.raises(anthropic.APIStatusError):
+                RetryPolicy(max_delay=30, max_elapsed=45).call(fn)
+        sleep.assert_not_called()
+
+
+class TestCreateMessageRetries:
+    def test_create_message_retries_overloaded(self):
+        """create_message retries a 529 through the shared policy"""
+        configure_retry_policy(base_delay=0)
+        client = MagicMock()
+        client.messages.create.side_effect = [_status_error(529), Mock(usage=None)]
+
+        with patch("claude_api_demos.retry.time.sleep"):
+            create_message(client, model="m", max_tokens=10, messages=[])
+
+        assert client.messages.create.call_count == 2
@@ -0,0 +1,141 @@
+"""
+Tests for sandboxed execution of generated tests
+"""
+
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from claude_api_demos.advanced_demo import AdvancedClaudeDemo
+from claude_api_demos.bulkhead import BATCH, current_traffic_class
+from claude_api_demos.sandbox import (SandboxLimits, build_test_module, drop_tests, extract_code_blocks,
+                                      failing_tests, run_tests)
+
+FUNCTION = "def add(a, b):\n    return a + b\n"
+
+RESPONSE = '''Here are the tests:
+
+```python
+import pytest
+
+
+def test_adds():
+    assert add(1, 2) == 3
+
+
+def test_wrong():
+    assert add(1, 2) == 4
+
+
+class TestEdges:
+    def test_zero(self):
+        assert add(0, 0) == 0
+
+    @pytest.mark.parametrize("x", [1, 2])
+    def test_identity(self, x):
+        assert add(x, 0) == 1
+```
+
+Run them with `pytest`.
+'''
+
+
+def _response(text):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], stop_reason="end_turn",
+                           usage=SimpleNamespace(input_tokens=10, output_tokens=20))
+
+
+class TestBuildTestModule:
+    def test_code_blocks_are_extracted_and_import_the_function(self):
+        code = build_test_module(RESPONSE)
+
+        assert code.startswith("from function_under_test import *")
+        assert "Run them with" not in code
+        assert extract_code_blocks("no code here, sorry") == []
+        assert build_test_module("x = 1\n").endswith("x = 1\n")
+
+    def test_drop_tests_removes_failing_tests_and_emptied_classes(self):
+        code = build_test_module(RESPONSE)
+
+        kept = drop_tests(code, {"test_wrong", "TestEdges::test_identity[2]"})
+
+        assert "def test_wrong" not in kept and "def test_identity" not in kept
+        assert "def test_adds" in kept and "class TestEdges" in kept
+        emptied = drop_tests(kept, {"TestEdges::test_zero"})
+        assert "class TestEdges" not in emptied
+
+
+class TestRunTests:
+    def test_reports_each_test(self):
+        result = run_tests(FUNCTION, build_test_module(RESPONSE))
+
+        assert result["status"] == "failed"
+        assert (result["passed"], result["failed"], result["errors"]) == (3, 2, 0)
+        assert result["tests"]["TestEdges::test_zero"]["outcome"] == "passed"
+        assert set(failing_tests(result)) == {"test_wrong", "TestEdges::test_identity[2]"}
+
+    @pytest.mark.skipif(os.name != "posix", reason="CPU and memory limits need POSIX")
+    def test_limits_fail_only_the_offending_tests(self):
+        code = ("import os\n\n"
+                "def test_spins():\n    while True:\n        pass\n\n"
+                "def test_allocates():\n    bytearray(4 * 1024 ** 3)\n\n"
+                "def test_environment_is_clean():\n    assert 'ANTHROPIC_API_KEY' not in os.environ\n")
+
+        with patch.dict(os.environ, {"ANTHROPIC_API_KEY": "secret"}):
+            result = run_tests(FUNCTION, code, SandboxLimits(cpu_seconds=1, memory_mb=512))
+
+        assert result["tests"]["test_spins"]["message"].startswith("TimeoutError")
+        assert "MemoryError" in result["tests"]["test_allocates"]["message"]
+        assert result["tests"]["test_environment_is_clean"]["outcome"] == "passed"
+
+    def test_wall_clock_limit_kills_the_run(self):
+        code = "import time\n\ndef test_sleeps():\n    time.sleep(60)\n"
+
+        result = run_tests(FUNCTION, code, SandboxLimits(wall_seconds=2))
+
+        assert result["status"] == "error"
+        assert "Timed out" in result["output"]
+        assert result["seconds"] < 30
+
+    def test_no_code(self):
+        result = run_tests(FUNCTION, build_test_module("Error generating tests: overloaded"))
+
+        assert result["status"] == "error"
+        assert result["exit_code"] is None
+
+
+class TestValidateTestCases:
+    def setup_method(self):
+        with patch("anthropic.Anthropic"):
+            self.demo = AdvancedClaudeDemo(api_key="test_key")
+        self.client = self.demo.client
+
+    def test_only_failing_tests_are_regenerated(self):
+        prompts = []
+
+        def create(**request):
+            prompt = request["messages"][0]["content"]
+            prompts.append(prompt)
+            assert current_traffic_class() == BATCH
+            if prompt.startswith("These pytest tests"):
+                return _response("```python\ndef test_wrong():\n    assert add(1, 2) == 3\n\n"
+                                 "def test_identity():\n    assert add(2, 0) == 2\n```")
+            return _response(RESPONSE)
+
+        self.client.messages.create.side_effect = create
+        results = self.demo.validate_test_cases({"add": FUNCTION}, regenerate_failing=True)
+
+        assert results["add"]["status"] == "passed"
+        assert results["add"]["regenerated"]
+        assert len(prompts) == 2
+        assert "test_wrong" in prompts[1] and "test_zero" not in prompts[1]
+        assert results["add"]["test_code"].count("def test_wrong") == 1
+
+    def test_existing_responses_are_run_without_requests(self):
+        results = self.demo.validate_test_cases({"add": FUNCTION, "again": FUNCTION},
+                                                {"add": RESPONSE, "again": RESPONSE}, max_workers=2)
+
+        assert {name: result["failed"] for name, result in results.items()} == {"add": 2, "again": 2}
+        self.client.messages.create.assert_not_called()
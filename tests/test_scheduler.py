@@ -0,0 +1,150 @@
+"""
+Tests for the priority request scheduler
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from claude_api_demos.bulkhead import BATCH, INTERACTIVE, traffic_class
+from claude_api_demos.messaging import create_message
+from claude_api_demos.scheduler import PriorityScheduler, QueueFullError, configure_scheduler
+
+
+def _wait_until(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+class TestPriorityScheduler:
+    def _queue(self, scheduler, order, priority, name):
+        def run():
+            with scheduler.slot(priority=priority):
+                order.append(name)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_interactive_jumps_ahead_of_background_backlog(self):
+        scheduler = PriorityScheduler(max_in_flight=1)
+        order = []
+        release = threading.Event()
+
+        def hold():
+            with scheduler.slot(priority=BATCH):
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        _wait_until(lambda: scheduler.get_stats()["in_flight"] == 1)
+
+        threads = []
+        for i in range(5):
+            threads.append(self._queue(scheduler, order, BATCH, f"file{i}"))
+            _wait_until(lambda: scheduler.get_stats()["classes"][BATCH]["waiting"] == i + 1)
+        threads.append(self._queue(scheduler, order, INTERACTIVE, "keystroke"))
+        _wait_until(lambda: scheduler.get_stats()["classes"].get(INTERACTIVE, {}).get("waiting") == 1)
+
+        release.set()
+        for thread in [holder] + threads:
+            thread.join(timeout=2)
+
+        assert order[0] == "keystroke"
+        assert order[1:] == [f"file{i}" for i in range(5)]
+
+    def test_weighted_share_while_both_classes_wait(self):
+        scheduler = PriorityScheduler(max_in_flight=1, weights={INTERACTIVE: 3, BATCH: 1})
+        order = []
+        release = threading.Event()
+
+        def hold():
+            with scheduler.slot(priority=BATCH):
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        _wait_until(lambda: scheduler.get_stats()["in_flight"] == 1)
+
+        threads = []
+        for i in range(8):
+            priority = INTERACTIVE if i % 2 else BATCH
+            threads.append(self._queue(scheduler, order, priority, priority))
+            _wait_until(lambda: sum(c["waiting"] for c in scheduler.get_stats()["classes"].values()) == i + 1)
+
+        release.set()
+        for thread in [holder] + threads:
+            thread.join(timeout=2)
+
+        # Interactive gets three turns for every batch turn, but batch is not starved
+        assert order[:4].count(INTERACTIVE) == 3
+        assert order.count(BATCH) == 4
+
+    def test_queue_length_limit(self):
+        scheduler = PriorityScheduler(max_in_flight=1, max_queue=1)
+        release = threading.Event()
+
+        def hold():
+            with scheduler.slot(priority=BATCH):
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        _wait_until(lambda: scheduler.get_stats()["in_flight"] == 1)
+        waiter = self._queue(scheduler, [], BATCH, "queued")
+        _wait_until(lambda: scheduler.get_stats()["classes"][BATCH]["waiting"] == 1)
+
+        with pytest.raises(QueueFullError):
+            with scheduler.slot(priority=BATCH):
+                pass
+        release.set()
+        holder.join(timeout=2)
+        waiter.join(timeout=2)
+
+        stats = scheduler.get_stats()["classes"][BATCH]
+        assert stats["rejected"] == 1
+        assert stats["admitted"] == 2
+        assert stats["wait_max"] > 0
+        assert scheduler.get_stats()["in_flight"] == 0
+
+    def test_cancelled_async_waiter_leaves_the_queue(self):
+        scheduler = PriorityScheduler(max_in_flight=1)
+
+        async def main():
+            async with scheduler.slot_async():
+                waiter = asyncio.ensure_future(scheduler.slot_async().__aenter__())
+                await asyncio.sleep(0.02)
+                assert scheduler.get_stats()["classes"][INTERACTIVE]["waiting"] == 1
+                waiter.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await waiter
+            async with scheduler.slot_async():
+                return scheduler.get_stats()
+
+        stats = asyncio.run(main())
+        assert stats["in_flight"] == 1
+        assert stats["classes"][INTERACTIVE]["waiting"] == 0
+
+
+class TestSchedulerIntegration:
+    def test_create_message_uses_callers_traffic_class(self):
+        scheduler = configure_scheduler(max_in_flight=4)
+        client = MagicMock()
+        client.messages.create.return_value = MagicMock(usage=None)
+
+        create_message(client, model="claude-3-5-haiku-20241022", max_tokens=10,
+                       messages=[{"role": "user", "content": "hi"}])
+        with traffic_class(BATCH):
+            create_message(client, model="claude-3-5-haiku-20241022", max_tokens=10,
+                           messages=[{"role": "user", "content": "review"}])
+
+        stats = scheduler.get_stats()
+        assert stats["classes"][INTERACTIVE]["admitted"] == 1
+        assert stats["classes"][BATCH]["admitted"] == 1
+        assert stats["in_flight"] == 0
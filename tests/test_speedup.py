@@ -0,0 +1,200 @@
+"""
+Tests for the measured speedup harness
+"""
+
+import os
+import random
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from claude_api_demos.advanced_demo import AdvancedClaudeDemo
+from claude_api_demos.interactive_demo import ClaudeDeveloperAssistant
+from claude_api_demos.sandbox import SandboxLimits
+from claude_api_demos.speedup import extract_module, match_functions, measure_speedup
+from claude_api_demos.speedup_worker import hinted_kinds, probe_kinds
+
+FIBONACCI = '''
+def fibonacci(n):
+    if n <= 1:
+        return n
+    return fibonacci(n - 1) + fibonacci(n - 2)
+'''
+
+FIND_DUPLICATES = '''
+def find_duplicates(numbers):
+    duplicates = []
+    for i in range(len(numbers)):
+        for j in range(i + 1, len(numbers)):
+            if numbers[i] == numbers[j] and numbers[i] not in duplicates:
+                duplicates.append(numbers[i])
+    return duplicates
+'''
+
+ORIGINAL = FIBONACCI + "\n" + FIND_DUPLICATES
+
+RESPONSE = '''The recursion is exponential; iterate instead.
+
+```python
+def fibonacci(n):
+    if n <= 1:
+        return n
+    return fibonacci(n - 1) + fibonacci(n - 2)
+```
+
+```python
+def fibonacci_fast(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+
+print(fibonacci_fast(10))
+```
+
+```python
+def find_duplicates(numbers):
+    return list(set(x for x in numbers if numbers.count(x) > 1))
+```
+'''
+
+
+def _response(text):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], stop_reason="end_turn",
+                           usage=SimpleNamespace(input_tokens=10, output_tokens=20))
+
+
+class TestExtraction:
+    def test_module_keeps_definitions_only(self):
+        module = extract_module(RESPONSE)
+
+        assert "print(" not in module
+        assert module.count("def fibonacci") == 2
+
+    def test_functions_are_paired_by_name_then_by_similar_name(self):
+        optimized = "def fibonacci_fast(n):\n    return n\n\ndef find_duplicates(numbers):\n    return []\n"
+
+        assert match_functions(ORIGINAL, optimized) == {"fibonacci": "fibonacci_fast",
+                                                        "find_duplicates": "find_duplicates"}
+        assert match_functions(ORIGINAL, "def unrelated(a, b):\n    return a\n") == {}
+        assert match_functions(ORIGINAL, extract_module(RESPONSE))["fibonacci"] == "fibonacci_fast"
+
+
+class TestInputKinds:
+    def test_annotations_then_names(self):
+        def search(items: list, target, text, flag: bool = False):
+            return None
+
+        assert hinted_kinds(search) == ["list_int", "int", "str"]
+
+    def test_probing_finds_what_the_function_accepts(self):
+        def shout(value):
+            return value.upper()
+
+        assert probe_kinds(shout, random.Random(0)) == ["str"]
+
+
+class TestMeasureSpeedup:
+    def test_faster_equivalent_code_is_accepted_with_measurements(self):
+        optimized = "def fibonacci(n):\n    a, b = 0, 1\n    for _ in range(n):\n        a, b = b, a + b\n    return a\n"
+
+        result = measure_speedup(FIBONACCI, optimized, repeats=2, warmup=1)
+
+        entry = result["functions"]["fibonacci"]
+        assert result["accepted"] and entry["equivalent"]
+        assert entry["speedup"] > 10
+        assert {"best", "median", "peak_bytes"} <= set(entry["original"])
+        assert isinstance(entry["memory_delta"], int)
+
+    def test_different_output_is_rejected(self):
+        result = measure_speedup(ORIGINAL, extract_module(RESPONSE), repeats=2, warmup=1)
+
+        entry = result["functions"]["find_duplicates"]
+        assert not result["accepted"]
+        assert entry["equivalent"] is False and not entry["accepted"]
+        assert entry["mismatch"]["expected"] != entry["mismatch"]["actual"]
+        assert result["functions"]["fibonacci"]["optimized_name"] == "fibonacci_fast"
+        assert result["functions"]["fibonacci"]["accepted"]
+
+    def test_slower_code_is_rejected(self):
+        original = "def total(numbers):\n    return sum(numbers)\n"
+        slower = "def total(numbers):\n    return sum(sorted(numbers * 3)) // 3 if numbers else 0\n"
+
+        result = measure_speedup(original, slower, repeats=2, warmup=1)
+
+        entry = result["functions"]["total"]
+        assert entry["equivalent"] and not entry["accepted"]
+        assert entry["speedup"] < 1
+        assert entry["reason"].startswith("Slower")
+
+
+class TestIsolation:
+    def test_file_writes_land_in_a_scratch_directory(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        leaky = ("import os\n\ndef total(numbers):\n"
+                 "    open('leak.txt', 'w').write('x')\n"
+                 "    open(os.path.expanduser('~/leak.txt'), 'w').write('x')\n"
+                 "    return sum(numbers)\n")
+
+        result = measure_speedup("def total(numbers):\n    return sum(numbers)\n", leaky, repeats=1, warmup=1)
+
+        assert result["functions"]["total"]["equivalent"]
+        assert list(tmp_path.iterdir()) == []
+        assert not os.path.exists(os.path.expanduser("~/leak.txt"))
+
+    @pytest.mark.skipif(os.name != "posix", reason="process groups need POSIX")
+    def test_timeout_kills_processes_the_code_started(self, tmp_path):
+        pid_file = tmp_path / "child.pid"
+        spawning = ("import subprocess, sys\n\ndef total(numbers):\n"
+                    "    child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+                    f"    open({str(pid_file)!r}, 'w').write(str(child.pid))\n"
+                    "    while True:\n        pass\n")
+
+        result = measure_speedup("def total(numbers):\n    return sum(numbers)\n", spawning,
+                                 limits=SandboxLimits(cpu_seconds=30, wall_seconds=2))
+
+        assert result["functions"]["total"]["reason"].startswith("Timed out")
+        time.sleep(0.2)
+        status = f"/proc/{pid_file.read_text()}/status"
+        assert not os.path.exists(status) or "zombie" in open(status).read()
+
+
+class TestOptimizeWithVerification:
+    def setup_method(self):
+        with patch("anthropic.Anthropic"):
+            self.demo = AdvancedClaudeDemo(api_key="test_key")
+        self.client = self.demo.client
+
+    def test_rejected_optimization_returns_no_code(self):
+        self.client.messages.create.return_value = _response(RESPONSE)
+
+        result = self.demo.optimize_performance(FIND_DUPLICATES, verify=True)
+
+        assert result["response"] == RESPONSE
+        assert not result["accepted"] and result["optimized_code"] is None
+        assert result["measurements"]["functions"]["find_duplicates"]["equivalent"] is False
+
+    def test_plain_text_without_verification(self):
+        self.client.messages.create.return_value = _response(RESPONSE)
+
+        assert self.demo.optimize_performance(ORIGINAL) == RESPONSE
+
+
+class TestInteractiveOptimize:
+    def setup_method(self):
+        with patch("anthropic.Anthropic"):
+            self.assistant = ClaudeDeveloperAssistant(api_key="test_key")
+        self.assistant.client.messages.create.return_value = _response(RESPONSE)
+
+    def test_generated_code_is_only_run_on_request(self):
+        with patch("claude_api_demos.interactive_demo.verify_optimization") as verify:
+            answer = self.assistant.process_command(f"optimize {FIND_DUPLICATES}")
+            verify.assert_not_called()
+            assert answer == RESPONSE
+
+            verify.return_value = {"accepted": False, "measurements": {"functions": {}}}
+            self.assistant.process_command(f"optimize --verify {FIND_DUPLICATES}")
+            verify.assert_called_once_with(FIND_DUPLICATES.strip(), RESPONSE)
@@ -0,0 +1,142 @@
+"""
+Tests for pre-flight token counting and max_tokens budgeting
+"""
+
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+
+from claude_api_demos.interactive_demo import ClaudeDeveloperAssistant
+from claude_api_demos.messaging import create_message
+from claude_api_demos.token_budget import (
+    ContextWindowExceeded,
+    TokenCounter,
+    configure_token_counter,
+    plan_max_tokens,
+    split_text,
+)
+
+SONNET = "claude-3-5-sonnet-20241022"
+
+
+class TestPlanMaxTokens:
+    def test_task_budget_for_small_inputs(self):
+        """Small inputs get the task's own output budget"""
+        assert plan_max_tokens(SONNET, 100, "chat") == 1000
+        assert plan_max_tokens(SONNET, 100, "report") == 4000
+        assert plan_max_tokens("claude-3-haiku-20240307", 100, "report", requested=9000) == 4096
+
+    def test_clamped_to_remaining_window(self):
+        """Large inputs get only the room left in the context window"""
+        assert plan_max_tokens(SONNET, 198_000, "report") == 2000
+
+    def test_rejects_inputs_that_leave_no_room(self):
+        """An input that fills the window raises before anything is sent"""
+        with pytest.raises(ContextWindowExceeded) as excinfo:
+            plan_max_tokens(SONNET, 199_900, "chat")
+        assert excinfo.value.input_tokens == 199_900
+
+
+class TestSplitText:
+    def test_parts_fit_and_rejoin(self):
+        """Parts stay under the budget, break on lines and rejoin losslessly"""
+        text = "".join(f"line {i}\n" for i in range(200))
+        parts = split_text(text, max_tokens=10)
+
+        assert len(parts) > 1
+        assert all(len(part) <= 30 for part in parts)
+        assert all(part.endswith("\n") for part in parts)
+        assert "".join(parts) == text
+
+    def test_small_text_is_one_part(self):
+        assert split_text("short", max_tokens=100) == ["short"]
+
+
+class TestTokenCounter:
+    def _client(self, input_tokens=1234):
+        client = MagicMock()
+        client.messages.count_tokens.return_value = SimpleNamespace(input_tokens=input_tokens)
+        return client
+
+    def test_small_requests_skip_the_endpoint(self):
+        """Requests estimated below the threshold are not sent for counting"""
+        client = self._client()
+        counter = TokenCounter(exact_above=8000)
+
+        count = counter.count(client, {"model": SONNET, "messages": [{"role": "user", "content": "hi"}]})
+
+        assert count >= 1
+        client.messages.count_tokens.assert_not_called()
+        assert counter.get_stats()["estimated"] == 1
+
+    def test_counts_are_cached_by_content(self):
+        """The same input is counted once; max_tokens does not affect the key"""
+        client = self._client()
+        counter = TokenCounter(exact_above=0)
+        request = {"model": SONNET, "messages": [{"role": "user", "content": "hi"}]}
+
+        assert counter.count(client, dict(request, max_tokens=10)) == 1234
+        assert counter.count(client, dict(request, max_tokens=20)) == 1234
+
+        client.messages.count_tokens.assert_called_once_with(model=SONNET, messages=request["messages"])
+        assert counter.get_stats()["cache_hits"] == 1
+
+    def test_falls_back_to_estimate_when_endpoint_fails(self):
+        """A failing endpoint does not block the request"""
+        client = MagicMock()
+        client.messages.count_tokens.side_effect = ValueError("bad request")
+        counter = TokenCounter(exact_above=0)
+
+        count = counter.count(client, {"model": SONNET, "messages": [{"role": "user", "content": "x" * 400}]})
+
+        assert count >= 100
+        assert counter.get_stats()["fallbacks"] == 1
+
+
+class TestBudgetedRequests:
+    def test_create_message_sets_max_tokens_from_task(self):
+        """A task-tagged request is sent with the planned max_tokens"""
+        configure_token_counter(exact_above=0)
+        client = MagicMock()
+        client.messages.count_tokens.return_value = SimpleNamespace(input_tokens=197_500)
+
+        create_message(client, task="report", model=SONNET, messages=[{"role": "user", "content": "data"}])
+
+        assert client.messages.create.call_args.kwargs["max_tokens"] == 2500
+
+    def test_oversized_request_is_rejected_before_sending(self):
+        """No messages.create call is made for a request that cannot fit"""
+        configure_token_counter(exact_above=0)
+        client = MagicMock()
+        client.messages.count_tokens.return_value = SimpleNamespace(input_tokens=250_000)
+
+        with pytest.raises(ContextWindowExceeded):
+            create_message(client, task="chat", model=SONNET, messages=[{"role": "user", "content": "huge"}])
+
+        client.messages.create.assert_not_called()
+
+    @patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test_key"})
+    @patch("anthropic.Anthropic")
+    def test_large_file_is_analyzed_in_parts(self, mock_anthropic, tmp_path):
+        """analyze_file splits an oversized file, merges the parts and keeps one answer in history"""
+        client = mock_anthropic.return_value
+
+        def create(**request):
+            prompt = request["messages"][0]["content"]
+            return Mock(content=[Mock(text="merged" if prompt.startswith("These are analyses") else "looks fine")])
+
+        client.messages.create.side_effect = create
+        source = tmp_path / "big.py"
+        source.write_text("".join(f"value_{i} = {i}\n" for i in range(100)))
+
+        assistant = ClaudeDeveloperAssistant()
+        assistant.FILE_PART_TOKENS = 100
+        result = assistant.analyze_file(str(source))
+
+        prompts = [call.kwargs["messages"][0]["content"] for call in client.messages.create.call_args_list]
+        assert len(prompts) > 2
+        assert result == "merged"
+        assert prompts[-1].count("looks fine") == len(prompts) - 1
+        assert len(assistant.conversation_history) == 2